@@ -0,0 +1,118 @@
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from core.models import ImageItem
+from utils.image_utils import pixmap_to_gray_array
+
+# 默认阈值：64 位哈希中不同位数不超过该值视为近似重复
+DEFAULT_THRESHOLD = 5
+# 可选的感知哈希算法（见 utils.phash.HASHERS；该模块依赖 NumPy，使用时才导入）
+HASH_METHODS = ('ahash', 'dhash')
+
+
+@dataclass
+class DedupGroup:
+    """一组被合并的相邻图片：保留第一张，时长为整组之和。"""
+    kept: str
+    merged: List[str]
+    distances: List[int]
+    duration: float
+
+    def to_dict(self) -> dict:
+        return {'kept': self.kept, 'merged': self.merged, 'distances': self.distances,
+                'duration': round(self.duration, 4)}
+
+
+@dataclass
+class DedupReport:
+    """近似重复合并结果，写入诊断日志的 dedup 字段。"""
+    method: str
+    threshold: int
+    input_count: int = 0
+    output_count: int = 0
+    unhashed: int = 0
+    groups: List[DedupGroup] = field(default_factory=list)
+
+    @property
+    def merged_count(self) -> int:
+        return self.input_count - self.output_count
+
+    def summary(self) -> str:
+        return (f"近似重复合并：{self.input_count} 张 -> {self.output_count} 张"
+                f"（{len(self.groups)} 组，合并 {self.merged_count} 张）")
+
+    def to_dict(self, include_groups: bool = True) -> dict:
+        out = {
+            'method': self.method,
+            'threshold': self.threshold,
+            'input_count': self.input_count,
+            'output_count': self.output_count,
+            'merged_count': self.merged_count,
+            'group_count': len(self.groups),
+            'unhashed': self.unhashed,
+        }
+        if include_groups:
+            out['groups'] = [g.to_dict() for g in self.groups]
+        return out
+
+
+def thumbnail_hashes(images: Sequence[ImageItem], method: str = 'dhash') -> List[Optional[int]]:
+    """基于导入时已解码的缩略图计算感知哈希（不再读取原图）。"""
+    from utils.phash import image_hash
+    return [image_hash(pixmap_to_gray_array(img.thumbnail), method) for img in images]
+
+
+def collapse_near_duplicates(images: Sequence[ImageItem], durations: Sequence[float],
+                             threshold: int = DEFAULT_THRESHOLD, method: str = 'dhash',
+                             hashes: Optional[Sequence[Optional[int]]] = None
+                             ) -> Tuple[List[ImageItem], List[float], DedupReport]:
+    """把相邻的近似重复图片合并为一段，时长相加。
+
+    每张图片与当前组的第一张（保留帧）比较，避免逐张渐变的序列被连锁合并；
+    无法计算哈希的图片（占位缩略图等）总是单独成段。
+    """
+    from utils.phash import hamming
+    if method not in HASH_METHODS:
+        raise ValueError(f"未知的感知哈希算法：{method}")
+    if hashes is None:
+        hashes = thumbnail_hashes(images, method)
+    report = DedupReport(method=method, threshold=threshold, input_count=len(images),
+                         unhashed=sum(1 for h in hashes if h is None))
+    out_images: List[ImageItem] = []
+    out_durations: List[float] = []
+    group: Optional[DedupGroup] = None
+    anchor: Optional[int] = None
+    for img, d, h in zip(images, durations, hashes):
+        if anchor is not None and h is not None:
+            dist = hamming(anchor, h)
+            if dist <= threshold:
+                if group is None:
+                    group = DedupGroup(kept=out_images[-1].path, merged=[], distances=[],
+                                       duration=out_durations[-1])
+                    report.groups.append(group)
+                group.merged.append(img.path)
+                group.distances.append(dist)
+                group.duration += d
+                out_durations[-1] += d
+                continue
+        out_images.append(img)
+        out_durations.append(d)
+        anchor = h
+        group = None
+    report.output_count = len(out_images)
+    return out_images, out_durations, report
+
+
+def dedup_settings_from_env() -> Tuple[bool, int, str, Optional[str]]:
+    """读取 (是否启用, 阈值, 算法, 报告文件路径) 环境变量设置。"""
+    enabled = os.environ.get('JPEG2MPEG_DEDUP', '0') not in ('', '0')
+    try:
+        threshold = max(0, int(os.environ.get('JPEG2MPEG_DEDUP_THRESHOLD', str(DEFAULT_THRESHOLD))))
+    except ValueError:
+        threshold = DEFAULT_THRESHOLD
+    method = os.environ.get('JPEG2MPEG_DEDUP_HASH', 'dhash')
+    if method not in HASH_METHODS:
+        method = 'dhash'
+    report_path = os.environ.get('JPEG2MPEG_DEDUP_REPORT') or None
+    return enabled, threshold, method, report_path
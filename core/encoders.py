@@ -0,0 +1,285 @@
+import datetime
+import json
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.file_utils import get_cache_dir
+from utils.log_utils import get_logger
+
+logger = get_logger('encoders')
+
+# 编码器族 -> 按优先级排列的 (ffmpeg 编码器, 默认 preset, 默认 CRF)；同族内取本机 ffmpeg 支持的第一个
+ENCODER_FAMILIES = {
+    'x264': (('libx264', 'medium', 23),),
+    'x265': (('libx265', 'medium', 28),),
+    'vp9': (('libvpx-vp9', '4', 32),),
+    'av1': (('libsvtav1', '8', 35), ('libaom-av1', '8', 35)),
+}
+DEFAULT_ENCODER = 'x264'
+# x264 默认针对静态图片调优（幻灯片的主要内容）
+DEFAULT_TUNES = {'libx264': 'stillimage'}
+# 'auto'：按校准结果选取达到目标质量（PSNR，dB）的最快编码器
+DEFAULT_TARGET_PSNR = 40.0
+
+CALIBRATION_SCHEMA = 1
+CALIBRATION_NAME = 'encoder_calibration.json'
+CALIBRATION_SIZE = (640, 360)
+
+
+@dataclass
+class EncoderSpec:
+    """一次导出使用的视频编码器与参数。"""
+    family: str                     # x264 / x265 / vp9 / av1
+    codec: str                      # ffmpeg 编码器名称
+    preset: Optional[str] = None    # x264/x265/SVT-AV1 为 preset，VP9/libaom 为 cpu-used
+    tune: Optional[str] = None
+    crf: int = 23
+    selected_by: str = 'settings'   # settings / auto / fallback
+
+    def output_args(self, include_preset: bool = True) -> List[str]:
+        """-c:v 之后的编码参数（不含 -pix_fmt）。include_preset=False 时省略 -preset（moviepy 会自行添加）。"""
+        args = []
+        if self.codec in ('libx264', 'libx265', 'libsvtav1'):
+            if self.preset and include_preset:
+                args += ['-preset', self.preset]
+            if self.tune:
+                args += ['-tune', self.tune]
+            args += ['-crf', str(self.crf)]
+            if self.codec == 'libx265':
+                # 让 QuickTime/Safari 识别 MP4 中的 HEVC；关闭 x265 的控制台输出
+                args += ['-tag:v', 'hvc1', '-x265-params', 'log-level=error']
+        elif self.codec in ('libvpx-vp9', 'libaom-av1'):
+            if self.codec == 'libvpx-vp9':
+                args += ['-deadline', 'good']
+            args += ['-cpu-used', self.preset or '4', '-row-mt', '1', '-crf', str(self.crf), '-b:v', '0']
+        return args
+
+    def moviepy_preset(self) -> str:
+        # moviepy 总会添加 -preset；对没有该选项的编码器传入的值会被 ffmpeg 忽略
+        return self.preset if self.codec in ('libx264', 'libx265', 'libsvtav1') and self.preset else 'medium'
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d['args'] = self.output_args()
+        return d
+
+
+@dataclass
+class CalibrationResult:
+    """某个编码器在校准样本上的表现。"""
+    family: str
+    codec: str
+    preset: Optional[str]
+    crf: int
+    seconds: float = 0.0
+    fps: float = 0.0                 # 每秒编码帧数
+    bytes: int = 0
+    psnr: Optional[float] = None     # 相对样本原始帧的 PSNR（dB）
+    error: Optional[str] = None
+
+
+def encoder_settings_from_env() -> Tuple[str, Optional[str], Optional[str], Optional[int], float]:
+    """读取 (编码器族或 'auto', preset, tune, CRF, 目标 PSNR) 环境变量设置。"""
+    name = os.environ.get('JPEG2MPEG_ENCODER', DEFAULT_ENCODER).strip().lower()
+    if name != 'auto' and name not in ENCODER_FAMILIES:
+        name = DEFAULT_ENCODER
+    preset = os.environ.get('JPEG2MPEG_ENCODER_PRESET') or None
+    tune = os.environ.get('JPEG2MPEG_ENCODER_TUNE') or None
+    try:
+        crf = int(os.environ['JPEG2MPEG_ENCODER_CRF'])
+    except (KeyError, ValueError):
+        crf = None
+    try:
+        target_psnr = float(os.environ.get('JPEG2MPEG_TARGET_PSNR', str(DEFAULT_TARGET_PSNR)))
+    except ValueError:
+        target_psnr = DEFAULT_TARGET_PSNR
+    return name, preset, tune, crf, target_psnr
+
+
+def make_spec(family: str, info=None, preset: Optional[str] = None, tune: Optional[str] = None,
+              crf: Optional[int] = None, selected_by: str = 'settings') -> Optional[EncoderSpec]:
+    """按编码器族创建参数；info（FFmpegInfo）给出时只考虑本机 ffmpeg 支持的编码器，都不支持返回 None。
+
+    tune 为 'none' 时不加 -tune。
+    """
+    for codec, default_preset, default_crf in ENCODER_FAMILIES[family]:
+        if info is not None and not info.has_encoder(codec):
+            continue
+        if tune is None:
+            tune = DEFAULT_TUNES.get(codec)
+        return EncoderSpec(family=family, codec=codec, preset=preset or default_preset,
+                           tune=None if tune == 'none' else tune,
+                           crf=default_crf if crf is None else crf, selected_by=selected_by)
+    return None
+
+
+def available_families(info) -> List[str]:
+    return [f for f in ENCODER_FAMILIES if make_spec(f, info) is not None]
+
+
+# ---- 校准 ----
+
+def _calibration_frames(size: Tuple[int, int], count: int, seed: int = 0):
+    """生成 count 张带渐变、色块与噪声的合成“照片”（I420 缓冲区列表）。"""
+    import numpy as np
+    from utils.yuv_utils import rgb_to_i420_planes
+    w, h = size
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    frames = []
+    for _ in range(count):
+        base = rng.uniform(0, 255, 3).astype(np.float32)
+        rgb = 0.5 * np.stack([xx / w * 255, yy / h * 255, (xx + yy) / (w + h) * 255], axis=-1) + 0.5 * base
+        for _ in range(8):
+            x0, y0 = rng.integers(0, w), rng.integers(0, h)
+            rgb[y0:y0 + h // 5, x0:x0 + w // 5] = rng.uniform(0, 255, 3)
+        rgb += rng.normal(0, 6, (h, w, 1)).astype(np.float32)
+        planes = rgb_to_i420_planes(np.clip(rgb, 0, 255).astype(np.uint8))
+        frames.append(np.concatenate([p.ravel() for p in planes]))
+    return frames
+
+
+def _decode_psnr(ffmpeg_exe: str, path: str, frames, repeat: int, size: Tuple[int, int]) -> float:
+    """把编码结果解码回 yuv420p，与原始帧逐帧比较，返回整体 PSNR（dB）。"""
+    import numpy as np
+    proc = subprocess.run([ffmpeg_exe, '-v', 'error', '-i', path, '-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-'],
+                          stdin=subprocess.DEVNULL, capture_output=True, check=True)
+    frame_len = len(frames[0])
+    decoded = np.frombuffer(proc.stdout, dtype=np.uint8)
+    n = min(len(decoded) // frame_len, len(frames) * repeat)
+    if n == 0:
+        raise RuntimeError("解码结果为空")
+    mse_total = 0.0
+    for i in range(n):
+        ref = frames[i // repeat].astype(np.float32)
+        got = decoded[i * frame_len:(i + 1) * frame_len].astype(np.float32)
+        mse_total += float(np.mean((ref - got) ** 2))
+    mse = mse_total / n
+    return 99.0 if mse <= 1e-10 else round(float(10.0 * np.log10(255.0 ** 2 / mse)), 2)
+
+
+def calibrate(info, families: Optional[Sequence[str]] = None, size: Tuple[int, int] = CALIBRATION_SIZE,
+              images: int = 3, seconds_per_image: float = 1.0, fps: int = 24) -> List[CalibrationResult]:
+    """用一段合成幻灯片样本依次试编码本机可用的各编码器（默认参数），记录速度、体积与 PSNR。"""
+    from core.ffmpeg_writer import RawVideoPipeWriter
+    frames = _calibration_frames(size, images)
+    repeat = max(1, int(round(seconds_per_image * fps)))
+    results = []
+    with tempfile.TemporaryDirectory(prefix='jpeg2mpeg_calib_') as tmp:
+        for family in families or list(ENCODER_FAMILIES):
+            spec = make_spec(family, info)
+            if spec is None:
+                continue
+            result = CalibrationResult(family=family, codec=spec.codec, preset=spec.preset, crf=spec.crf)
+            out = os.path.join(tmp, f"{family}.mp4")
+            t0 = time.perf_counter()
+            try:
+                with RawVideoPipeWriter(out, size, fps, codec=spec.codec, ffmpeg_exe=info.path,
+                                        extra_output_args=spec.output_args()) as writer:
+                    for frame in frames:
+                        writer.write_frame(frame, repeat=repeat)
+                result.seconds = round(time.perf_counter() - t0, 4)
+                result.fps = round(len(frames) * repeat / result.seconds, 2) if result.seconds > 0 else 0.0
+                result.bytes = os.path.getsize(out)
+                result.psnr = _decode_psnr(info.path, out, frames, repeat, size)
+            except Exception as e:
+                result.error = str(e)[-500:]
+                logger.warning("编码器 %s（%s）校准失败：%s", family, spec.codec, e)
+            results.append(result)
+            logger.info("校准 %s（%s）：%.1f 帧/秒，%d 字节，PSNR %s dB", family, spec.codec, result.fps,
+                        result.bytes, result.psnr)
+    return results
+
+
+def pick_fastest(results: Sequence[CalibrationResult], target_psnr: float) -> Optional[CalibrationResult]:
+    """在达到目标 PSNR 的结果中选编码最快的；都达不到时选 PSNR 最高的。"""
+    ok = [r for r in results if r.error is None and r.psnr is not None]
+    if not ok:
+        return None
+    good = [r for r in ok if r.psnr >= target_psnr]
+    if good:
+        return max(good, key=lambda r: r.fps)
+    return max(ok, key=lambda r: r.psnr)
+
+
+def _calibration_path() -> str:
+    return os.path.join(get_cache_dir(), CALIBRATION_NAME)
+
+
+def _calibration_key(info, size: Tuple[int, int]) -> str:
+    # ffmpeg 文件变化（升级/替换）后校准结果失效
+    return f"{info.path}|{info.mtime}|{info.size}|{size[0]}x{size[1]}"
+
+
+def load_calibration(info, size: Tuple[int, int] = CALIBRATION_SIZE) -> Optional[List[CalibrationResult]]:
+    try:
+        with open(_calibration_path(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('schema') != CALIBRATION_SCHEMA:
+        return None
+    entry = data.get('entries', {}).get(_calibration_key(info, size))
+    if not entry:
+        return None
+    return [CalibrationResult(**r) for r in entry['results']]
+
+
+def save_calibration(info, results: Sequence[CalibrationResult], size: Tuple[int, int] = CALIBRATION_SIZE) -> None:
+    path = _calibration_path()
+    data: Dict = {'schema': CALIBRATION_SCHEMA, 'entries': {}}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        if old.get('schema') == CALIBRATION_SCHEMA:
+            data = old
+    except (OSError, ValueError):
+        pass
+    data['entries'][_calibration_key(info, size)] = {
+        'time': datetime.datetime.now().isoformat(),
+        'results': [asdict(r) for r in results],
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("写入编码器校准结果失败：%s", path, exc_info=True)
+
+
+def calibrated_results(info, refresh: bool = False) -> List[CalibrationResult]:
+    """返回本机 ffmpeg 的校准结果；没有缓存（或 refresh=True）时现场校准并保存。"""
+    results = None if refresh else load_calibration(info)
+    if results is None:
+        logger.info("没有编码器校准结果，开始校准（%s）", ', '.join(available_families(info)))
+        results = calibrate(info)
+        save_calibration(info, results)
+    return results
+
+
+def resolve_encoder(info, name: str = DEFAULT_ENCODER, preset: Optional[str] = None, tune: Optional[str] = None,
+                    crf: Optional[int] = None, target_psnr: float = DEFAULT_TARGET_PSNR) -> EncoderSpec:
+    """把设置解析为具体的 EncoderSpec。
+
+    name 为 'auto' 时按校准结果选择达到目标 PSNR 的最快编码器（使用该编码器的默认参数）；
+    所选编码器不被本机 ffmpeg 支持时回退为 x264。info 为 None（未找到 ffmpeg）时不做检查。
+    """
+    if name == 'auto' and info is not None:
+        best = pick_fastest(calibrated_results(info), target_psnr)
+        if best is not None:
+            spec = make_spec(best.family, info, selected_by='auto')
+            if spec is not None:
+                return spec
+        name = DEFAULT_ENCODER
+    if name == 'auto':
+        name = DEFAULT_ENCODER
+    spec = make_spec(name, info, preset, tune, crf)
+    if spec is None:
+        logger.warning("ffmpeg 不支持编码器 %s，改用 %s", name, DEFAULT_ENCODER)
+        spec = make_spec(DEFAULT_ENCODER, None, selected_by='fallback')
+    return spec
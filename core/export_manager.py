@@ -9,6 +9,27 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from PIL import Image as PILImage
 
 from core.models import ImageItem, AudioItem
+from core.resolution_planner import plan_resolution
+from core.metadata_index import lookup_sizes
+from core.preflight import PreflightError, run_preflight
+from core.dedup import collapse_near_duplicates, dedup_settings_from_env
+from core.encoders import encoder_settings_from_env, resolve_encoder
+from core.output_target import hls_settings_from_env, mp4_mode_from_env, resolve_output
+from core.renditions import ladder_sizes, parse_heights, rate_cap_args
+from core.keyframes import (CHAPTER_EXTENSIONS, MAX_GOP_SECONDS, add_chapters, ffmpeg_supports_option_files,
+                            image_boundaries, keyframe_args, write_chapters)
+from core.stage_profiler import StageProfiler
+from core.ffmpeg_locator import configure_ffmpeg_env, locate_ffmpeg
+from core.ffmpeg_writer import RawVideoPipeWriter, frame_counts, run_ffmpeg
+from core.ffmpeg_graph import build_graph_command, ffmpeg_codec_for, group_runs, write_concat_list
+from utils.resource_utils import peak_rss_bytes
+from utils.log_utils import current_log_file, get_logger
+from utils.profiling import profiled
+
+logger = get_logger('export_manager')
+
+# 诊断 JSON 的结构版本：1.1 起包含 profile（各阶段耗时与资源）
+DIAG_SCHEMA_VERSION = '1.1'
 
 
 class ExportManager(QObject):
@@ -18,6 +39,7 @@ class ExportManager(QObject):
     """
     progress_updated = pyqtSignal(int)    # 0-100
     export_finished = pyqtSignal(bool, str)  # success, message
+    plan_ready = pyqtSignal(str)          # 导出前的分辨率与预计编码成本说明
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -32,7 +54,52 @@ class ExportManager(QObject):
         else:
             self.log_dir = None
         self.last_diagnostic_log = None
+        # 导出前检查（文件头 + 局部解码 + 帧/时长对齐）
+        self.preflight_enabled = os.environ.get('JPEG2MPEG_PREFLIGHT', '1') != '0'
+        # 近似重复合并：相邻且感知哈希相近的图片合并为一段（默认关闭）
+        (self.dedup_enabled, self.dedup_threshold, self.dedup_method,
+         self.dedup_report_path) = dedup_settings_from_env()
+        self.last_dedup = None
+        # 输出分辨率预设：'720p' | '1080p' | '4k' | 'native' | 'native:N'（N 为百万像素上限）
+        self.resolution_preset = os.environ.get('JPEG2MPEG_RESOLUTION', 'native')
+        try:
+            self.fps = max(1, int(os.environ.get('JPEG2MPEG_FPS', '24')))
+        except ValueError:
+            self.fps = 24
+        # 视频编码器：JPEG2MPEG_ENCODER=x264（默认）| x265 | vp9 | av1 | auto（按校准结果选达到目标质量的最快者）
+        (self.encoder_name, self.encoder_preset, self.encoder_tune, self.encoder_crf,
+         self.target_psnr) = encoder_settings_from_env()
+        self.encoder = None
+        # 在每张图片的首帧强制关键帧（其间为长 GOP），并把图片切换点写为 MP4 章节
+        self.keyframes_enabled = os.environ.get('JPEG2MPEG_KEYFRAMES', '1') != '0'
+        self.chapters_enabled = os.environ.get('JPEG2MPEG_CHAPTERS', '1') != '0'
+        # MP4 封装：plain | faststart（默认）| fragmented；输出到 '-' / 管道时总是分片
+        self.mp4_mode = mp4_mode_from_env()
+        # HLS（输出路径以 .m3u8 结尾）：分段时长、分段格式（ts / fmp4）与额外缩小档位（短边像素）
+        self.hls_segment_seconds, self.hls_segment_type, self.hls_ladder = hls_settings_from_env()
+        # 多档位文件输出：JPEG2MPEG_RENDITIONS=480（短边像素，可多个）在原尺寸文件之外另写 out_480p.mp4 等，
+        # 图片只解码、加边一次，在 ffmpeg 中缩小后分别编码
+        self.rendition_heights = parse_heights(os.environ.get('JPEG2MPEG_RENDITIONS', ''))
+        self.output = None
+        self.last_plan = None
+        # 导出后端：'moviepy'（默认）| 'yuvpipe'（NumPy I420 + ffmpeg rawvideo 管道）
+        #          | 'ffmpeg'（原始文件交给 ffmpeg 滤镜图缩放/加边，Python 不处理像素）
+        self.backend = os.environ.get('JPEG2MPEG_EXPORT_BACKEND', 'moviepy')
+        # 导出时由 core.ffmpeg_locator 定位的 ffmpeg 及其能力（FFmpegInfo）
+        self.ffmpeg_info = None
+        # yuvpipe 流水线：解码线程数与在途数据的内存上限（MB）
+        self.decode_workers = min(4, os.cpu_count() or 2)
+        try:
+            self.memory_limit_mb = max(64, int(os.environ.get('JPEG2MPEG_MEMORY_LIMIT_MB', '512')))
+        except ValueError:
+            self.memory_limit_mb = 512
+        # 预读窗口（MB）：慢速磁盘上提前读取后续图片文件；0 表示关闭
+        try:
+            self.prefetch_mb = max(0, int(os.environ.get('JPEG2MPEG_PREFETCH_MB', '64')))
+        except ValueError:
+            self.prefetch_mb = 64
 
+    @profiled('export_video')
     def export_video(self, images: List[ImageItem], audios: List[AudioItem], output_path: str):
         """主导出函数：images 顺序为显示顺序；audios 顺序用于合并。
 
@@ -44,13 +111,15 @@ class ExportManager(QObject):
         # 准备一个导出诊断对象；最终会以 JSON 写入磁盘并记录为 last_diagnostic_log
         tmp_log_path = None
         diag = {}
+        # 各阶段耗时与资源统计，写入诊断 JSON 的 profile 字段
+        self.profiler = StageProfiler()
         try:
             base_dir = self.log_dir if getattr(self, 'log_dir', None) else None
             if not base_dir:
                 base_dir = tempfile.gettempdir()
             fname = f"jpeg2mpeg_export_{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
             tmp_log_path = os.path.join(base_dir, fname)
-            diag['schema_version'] = '1.0'
+            diag['schema_version'] = DIAG_SCHEMA_VERSION
             diag['start_time'] = datetime.datetime.now().isoformat()
             diag['python_executable'] = sys.executable
             diag['sys_path'] = list(sys.path)
@@ -58,47 +127,42 @@ class ExportManager(QObject):
             tmp_log_path = None
 
         try:
-            # 在导入 moviepy 前，确保 moviepy/imageio-ffmpeg 能找到 ffmpeg 可执行文件。
-            # 如果用户在 Windows 上把 ffmpeg 安装在已知位置（例如 D:\Program Files\ffmpeg\bin），
-            # 在虚拟环境中可能找不到系统 PATH 中的 ffmpeg，可通过设置环境变量强制指定。
-            ffmpeg_guess = r"D:\Program Files\ffmpeg\bin\ffmpeg.exe"
-            try:
-                if 'IMAGEIO_FFMPEG_EXE' not in os.environ and os.path.exists(ffmpeg_guess):
-                    os.environ['IMAGEIO_FFMPEG_EXE'] = ffmpeg_guess
-                if 'FFMPEG_BINARY' not in os.environ and os.path.exists(ffmpeg_guess):
-                    os.environ['FFMPEG_BINARY'] = ffmpeg_guess
-            except Exception:
-                pass
-
-            # 记录 ffmpeg 相关信息到诊断对象
-            diag['ffmpeg_guess'] = ffmpeg_guess
-            diag['IMAGEIO_FFMPEG_EXE'] = os.environ.get('IMAGEIO_FFMPEG_EXE')
-            diag['FFMPEG_BINARY'] = os.environ.get('FFMPEG_BINARY')
-            # 尝试记录 moviepy 版本信息（若可用）
-            try:
-                import moviepy
-                diag['moviepy_version'] = getattr(moviepy, '__version__', None)
-            except Exception:
-                diag['moviepy_version'] = None
-            diag['platform'] = sys.platform
+            with self.profiler.stage('import'):
+                # 在导入 moviepy 前定位 ffmpeg 并告知 imageio-ffmpeg；定位与能力探测结果缓存在磁盘上，
+                # 之后的导出只需 stat 候选文件
+                self.ffmpeg_info = locate_ffmpeg()
+                configure_ffmpeg_env(self.ffmpeg_info)
 
-            # 延迟导入大型库。moviepy 的不同发行版可能没有 `moviepy.editor` 子模块，
-            # 所以先尝试从 `moviepy.editor` 导入，失败则回退到直接从 `moviepy` 导入所需符号。
-            import_source = None
-            try:
-                from moviepy.editor import ImageSequenceClip, AudioFileClip, concatenate_audioclips
-                import_source = 'moviepy.editor'
-            except Exception as e_editor:
+                # 记录 ffmpeg 相关信息到诊断对象
+                diag['ffmpeg'] = self.ffmpeg_info.summary() if self.ffmpeg_info else None
+                diag['IMAGEIO_FFMPEG_EXE'] = os.environ.get('IMAGEIO_FFMPEG_EXE')
+                diag['FFMPEG_BINARY'] = os.environ.get('FFMPEG_BINARY')
+                # 尝试记录 moviepy 版本信息（若可用）
                 try:
-                    from moviepy import ImageSequenceClip, AudioFileClip, concatenate_audioclips
-                    import_source = 'moviepy'
+                    import moviepy
+                    diag['moviepy_version'] = getattr(moviepy, '__version__', None)
                 except Exception:
-                    # 将子模块导入时的原始异常向外传播，以便记录更有价值的诊断信息
-                    raise e_editor
-            # 记录实际导入来源到诊断对象
-            diag['moviepy_import_source'] = import_source
-            # proglog 仍然单独导入
-            from proglog import TqdmProgressBarLogger
+                    diag['moviepy_version'] = None
+                diag['platform'] = sys.platform
+                diag['log_file'] = current_log_file()
+
+                # 延迟导入大型库。moviepy 的不同发行版可能没有 `moviepy.editor` 子模块，
+                # 所以先尝试从 `moviepy.editor` 导入，失败则回退到直接从 `moviepy` 导入所需符号。
+                import_source = None
+                try:
+                    from moviepy.editor import ImageSequenceClip, AudioFileClip, concatenate_audioclips
+                    import_source = 'moviepy.editor'
+                except Exception as e_editor:
+                    try:
+                        from moviepy import ImageSequenceClip, AudioFileClip, concatenate_audioclips
+                        import_source = 'moviepy'
+                    except Exception:
+                        # 将子模块导入时的原始异常向外传播，以便记录更有价值的诊断信息
+                        raise e_editor
+                # 记录实际导入来源到诊断对象
+                diag['moviepy_import_source'] = import_source
+                # proglog 仍然单独导入
+                from proglog import TqdmProgressBarLogger
         except Exception as e:
             # 记录详细诊断信息到临时日志，便于排查虚拟环境与导入问题
             try:
@@ -118,13 +182,7 @@ class ExportManager(QObject):
                 tmp.close()
             except Exception:
                 tmp_path = None
-            # 控制台也打印以便本地查看
-            try:
-                print("[ExportManager] Missing moviepy or dependency:", e)
-                if tmp_path:
-                    print(f"[ExportManager] Diagnostic log written to: {tmp_path}")
-            except Exception:
-                pass
+            logger.error("缺少 moviepy 或其依赖：%s（诊断日志：%s）", e, tmp_path)
             msg = f"缺少 moviepy 或其依赖：{e}"
             if tmp_path:
                 msg += f"。详细诊断请见: {tmp_path}"
@@ -144,32 +202,8 @@ class ExportManager(QObject):
             diag['image_paths_sample'] = image_paths[:10]
 
         # 计算 durations 列表
-        durations = []
         total_audio_duration = sum(a.duration for a in audios) if audios else 0.0
-
-        # 如果有至少两张图片且有音频，则按创建时间映射比例计算每张持续时间
-        if total_audio_duration > 0 and len(images) >= 2:
-            times = [img.create_time for img in images]
-            t_min, t_max = min(times), max(times)
-            span = max(1.0, t_max - t_min)
-            # 为每张图片计算它相对于最早时间的百分比（0-1），然后以差分方式计算每张持续时间
-            rels = [(t - t_min) / span for t in times]
-            # durations as delta between consecutive rels scaled to total_audio_duration
-            for i in range(len(rels)):
-                if i == 0:
-                    # first image duration is rels[0] portion
-                    d = rels[0] * total_audio_duration
-                else:
-                    d = (rels[i] - rels[i - 1]) * total_audio_duration
-                # ensure minimum duration
-                durations.append(max(0.1, d))
-            # last image: give remaining time
-            consumed = sum(durations)
-            if consumed < total_audio_duration:
-                durations[-1] += total_audio_duration - consumed
-        else:
-            # 无音频或只有一张图片：平均分配，每张2秒（可调整）
-            durations = [2.0] * len(images)
+        durations = self.compute_durations(images, total_audio_duration)
 
         # 将计算的 durations 写入 ImageItem（可用于 UI 显示）
         for img, d in zip(images, durations):
@@ -180,120 +214,101 @@ class ExportManager(QObject):
             diag['durations'] = durations
             diag['total_audio_duration'] = total_audio_duration
 
-        # 如果有音频，合并为单一音轨（使用 moviepy）
+        # 输出位置：文件、标准输出（'-'）、命名管道或 HLS 播放列表（.m3u8）
+        self.output = resolve_output(output_path, self.mp4_mode, self.hls_segment_seconds, self.hls_segment_type)
+        self.output.audio = bool(audios)
+        output_path = self.output.path
+        diag['output'] = self.output.to_dict()
+
         temp_audio = None
+        aux_dir = None
         try:
-            audio_clip = None
-            if audios:
-                clips = []
-                for a in audios:
-                    try:
-                        clips.append(AudioFileClip(a.path))
-                    except Exception:
-                        # 忽略无法读取的音频
-                        continue
-                if clips:
-                    if len(clips) == 1:
-                        audio_clip = clips[0]
-                    else:
-                        audio_clip = concatenate_audioclips(clips)
+            with self.profiler.stage('probe') as rec:
+                # 导出前并行检查所有图片与音频；有任何问题时拒绝开始，避免编码到一半才失败或帧与时长错位
+                if self.preflight_enabled:
+                    report = run_preflight(images, audios, durations, self.decode_workers)
+                    diag['preflight'] = report.to_dict()
+                    if not report.ok:
+                        raise PreflightError(report)
 
-            # 在创建视频剪辑前，确保所有图片尺寸相同（ImageSequenceClip 要求）
-            # 选取 target_size 为所有图片的 max(width), max(height)，对较小或不同尺寸图片进行等比缩放并在黑色背景上居中填充
-            temp_dir = None
-            try:
-                sizes = []
-                for p in image_paths:
-                    try:
-                        with PILImage.open(p) as im:
-                            sizes.append(im.size)
-                    except Exception:
-                        sizes.append((0, 0))
-                # 选择最大宽高作为目标尺寸
-                widths = [s[0] for s in sizes if s[0] > 0]
-                heights = [s[1] for s in sizes if s[1] > 0]
-                if widths and heights:
-                    target_size = (max(widths), max(heights))
-                else:
-                    # 如果无法读取任何图片尺寸，就让 moviepy 自己抛错
-                    target_size = None
+                # 相邻近似重复图片合并为一段（基于已解码的缩略图），减少需要编码的不同帧
+                dedup_note = None
+                self.last_dedup = None
+                if self.dedup_enabled and len(images) > 1:
+                    images, durations, dedup = collapse_near_duplicates(
+                        images, durations, self.dedup_threshold, self.dedup_method)
+                    image_paths = [img.path for img in images]
+                    self.last_dedup = dedup
+                    diag['dedup'] = dedup.to_dict()
+                    diag['durations_after_dedup'] = durations
+                    if self.dedup_report_path:
+                        self._write_dedup_report(dedup)
+                    if dedup.groups:
+                        dedup_note = dedup.summary()
+                rec.add(frames=len(images))
 
-                if target_size is not None:
-                    temp_dir = tempfile.mkdtemp(prefix="jpeg2mpeg_frames_")
-                    new_image_paths = []
-                    for idx, p in enumerate(image_paths):
-                        try:
-                            with PILImage.open(p) as im:
-                                im = im.convert('RGB')
-                                if im.size != target_size:
-                                    # 保持纵横比缩放到能放入 target_size
-                                    resample_filter = getattr(PILImage, 'LANCZOS', getattr(PILImage, 'ANTIALIAS', 1))
-                                    im.thumbnail(target_size, resample_filter)
-                                    background = PILImage.new('RGB', target_size, (0, 0, 0))
-                                    paste_x = (target_size[0] - im.width) // 2
-                                    paste_y = (target_size[1] - im.height) // 2
-                                    background.paste(im, (paste_x, paste_y))
-                                    out_path = os.path.join(temp_dir, f"frame_{idx:06d}.png")
-                                    background.save(out_path, format='PNG')
-                                    new_image_paths.append(out_path)
-                                else:
-                                    # 相同尺寸，仍复制为 PNG 到临时目录以避免格式差异
-                                    out_path = os.path.join(temp_dir, f"frame_{idx:06d}.png")
-                                    im.save(out_path, format='PNG')
-                                    new_image_paths.append(out_path)
-                        except Exception:
-                            # 无法打开时，记录并继续（moviepy 之后会报错）
-                            continue
-                    if new_image_paths:
-                        used_image_paths = new_image_paths
-                        if tmp_log_path:
-                            diag['prepared_frames_count'] = len(new_image_paths)
-                            diag['prepared_frames_dir'] = temp_dir
-                    else:
-                        used_image_paths = image_paths
-                else:
-                    used_image_paths = image_paths
-            except Exception:
-                used_image_paths = image_paths
+            # 由分辨率规划器选取有界、偶数尺寸的 target_size（所有导出后端共用）
+            with self.profiler.stage('size_scan') as rec:
+                sizes = self._probe_sizes(images)
+                plan = plan_resolution(sizes, self.resolution_preset, durations, self.fps)
+                rec.add(frames=len(sizes))
+            self.last_plan = plan
+            if plan is not None:
+                diag['resolution_plan'] = plan.to_dict()
+                self.plan_ready.emit(f"{dedup_note}；{plan.summary()}" if dedup_note else plan.summary())
+            target_size = plan.size if plan is not None else None
 
-            # 创建视频剪辑
-            video_clip = ImageSequenceClip(used_image_paths, durations=durations)
-            if tmp_log_path:
-                diag['video_clip_repr'] = repr(video_clip)
-            if audio_clip is not None:
-                # 不同版本的 moviepy 提供不同的方法名：优先尝试 set_audio，其次尝试 with_audio
-                audio_attach_method = None
-                try:
-                    if hasattr(video_clip, 'set_audio'):
-                        video_clip = video_clip.set_audio(audio_clip)
-                        audio_attach_method = 'set_audio'
-                    elif hasattr(video_clip, 'with_audio'):
-                        video_clip = video_clip.with_audio(audio_clip)
-                        audio_attach_method = 'with_audio'
-                    else:
-                        # 最后尝试动态查找可能的别名
-                        func = getattr(video_clip, 'attach_audio', None)
-                        if callable(func):
-                            video_clip = func(audio_clip)
-                            audio_attach_method = 'attach_audio'
-                except Exception:
-                    # 如果附加失败，让后续的 write_videofile 抛出更明确的异常
-                    audio_attach_method = 'failed'
-                if tmp_log_path:
-                    diag['audio_attach_method'] = audio_attach_method
-
-            # 使用 proglog TqdmProgressBarLogger 并绑定回调更新信号
-            try:
-                logger = TqdmProgressBarLogger(bars={"t": {"title": "导出进度", "index": 0}}, callbacks=[self._prog_callback])
-            except Exception:
-                logger = None
-
-            # 写出 MP4
-            video_clip.write_videofile(output_path, fps=24, codec="libx264", logger=logger)
+            with self.profiler.stage('encoder'):
+                self.encoder = resolve_encoder(self.ffmpeg_info, self.encoder_name, self.encoder_preset,
+                                               self.encoder_tune, self.encoder_crf, self.target_psnr)
+            diag['encoder'] = self.encoder.to_dict()
+            if target_size is not None:
+                # 各档位由同一路解码、加边后的画面缩小得到（见 core.renditions）
+                if self.output.hls:
+                    self.output.renditions = ladder_sizes(target_size, self.hls_ladder)
+                elif self.rendition_heights and self.output.stream:
+                    logger.warning("输出到管道时只能写出一个文件，忽略 JPEG2MPEG_RENDITIONS")
+                elif self.rendition_heights:
+                    self.output.renditions = ladder_sizes(target_size, self.rendition_heights)
+                diag['output'] = self.output.to_dict()
+                diag['output']['files'] = self.output.outputs
+            aux_dir = tempfile.mkdtemp(prefix="jpeg2mpeg_aux_")
+            video_args, chapters_path = self._boundary_outputs(image_paths, durations, output_path, aux_dir, diag)
+            video_args += self.output.ffmpeg_args()
+            if self.output.hls and self.output.renditions:
+                # 各档按分辨率设码率上限，主播放列表的 BANDWIDTH 才能区分各档
+                video_args += rate_cap_args([target_size] + self.output.renditions, self.fps)
+            backend = self._select_backend(target_size, diag)
+            diag['export_backend'] = backend
+            # tee 封装器不会把章节传给各子输出，多档位文件在编码后逐个写入章节
+            tee_chapters = chapters_path if self.output.renditions and not self.output.hls else None
+            if tee_chapters:
+                chapters_path = None
+            if backend == 'yuvpipe':
+                self._export_yuv_pipe(image_paths, audios, durations, target_size, self.output.ffmpeg_path, diag,
+                                      sizes, video_args=video_args, chapters_path=chapters_path)
+            elif backend == 'ffmpeg':
+                self._export_ffmpeg_graph(image_paths, audios, durations, target_size, self.output.ffmpeg_path, diag,
+                                          video_args=video_args, chapters_path=chapters_path, sizes=sizes)
+            else:
+                moviepy_api = {
+                    'ImageSequenceClip': ImageSequenceClip,
+                    'AudioFileClip': AudioFileClip,
+                    'concatenate_audioclips': concatenate_audioclips,
+                    'TqdmProgressBarLogger': TqdmProgressBarLogger,
+                }
+                self._export_moviepy(image_paths, audios, durations, target_size, output_path, diag, moviepy_api,
+                                     video_args=video_args, chapters_path=chapters_path)
+            if tee_chapters:
+                with self.profiler.stage('mux') as rec:
+                    for path in self.output.outputs:
+                        add_chapters(self.ffmpeg_info.path, path, tee_chapters, self.output.file_args())
+                    rec.add(bytes_written=self.output.size())
 
             # 成功写出：在诊断对象记录并把 JSON 写回文件，记录最后日志路径
             if tmp_log_path:
                 diag['export_success'] = output_path
+                diag['profile'] = self.profiler.to_dict()
                 try:
                     with open(tmp_log_path, 'w', encoding='utf-8') as f:
                         json.dump(diag, f, ensure_ascii=False, indent=2)
@@ -303,7 +318,10 @@ class ExportManager(QObject):
             else:
                 self.last_diagnostic_log = None
             self.progress_updated.emit(100)
+            logger.info("导出完成：%s（%d 张图片，后端 %s）", output_path, len(images), diag.get('export_backend'))
             msg = "导出完成"
+            if self.output.rendition_paths:
+                msg += "，另写出 " + "、".join(os.path.basename(p) for p in self.output.rendition_paths)
             if getattr(self, 'last_diagnostic_log', None):
                 msg += f"。诊断日志: {self.last_diagnostic_log}"
             self.export_finished.emit(True, msg)
@@ -311,8 +329,10 @@ class ExportManager(QObject):
             # 遇到异常时将 traceback 写入诊断日志（如果可用），并在 UI 中返回诊断日志路径
             try:
                 tb = traceback.format_exc()
+                logger.error("导出失败：%s", e, exc_info=True)
                 diag['export_error'] = str(e)
                 diag['traceback'] = tb
+                diag['profile'] = self.profiler.to_dict()
                 if tmp_log_path:
                     with open(tmp_log_path, 'w', encoding='utf-8') as f:
                         json.dump(diag, f, ensure_ascii=False, indent=2)
@@ -337,13 +357,369 @@ class ExportManager(QObject):
                     os.remove(temp_audio)
             except Exception:
                 pass
-            # 清理临时生成的帧目录（如果存在）
+            if aux_dir:
+                import shutil
+                shutil.rmtree(aux_dir, ignore_errors=True)
+
+    def _select_backend(self, target_size, diag: dict) -> str:
+        """按实际探测到的 ffmpeg 能力确认所选后端可用；缺少所需编码器/滤镜/解封装器时回退到 moviepy。"""
+        backend = self.backend if target_size is not None else 'moviepy'
+        if self.output.hls:
+            reason, purpose = 'hls_output', '输出 HLS '
+        elif self.output.stream:
+            reason, purpose = 'stream_output', '输出到管道'
+        elif self.output.renditions:
+            reason, purpose = 'renditions', '输出多个档位'
+        else:
+            reason = purpose = None
+        needs_ffmpeg = reason is not None
+        if needs_ffmpeg and backend == 'moviepy':
+            # moviepy 只能写单个文件；流式输出、HLS 与多档位输出改用 yuvpipe（需要已规划出目标尺寸）
+            if target_size is None:
+                raise RuntimeError(f"无法确定输出尺寸，不能{purpose}")
+            diag['backend_fallback'] = {'requested': backend, 'reason': reason}
+            backend = 'yuvpipe'
+        if backend not in ('yuvpipe', 'ffmpeg'):
+            return backend
+        info = self.ffmpeg_info
+        missing = info.missing_for(backend, self.encoder.codec) if info is not None else ['ffmpeg']
+        if info is not None and self.output.hls and not info.has_muxer('hls'):
+            missing.append('muxer:hls')
+        if info is not None and self.output.renditions:
+            missing += [f'filter:{n}' for n in ('split', 'scale') if not info.has_filters(n)]
+            if not self.output.hls and not info.has_muxer('tee'):
+                missing.append('muxer:tee')
+        if missing and needs_ffmpeg:
+            raise RuntimeError(f"ffmpeg 缺少{purpose}所需的能力：{', '.join(missing)}")
+        if missing:
+            logger.warning("ffmpeg 缺少 %s 后端所需的能力 %s，改用 moviepy 导出", backend, ', '.join(missing))
+            diag['backend_fallback'] = {'requested': backend, 'missing': missing}
+            return 'moviepy'
+        return backend
+
+    def _boundary_outputs(self, image_paths, durations, output_path, work_dir, diag):
+        """按设置生成图片切换处的强制关键帧参数与章节文件，返回 (编码参数列表, 章节文件路径或 None)。"""
+        bounds = image_boundaries(durations, self.fps)
+        video_args = []
+        if self.keyframes_enabled:
+            version = self.ffmpeg_info.version if self.ffmpeg_info is not None else ''
+            # HLS 只在关键帧处切分段：长时间停留的图片内每个分段时长补一个关键帧，使分段不超过目标时长
+            max_gop = self.output.hls_time if self.output.hls else MAX_GOP_SECONDS
+            video_args = keyframe_args(bounds, work_dir, ffmpeg_supports_option_files(version), max_gop,
+                                       video_streams=1 + len(self.output.renditions))
+            diag['keyframes'] = {'count': len(bounds.start_frames), 'gop_frames': int(video_args[1]),
+                                 'times_sample': [round(t, 3) for t in bounds.start_times()[:10]]}
+        chapters_path = None
+        if self.chapters_enabled and (self.output.is_mp4 or
+                                      os.path.splitext(output_path)[1].lower() in CHAPTER_EXTENSIONS):
+            chapters_path = os.path.join(work_dir, 'chapters.ffmeta')
+            write_chapters(chapters_path, [os.path.basename(p) for p in image_paths], bounds)
+            diag['chapters'] = len(bounds.start_frames)
+        return video_args, chapters_path
+
+    def _write_dedup_report(self, report):
+        """把合并报告写入 JPEG2MPEG_DEDUP_REPORT 指定的 JSON 文件（失败不影响导出）。"""
+        try:
+            with open(self.dedup_report_path, 'w', encoding='utf-8') as f:
+                json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        except Exception:
+            logger.warning("写入合并报告失败：%s", self.dedup_report_path, exc_info=True)
+
+    def _export_moviepy(self, image_paths, audios, durations, target_size, output_path, diag, mp,
+                        video_args=(), chapters_path=None):
+        """moviepy 导出路径：预处理为统一尺寸的 PNG 帧后用 ImageSequenceClip 写出。
+
+        mp 为延迟导入的 moviepy/proglog 符号字典。
+        """
+        temp_dir = None
+        prefetcher = None
+        try:
+            # 如果有音频，合并为单一音轨（使用 moviepy）
+            audio_clip = None
+            if audios:
+                with self.profiler.stage('audio') as rec:
+                    clips = []
+                    for a in audios:
+                        try:
+                            clips.append(mp['AudioFileClip'](a.path))
+                            rec.add(bytes_read=os.path.getsize(a.path))
+                        except Exception:
+                            # 忽略无法读取的音频
+                            continue
+                    if clips:
+                        if len(clips) == 1:
+                            audio_clip = clips[0]
+                        else:
+                            audio_clip = mp['concatenate_audioclips'](clips)
+
+            with self.profiler.stage('frame_prep') as rec:
+                # 在创建视频剪辑前，确保所有图片尺寸相同（ImageSequenceClip 要求）
+                # 对图片进行等比缩放并在黑色背景上居中填充
+                try:
+                    if target_size is not None:
+                        temp_dir = tempfile.mkdtemp(prefix="jpeg2mpeg_frames_")
+                        if self.prefetch_mb > 0:
+                            # 与 yuvpipe 相同：慢速磁盘上提前读取后续文件，等待时长见 prefetch.io_wait_seconds
+                            from core.prefetcher import ReadAheadPrefetcher
+                            prefetcher = ReadAheadPrefetcher(image_paths, self.prefetch_mb * 1024 * 1024).start()
+                        new_image_paths = []
+                        for idx, p in enumerate(image_paths):
+                            try:
+                                with PILImage.open(prefetcher.get(idx) if prefetcher else p) as im:
+                                    im = im.convert('RGB')
+                                    if im.size != target_size:
+                                        # 保持纵横比缩放到能放入 target_size
+                                        resample_filter = getattr(PILImage, 'LANCZOS', getattr(PILImage, 'ANTIALIAS', 1))
+                                        im.thumbnail(target_size, resample_filter)
+                                        background = PILImage.new('RGB', target_size, (0, 0, 0))
+                                        paste_x = (target_size[0] - im.width) // 2
+                                        paste_y = (target_size[1] - im.height) // 2
+                                        background.paste(im, (paste_x, paste_y))
+                                        out_path = os.path.join(temp_dir, f"frame_{idx:06d}.png")
+                                        background.save(out_path, format='PNG')
+                                        new_image_paths.append(out_path)
+                                    else:
+                                        # 相同尺寸，仍复制为 PNG 到临时目录以避免格式差异
+                                        out_path = os.path.join(temp_dir, f"frame_{idx:06d}.png")
+                                        im.save(out_path, format='PNG')
+                                        new_image_paths.append(out_path)
+                                rec.add(bytes_read=os.path.getsize(p), bytes_written=os.path.getsize(out_path), frames=1)
+                            except Exception as e:
+                                # 跳过会使帧与 durations 错位，因此直接中止帧准备
+                                raise RuntimeError(f"无法准备第 {idx + 1} 张图片 {p}: {e}")
+                        if new_image_paths:
+                            used_image_paths = new_image_paths
+                            diag['prepared_frames_count'] = len(new_image_paths)
+                            diag['prepared_frames_dir'] = temp_dir
+                        else:
+                            used_image_paths = image_paths
+                    else:
+                        used_image_paths = image_paths
+                except Exception as e:
+                    # 回退到原图会让 ImageSequenceClip 因尺寸不一致或损坏文件而失败得更晦涩，因此直接中止导出
+                    diag['prepare_frames_error'] = str(e)
+                    raise
+
+            # 创建视频剪辑
+            # 时长对齐到整帧（与 frame_counts 一致），使切换帧与强制关键帧、章节对应
+            frame_durations = [n / self.fps for n in frame_counts(durations, self.fps)]
+            video_clip = mp['ImageSequenceClip'](used_image_paths, durations=frame_durations)
+            diag['video_clip_repr'] = repr(video_clip)
+            if audio_clip is not None:
+                # 不同版本的 moviepy 提供不同的方法名：优先尝试 set_audio，其次尝试 with_audio
+                audio_attach_method = None
+                try:
+                    if hasattr(video_clip, 'set_audio'):
+                        video_clip = video_clip.set_audio(audio_clip)
+                        audio_attach_method = 'set_audio'
+                    elif hasattr(video_clip, 'with_audio'):
+                        video_clip = video_clip.with_audio(audio_clip)
+                        audio_attach_method = 'with_audio'
+                    else:
+                        # 最后尝试动态查找可能的别名
+                        func = getattr(video_clip, 'attach_audio', None)
+                        if callable(func):
+                            video_clip = func(audio_clip)
+                            audio_attach_method = 'attach_audio'
+                except Exception:
+                    # 如果附加失败，让后续的 write_videofile 抛出更明确的异常
+                    audio_attach_method = 'failed'
+                diag['audio_attach_method'] = audio_attach_method
+
+            # 使用 proglog TqdmProgressBarLogger 并绑定回调更新信号
             try:
-                if 'temp_dir' in locals() and temp_dir:
-                    import shutil
-                    shutil.rmtree(temp_dir, ignore_errors=True)
+                logger = mp['TqdmProgressBarLogger'](bars={"t": {"title": "导出进度", "index": 0}}, callbacks=[self._prog_callback])
             except Exception:
-                pass
+                logger = None
+
+            # 写出 MP4（moviepy 在同一调用内编码与封装，统一记为 encode 阶段）
+            with self.profiler.stage('encode') as rec:
+                enc = self.encoder
+                params = enc.output_args(include_preset=False) + list(video_args)
+                if enc.codec != 'libx264':
+                    # moviepy 只对 libx264 自动指定 yuv420p
+                    params += ['-pix_fmt', 'yuv420p']
+                video_clip.write_videofile(output_path, fps=self.fps, codec=enc.codec, preset=enc.moviepy_preset(),
+                                           ffmpeg_params=params, logger=logger)
+                rec.add(bytes_written=self.output.size(), frames=sum(frame_counts(durations, self.fps)))
+            if chapters_path:
+                # moviepy 的命令行无法附加额外输入，章节以流复制方式另行写入
+                with self.profiler.stage('mux') as rec:
+                    add_chapters(self.ffmpeg_info.path if self.ffmpeg_info else 'ffmpeg', output_path, chapters_path,
+                                 self.output.file_args())
+                    rec.add(bytes_written=self.output.size())
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+                diag['prefetch'] = prefetcher.stats_dict()
+            # 清理临时生成的帧目录（如果存在）
+            if temp_dir:
+                import shutil
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _export_yuv_pipe(self, image_paths, audios, durations, target_size, output_path, diag, sizes=None,
+                         video_args=(), chapters_path=None):
+        """yuvpipe 导出路径：NumPy 把每张图片转换为 I420 并在 YUV 空间加黑边，
+        以 rawvideo yuv420p 经管道送入 ffmpeg（数据量为 RGB24 的一半），音频由 ffmpeg 直接合并。
+
+        解码、帧准备与写入由 FramePipeline 并行执行，在途数据受 memory_limit_mb 约束；
+        prefetch_mb > 0 时由 ReadAheadPrefetcher 预读后续文件字节。
+        """
+        # NumPy 相关模块在首次导出时才导入（启动后通常已由 utils.prewarm 在后台预热）
+        from core.export_pipeline import FramePipeline
+        from core.prefetcher import ReadAheadPrefetcher
+        counts = frame_counts(durations, self.fps)
+        total_frames = max(1, sum(counts))
+        audio_paths = [a.path for a in audios] if audios else []
+        prefetcher = None
+        # 预读窗口计入同一个内存上限：最多占四分之一，其余留给解码与帧准备
+        memory_limit = self.memory_limit_mb * 1024 * 1024
+        prefetch_bytes = min(self.prefetch_mb * 1024 * 1024, memory_limit // 4)
+        if prefetch_bytes > 0:
+            prefetcher = ReadAheadPrefetcher(image_paths, prefetch_bytes).start()
+        try:
+            pipeline = FramePipeline(image_paths, counts, target_size, sizes=sizes,
+                                     decode_workers=self.decode_workers,
+                                     memory_limit=memory_limit - prefetch_bytes,
+                                     source_for=prefetcher.source_for if prefetcher else None)
+            writer = RawVideoPipeWriter(output_path, target_size, self.fps, audio_paths,
+                                        codec=self.encoder.codec, ffmpeg_exe=self.ffmpeg_info.path,
+                                        extra_output_args=self.encoder.output_args() + list(video_args),
+                                        chapters_path=chapters_path, renditions=self.output.renditions)
+            diag['ffmpeg_cmd'] = writer.cmd
+            with writer:
+                # 解码与帧准备在流水线线程中与编码并行，encode 阶段为写入管道的总耗时
+                with self.profiler.stage('encode') as rec:
+                    pipeline.run(writer.write_frame,
+                                 lambda _idx: self.progress_updated.emit(int(writer.frames_written * 99 / total_frames)))
+                    rec.add(bytes_written=writer.bytes_written, frames=writer.frames_written)
+                # 关闭管道后等待 ffmpeg 完成剩余编码、合并音频并写出文件
+                with self.profiler.stage('mux') as rec:
+                    writer.close()
+                    rec.add(bytes_written=self.output.size())
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+                diag['prefetch'] = prefetcher.stats_dict()
+        stats = pipeline.stats_dict()
+        if stats.get('budget_oversize'):
+            logger.warning("%d 张图片解码所需内存超过上限 %d MB，已逐张独占执行；可提高 JPEG2MPEG_MEMORY_LIMIT_MB",
+                           stats['budget_oversize'], self.memory_limit_mb)
+        self.profiler.record('frame_prep', stats['decode_seconds'] + stats['prepare_seconds'],
+                             bytes_read=prefetcher.bytes_read if prefetcher is not None else 0,
+                             frames=stats['frames_prepared'])
+        diag['pipe_frames_written'] = writer.frames_written
+        diag['pipe_bytes_written'] = writer.bytes_written
+        diag['pipeline'] = stats
+        diag['peak_rss_bytes'] = peak_rss_bytes()
+
+    def _export_ffmpeg_graph(self, image_paths, audios, durations, target_size, output_path, diag,
+                             video_args=(), chapters_path=None, sizes=None):
+        """ffmpeg 滤镜图导出路径：原始 JPEG/PNG/BMP 经 ffconcat 列表（含每张时长）直接交给 ffmpeg，
+        由 `scale=...:force_original_aspect_ratio=decrease,pad=...` 完成缩放与加边。
+
+        ffmpeg 无法直接读取的格式（GIF/TIFF 等）先用 PIL 转为 PNG 作为回退。
+        sizes 为各图片的原始尺寸：连续图片按解码器与尺寸分段，尺寸变化时换一个 concat 输入。
+        """
+        temp_dir = tempfile.mkdtemp(prefix="jpeg2mpeg_graph_")
+        try:
+            # 帧准备只包括 PIL 回退转换与写 ffconcat 列表，缩放/加边在 ffmpeg 中完成（记入 encode）
+            with self.profiler.stage('frame_prep') as rec:
+                inputs = []
+                fallback_count = 0
+                for idx, p in enumerate(image_paths):
+                    if ffmpeg_codec_for(p) is not None:
+                        inputs.append(p)
+                        continue
+                    out_path = os.path.join(temp_dir, f"fallback_{idx:06d}.png")
+                    with PILImage.open(p) as im:
+                        im.convert('RGB').save(out_path, format='PNG')
+                    inputs.append(out_path)
+                    fallback_count += 1
+                    rec.add(bytes_read=os.path.getsize(p), bytes_written=os.path.getsize(out_path), frames=1)
+
+                list_paths = []
+                segment_seconds = []
+                # 时长按 frame_counts 对齐到整帧，使 ffmpeg 中的切换帧与其他后端（及关键帧、章节）一致
+                frame_durations = [n / self.fps for n in frame_counts(durations, self.fps)]
+                for run_idx, (_codec, run_paths, run_durations) in enumerate(group_runs(inputs, frame_durations, sizes)):
+                    list_path = os.path.join(temp_dir, f"segment_{run_idx:04d}.ffconcat")
+                    write_concat_list(list_path, run_paths, run_durations)
+                    list_paths.append(list_path)
+                    segment_seconds.append(float(sum(run_durations)))
+
+            audio_paths = [a.path for a in audios] if audios else []
+            cmd = build_graph_command(self.ffmpeg_info.path, list_paths, target_size, self.fps, output_path, audio_paths,
+                                      codec=self.encoder.codec,
+                                      extra_output_args=self.encoder.output_args() + list(video_args),
+                                      segment_seconds=segment_seconds, chapters_path=chapters_path,
+                                      renditions=self.output.renditions)
+            diag['ffmpeg_cmd'] = cmd
+            diag['graph_segments'] = len(list_paths)
+            diag['pil_fallback_count'] = fallback_count
+            total_seconds = float(sum(durations))
+            # ffmpeg 在一个进程内完成解码、缩放、编码与封装；CPU 时间见 child_cpu_seconds
+            with self.profiler.stage('encode') as rec:
+                run_ffmpeg(cmd, total_seconds, lambda r: self.progress_updated.emit(int(r * 99)),
+                           stdout_output=self.output.stdout)
+                rec.add(bytes_read=sum(os.path.getsize(p) for p in inputs),
+                        bytes_written=self.output.size(),
+                        frames=sum(frame_counts(durations, self.fps)))
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def compute_durations(self, images: List[ImageItem], total_audio_duration: float) -> List[float]:
+        """计算每张图片在最终视频中的持续时长（秒）。
+
+        有音频且至少两张图片时，按创建时间在时间范围内的位置占比映射到音频总时长；
+        否则每张图片 2 秒。
+        """
+        durations = []
+        # 如果有至少两张图片且有音频，则按创建时间映射比例计算每张持续时间
+        if total_audio_duration > 0 and len(images) >= 2:
+            times = [img.create_time for img in images]
+            t_min, t_max = min(times), max(times)
+            span = max(1.0, t_max - t_min)
+            # 为每张图片计算它相对于最早时间的百分比（0-1），然后以差分方式计算每张持续时间
+            rels = [(t - t_min) / span for t in times]
+            # durations as delta between consecutive rels scaled to total_audio_duration
+            for i in range(len(rels)):
+                if i == 0:
+                    # first image duration is rels[0] portion
+                    d = rels[0] * total_audio_duration
+                else:
+                    d = (rels[i] - rels[i - 1]) * total_audio_duration
+                # ensure minimum duration
+                durations.append(max(0.1, d))
+            # last image: give remaining time
+            consumed = sum(durations)
+            if consumed < total_audio_duration:
+                durations[-1] += total_audio_duration - consumed
+        else:
+            # 无音频或只有一张图片：平均分配，每张2秒（可调整）
+            durations = [2.0] * len(images)
+        return durations
+
+    def _probe_sizes(self, images: List[ImageItem]) -> List[tuple]:
+        """返回每张图片的 (宽, 高)；无法读取时为 (0, 0)。
+
+        优先使用导入时记录在 ImageItem 上的尺寸，其次查询元数据索引，最后才读取文件头。
+        """
+        sizes = [(img.width, img.height) for img in images]
+        missing = [i for i, (w, h) in enumerate(sizes) if w <= 0 or h <= 0]
+        if missing:
+            looked_up = lookup_sizes([images[i].path for i in missing])
+            for i, size in zip(missing, looked_up):
+                sizes[i] = size
+        return sizes
+
+    def plan_export(self, images: List[ImageItem], audios: List[AudioItem]):
+        """在不导出的情况下计算分辨率规划与预计编码成本（ResolutionPlan 或 None）。"""
+        total_audio_duration = sum(a.duration for a in audios) if audios else 0.0
+        durations = self.compute_durations(images, total_audio_duration)
+        sizes = self._probe_sizes(images)
+        return plan_resolution(sizes, self.resolution_preset, durations, self.fps)
 
     def _prog_callback(self, **kwargs):
         """proglog 回调：尝试从 kwargs 中获取完成比例并转换为 0-100。"""
@@ -0,0 +1,344 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional, Sequence, Tuple
+
+from PIL import Image as PILImage
+
+from utils.resource_utils import current_rss_bytes, release_free_heap
+from utils.yuv_utils import BLOCK_ROWS, i420_frame_size, image_to_i420
+
+# 阻塞等待时的轮询间隔（秒）：用于及时响应其他阶段的异常/停止
+_POLL = 0.1
+
+
+class ByteBudget:
+    """按字节计数的信号量：所有在途数据（解码图像 + 待写帧）的估计大小之和不超过 limit。
+
+    单项超过 limit 时不会缩小计数，而是等到预算完全空闲后独占执行（避免死锁），
+    此时实际占用会超过 limit，次数记在 oversize 中供调用方报告。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self.used = 0
+        self.peak = 0
+        self.oversize = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int, stop: Optional[threading.Event] = None, ready: Optional[Callable[[], bool]] = None) -> int:
+        """申请 n 字节，返回实际计入的字节数（即 n）。
+
+        ready 为额外的准入条件（如实际 RSS 未超限），只在仍有其他在途数据时生效，保证总能推进。
+        """
+        n = max(1, int(n))
+        with self._cond:
+            while self.used and (self.used + n > self.limit or (ready is not None and not ready())):
+                if stop is not None and stop.is_set():
+                    raise PipelineStopped()
+                self._cond.wait(_POLL)
+            if n > self.limit:
+                self.oversize += 1
+            self.used += n
+            self.peak = max(self.peak, self.used)
+        return n
+
+    def shrink(self, held: int, n: int) -> int:
+        """把已持有的 held 字节减少到 n（n 不大于 held），返回新的持有量。"""
+        n = min(int(held), max(0, int(n)))
+        self.release(held - n)
+        return n
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.used = max(0, self.used - int(n))
+            self._cond.notify_all()
+
+
+class PipelineStopped(Exception):
+    """流水线某阶段出错或被关闭后，用于通知其他阶段退出。"""
+
+
+def _fit_size(size: Tuple[int, int], target_size: Tuple[int, int]) -> Tuple[int, int]:
+    w, h = size
+    tw, th = target_size
+    if w <= tw and h <= th:
+        return w, h
+    scale = min(tw / w, th / h)
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def _draft_scale(path: str, size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    # JPEG 可用 draft 在 DCT 域按 1/2/4/8 缩小解码
+    w, h = size
+    tw, th = target_size
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        for s in (8, 4, 2):
+            if w // s >= tw and h // s >= th:
+                return s
+    return 1
+
+
+def estimate_decode_bytes(path: str, size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    """估计解码阶段的内存峰值：解码图像（PIL 每像素 4 字节；非 JPEG 另计转换为 RGB 的副本）、
+    两遍缩放的中间图像（新宽 x 原高）与缩小后的图像。JPEG 可用 draft 按 1/2/4/8 缩小解码，其余格式按原尺寸计。"""
+    w, h = size
+    if w <= 0 or h <= 0:
+        w, h = target_size
+    scale = _draft_scale(path, (w, h), target_size)
+    decoded = (w // scale) * (h // scale) * 4
+    if scale == 1 and not path.lower().endswith(('.jpg', '.jpeg')):
+        # 调色板/灰度/RGBA 等模式转换为 RGB 时原图与副本同时存在
+        decoded *= 2
+    fw, fh = _fit_size((w // scale, h // scale), target_size)
+    return decoded + fw * (h // scale) * 4 + fw * fh * 4
+
+
+def estimate_prepare_bytes(size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    """估计缩小后的图像在帧准备阶段的内存：图像本身（4 字节/像素）、转为 NumPy 的 RGB 副本（3 字节/像素）
+    与分块转换的 float32 临时数组（见 utils.yuv_utils.BLOCK_ROWS）；不含输出帧。"""
+    w, h = size
+    if w <= 0 or h <= 0:
+        w, h = target_size
+    fw, fh = _fit_size((w, h), target_size)
+    return fw * fh * 7 + BLOCK_ROWS * fw * 3 * 4 * 2
+
+
+def decode_for_target(path, target_size: Tuple[int, int], resample=None) -> PILImage.Image:
+    """解码一张图片并等比缩小到不超过 target_size（RGB）。JPEG 通过 draft 避免全尺寸解码；
+    本身已是 RGB 的图片不再复制一份。"""
+    if resample is None:
+        resample = getattr(PILImage, 'LANCZOS', getattr(PILImage, 'ANTIALIAS', 1))
+    with PILImage.open(path) as src:
+        try:
+            src.draft('RGB', target_size)
+        except Exception:
+            pass
+        if src.mode == 'RGB':
+            src.load()
+            im = src
+        else:
+            im = src.convert('RGB')
+    im.thumbnail(target_size, resample)
+    return im
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _default_source(idx: int, path: str):
+    return path
+
+
+class FramePipeline:
+    """有界内存的分阶段导出流水线：解码线程池 -> 帧准备（letterbox + I420） -> 编码写入。
+
+    - 各阶段之间使用有界队列，读盘、CPU 缩放与编码相互重叠
+    - 所有在途数据受 ByteBudget 约束：按顺序准入，每张图片按实际工作集计入预算（解码峰值、
+      帧准备的临时数组与输出帧），各阶段完成后缩减为下一阶段所需的量；峰值工作集不超过
+      memory_limit 字节，与输入张数无关（10,000 张 24 MP 图片同样适用）
+    - 另外采样进程 RSS：增长超过 memory_limit 时暂停准入新图片，直到在途数据释放
+      （覆盖分配器碎片等估算不到的部分）；单张图片的工作集超过 memory_limit 时独占执行，
+      记入 stats['budget_oversize']
+    - 任一阶段异常都会停止整个流水线，并在 run() 中重新抛出
+
+    source_for(idx, path) 返回交给 PIL 打开的对象（路径或文件类对象），便于接入预读阶段。
+    """
+
+    def __init__(self, paths: Sequence[str], repeats: Sequence[int], target_size: Tuple[int, int],
+                 sizes: Optional[Sequence[Tuple[int, int]]] = None, decode_workers: int = 2,
+                 memory_limit: int = 512 * 1024 * 1024, source_for: Optional[Callable] = None):
+        self.paths = list(paths)
+        self.repeats = list(repeats)
+        self.target_size = tuple(target_size)
+        self.sizes = list(sizes) if sizes else [(0, 0)] * len(self.paths)
+        self.decode_workers = max(1, int(decode_workers))
+        self.frame_bytes = i420_frame_size(*self.target_size)
+        # 预算至少容纳 2 帧，保证流水线可以推进
+        self.budget = ByteBudget(max(int(memory_limit), self.frame_bytes * 2))
+        self.source_for = source_for or _default_source
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._rss_base = 0
+        # 统计
+        self.stats = {
+            'decode_seconds': 0.0,
+            'prepare_seconds': 0.0,
+            'write_seconds': 0.0,
+            'writer_wait_seconds': 0.0,
+            'frames_prepared': 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    # ---- 内部阶段 ----
+    def _fail(self, exc: BaseException):
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+
+    def _add_stat(self, key: str, value: float):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _rss_ok(self) -> bool:
+        rss = current_rss_bytes()
+        # 超出时先把各 arena 中的空闲页归还系统再判断，释放后滞留的内存不应阻止准入
+        if rss and rss - self._rss_base > self.budget.limit and release_free_heap():
+            rss = current_rss_bytes()
+        return not rss or rss - self._rss_base <= self.budget.limit
+
+    def _admit(self, tasks: queue.Queue):
+        """按顺序为每张图片申请内存预算后放入解码任务队列（顺序准入避免乱序占满预算导致死锁）。"""
+        try:
+            for idx, path in enumerate(self.paths):
+                size = self.sizes[idx]
+                est = max(estimate_decode_bytes(path, size, self.target_size),
+                          estimate_prepare_bytes(size, self.target_size)) + self.frame_bytes
+                if self.source_for is not _default_source:
+                    # 预读的文件内容在解码期间仍在内存中
+                    est += _file_size(path)
+                held = self.budget.acquire(est, self._stop, ready=self._rss_ok)
+                self._put(tasks, (idx, path, held))
+            for _ in range(self.decode_workers):
+                self._put(tasks, None)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _decode(self, tasks: queue.Queue, decoded: queue.Queue):
+        try:
+            while True:
+                task = self._get(tasks)
+                if task is None:
+                    self._put(decoded, None)
+                    return
+                idx, path, held = task
+                t0 = time.perf_counter()
+                im = decode_for_target(self.source_for(idx, path), self.target_size)
+                self._add_stat('decode_seconds', time.perf_counter() - t0)
+                # 解码用的全尺寸图像已释放，只保留缩小后的图像与帧准备所需的量
+                held = self.budget.shrink(held, estimate_prepare_bytes(im.size, self.target_size) + self.frame_bytes)
+                self._put(decoded, (idx, im, held))
+                # 不在本线程中保留引用，否则空闲的解码线程会一直占着上一张图片
+                del im
+                # 全尺寸解码图像已释放，把空闲页归还系统
+                release_free_heap()
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _prepare(self, decoded: queue.Queue, frames: queue.Queue):
+        """按原始顺序重排解码结果，转换为 I420 帧后交给写入阶段。"""
+        try:
+            pending = {}
+            next_idx = 0
+            finished_workers = 0
+            while next_idx < len(self.paths):
+                if next_idx not in pending:
+                    item = self._get(decoded)
+                    if item is None:
+                        finished_workers += 1
+                        if finished_workers >= self.decode_workers and next_idx not in pending:
+                            raise RuntimeError("解码线程提前结束")
+                        continue
+                    pending[item[0]] = item
+                    del item
+                    continue
+                _, im, held = pending.pop(next_idx)
+                t0 = time.perf_counter()
+                frame = image_to_i420(im, self.target_size)
+                del im
+                # 缩小后的图像已释放：归还空闲页，使 RSS 与预算记账保持一致
+                release_free_heap()
+                held = self.budget.shrink(held, self.frame_bytes)
+                self._add_stat('prepare_seconds', time.perf_counter() - t0)
+                self._add_stat('frames_prepared', 1)
+                self._put(frames, (next_idx, frame, held))
+                del frame
+                next_idx += 1
+            self._put(frames, None)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    # ---- 对外接口 ----
+    def run(self, write_frame: Callable, progress: Optional[Callable[[int], None]] = None) -> None:
+        """在调用线程中执行写入阶段：write_frame(buf, repeat) 依次接收每张图片的 I420 帧。
+
+        progress(idx) 在每张图片写入后调用。任一阶段出错时抛出该异常。
+        """
+        depth = max(2, self.decode_workers * 2)
+        tasks = queue.Queue(maxsize=depth)
+        decoded = queue.Queue(maxsize=depth)
+        frames = queue.Queue(maxsize=2)
+        self._rss_base = current_rss_bytes()
+        threads = [threading.Thread(target=self._admit, args=(tasks,), name='pipeline-admit', daemon=True)]
+        threads += [threading.Thread(target=self._decode, args=(tasks, decoded), name=f'pipeline-decode-{i}', daemon=True)
+                    for i in range(self.decode_workers)]
+        threads.append(threading.Thread(target=self._prepare, args=(decoded, frames), name='pipeline-prepare', daemon=True))
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._get(frames)
+                self.stats['writer_wait_seconds'] += time.perf_counter() - t0
+                if item is None:
+                    break
+                idx, frame, held = item
+                del item
+                t0 = time.perf_counter()
+                write_frame(frame, self.repeats[idx])
+                self.stats['write_seconds'] += time.perf_counter() - t0
+                del frame
+                self.budget.release(held)
+                if progress is not None:
+                    progress(idx)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # 正常结束时各阶段已退出；出错时通知仍在等待的阶段尽快退出
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+        if self._error is not None:
+            raise self._error
+        self.stats['budget_limit_bytes'] = self.budget.limit
+        self.stats['budget_peak_bytes'] = self.budget.peak
+        self.stats['budget_oversize'] = self.budget.oversize
+
+    def stats_dict(self) -> dict:
+        out = dict(self.stats)
+        for k, v in out.items():
+            if isinstance(v, float):
+                out[k] = round(v, 4)
+        return out
@@ -0,0 +1,120 @@
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from core.ffmpeg_writer import audio_concat_parts
+from core.renditions import split_scale_graph
+
+# ffmpeg 可直接解码的图片扩展名 -> 解码器分组；同组图片可放入同一个 concat 列表
+FFMPEG_IMAGE_CODECS = {
+    '.jpg': 'mjpeg',
+    '.jpeg': 'mjpeg',
+    '.png': 'png',
+    '.bmp': 'bmp',
+}
+
+
+def ffmpeg_codec_for(path: str) -> Optional[str]:
+    """返回 ffmpeg 读取该图片所用的解码器分组；不在白名单中的格式返回 None（需走 PIL 回退）。"""
+    return FFMPEG_IMAGE_CODECS.get(os.path.splitext(path)[1].lower())
+
+
+def _quote_concat_path(path: str) -> str:
+    # ffconcat 单引号内为字面量，单引号本身需写成 '\''
+    return "'" + os.path.abspath(path).replace("'", "'\\''") + "'"
+
+
+def write_concat_list(list_path: str, paths: Sequence[str], durations: Sequence[float]) -> None:
+    """写出 ffconcat 列表：每张图片一条 file/duration；末尾重复最后一张，使其时长生效。"""
+    lines = ['ffconcat version 1.0']
+    for p, d in zip(paths, durations):
+        lines.append(f'file {_quote_concat_path(p)}')
+        lines.append(f'duration {float(d):.6f}')
+    if paths:
+        lines.append(f'file {_quote_concat_path(paths[-1])}')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def group_runs(paths: Sequence[str], durations: Sequence[float],
+               sizes: Optional[Sequence[Tuple[int, int]]] = None) -> List[Tuple[str, List[str], List[float]]]:
+    """把连续的同解码器、同尺寸图片分成若干段：[(codec, paths, durations), ...]。
+
+    ffmpeg 的 concat 解复用器要求同一列表内编码一致，混合 JPEG/PNG 时按段拆分为多个输入。
+    同一输入内尺寸变化时 ffmpeg 会重建滤镜图，fps 的补帧状态随之丢失，前一张图片只剩一帧；
+    因此给出 sizes 时尺寸变化也开始新的一段。
+    """
+    runs = []
+    last_key = None
+    for i, (p, d) in enumerate(zip(paths, durations)):
+        key = (ffmpeg_codec_for(p), tuple(sizes[i]) if sizes else None)
+        if runs and key == last_key:
+            runs[-1][1].append(p)
+            runs[-1][2].append(d)
+        else:
+            runs.append((key[0], [p], [d]))
+        last_key = key
+    return runs
+
+
+def scale_pad_chain(size: Tuple[int, int], fps: int) -> str:
+    """等比缩小进画布并居中加黑边的滤镜链（替代 PIL thumbnail + paste）。
+
+    与 PIL thumbnail 相同只缩小不放大：比画布小的图片保持原尺寸，四周加黑边。
+    """
+    w, h = size
+    return (f"scale=w='min({w},iw)':h='min({h},ih)':force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:color=black,"
+            f"setsar=1,fps={fps},format=yuv420p")
+
+
+def build_graph_command(ffmpeg_exe: str, list_paths: Sequence[str], size: Tuple[int, int], fps: int,
+                        output_path: str, audio_paths: Optional[Sequence[str]] = None,
+                        codec: str = 'libx264', extra_output_args: Optional[Sequence[str]] = None,
+                        segment_seconds: Optional[Sequence[float]] = None,
+                        chapters_path: Optional[str] = None,
+                        renditions: Sequence[Tuple[int, int]] = ()) -> List[str]:
+    """构造由 ffmpeg 完成解码、缩放、加边、编码与混流的完整命令。
+
+    list_paths 为各段的 ffconcat 列表文件；每段各自经过 scale/pad，再用 concat 滤镜首尾相接。
+    segment_seconds 为各段应有的时长，用于裁掉 ffconcat 末尾重复帧带来的多余时间。
+    chapters_path 为 FFMETADATA 章节文件，作为最后一个输入并映射为输出的章节。
+    renditions 为额外输出的缩小档位：加边后的画面经 split 复制后缩小，图片只解码一次。
+    """
+    cmd = [ffmpeg_exe, '-y', '-loglevel', 'error']
+    for lp in list_paths:
+        cmd += ['-f', 'concat', '-safe', '0', '-i', lp]
+    chain = scale_pad_chain(size, fps)
+    n = len(list_paths)
+    parts = []
+    for i in range(n):
+        trim = f',trim=duration={float(segment_seconds[i]):.6f}' if segment_seconds else ''
+        parts.append(f'[{i}:v:0]{chain}{trim}[v{i}]')
+    if n > 1:
+        parts.append(''.join(f'[v{i}]' for i in range(n)) + f'concat=n={n}:v=1:a=0[vout]')
+        vout = '[vout]'
+    else:
+        vout = '[v0]'
+    video_parts, video_labels = split_scale_graph(vout, renditions)
+    parts += video_parts
+    # 音频输入排在所有视频输入之后；多段音频的 concat 图并入同一个 filter_complex
+    audio_paths = list(audio_paths or [])
+    audio_inputs, audio_graph, audio_map = audio_concat_parts(audio_paths, first_input_index=n)
+    if audio_graph:
+        parts.append(audio_graph)
+    cmd += audio_inputs
+    if chapters_path:
+        cmd += ['-f', 'ffmetadata', '-i', chapters_path]
+    cmd += ['-filter_complex', ';'.join(parts)]
+    for label in video_labels:
+        cmd += ['-map', label]
+    if audio_map:
+        cmd += ['-map', audio_map]
+    if chapters_path:
+        cmd += ['-map_chapters', str(n + len(audio_paths))]
+    cmd += ['-c:v', codec, '-pix_fmt', 'yuv420p']
+    if audio_paths:
+        cmd += ['-c:a', 'aac']
+    cmd += list(extra_output_args or [])
+    cmd.append(output_path)
+    return cmd
+
@@ -0,0 +1,303 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from utils.file_utils import get_cache_dir
+from utils.log_utils import get_logger
+
+logger = get_logger('ffmpeg')
+
+# 磁盘缓存格式版本；探测内容变化时递增，旧缓存自动失效
+PROBE_SCHEMA = 1
+PROBE_CACHE_NAME = 'ffmpeg_probe.json'
+# 常见的手动安装位置（在环境变量、配置路径、imageio-ffmpeg 与 PATH 都找不到时才使用）
+KNOWN_LOCATIONS = (
+    r"D:\Program Files\ffmpeg\bin\ffmpeg.exe",
+    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
+    r"C:\ffmpeg\bin\ffmpeg.exe",
+    '/opt/homebrew/bin/ffmpeg',
+    '/usr/local/bin/ffmpeg',
+    '/usr/bin/ffmpeg',
+)
+_PROBE_TIMEOUT = 15
+
+# 各 ffmpeg 导出后端依赖的能力（视频编码器另按所选编码器检查）；缺少任何一项时导出改走 moviepy
+BACKEND_REQUIREMENTS = {
+    'yuvpipe': {'demuxers': ('rawvideo',), 'encoders': ('aac',), 'filters': ('concat',)},
+    'ffmpeg': {'demuxers': ('concat',), 'encoders': ('aac',),
+               'filters': ('scale', 'pad', 'setsar', 'fps', 'format', 'trim', 'concat')},
+}
+
+
+@dataclass
+class FFmpegInfo:
+    """一个 ffmpeg 可执行文件及其能力（版本、编码器、封装/解封装格式、滤镜）。"""
+    path: str
+    source: str                     # 找到该文件的途径：env/config/imageio/path/known
+    mtime: float = 0.0
+    size: int = 0
+    version: str = ''
+    configuration: str = ''
+    encoders: Dict[str, str] = field(default_factory=dict)   # 名称 -> 类型（V/A/S）
+    muxers: List[str] = field(default_factory=list)
+    demuxers: List[str] = field(default_factory=list)
+    filters: List[str] = field(default_factory=list)
+    probe_seconds: float = 0.0
+    from_cache: bool = False
+
+    def has_encoder(self, name: str) -> bool:
+        return name in self.encoders
+
+    def has_muxer(self, name: str) -> bool:
+        return name in self.muxers
+
+    def has_demuxer(self, name: str) -> bool:
+        return name in self.demuxers
+
+    def has_filters(self, *names: str) -> bool:
+        return all(n in self.filters for n in names)
+
+    def missing_for(self, backend: str, video_codec: str = 'libx264') -> List[str]:
+        """返回该导出后端（使用 video_codec 编码时）所需但本 ffmpeg 缺少的能力，例如 ['encoder:libx264']；
+        全部具备时为空列表。"""
+        needs = dict(BACKEND_REQUIREMENTS.get(backend, {}))
+        if needs:
+            needs['encoders'] = (video_codec,) + tuple(needs.get('encoders', ()))
+        have = {'demuxers': self.demuxers, 'encoders': self.encoders, 'filters': self.filters}
+        return [f"{kind[:-1]}:{name}" for kind, names in needs.items() for name in names if name not in have[kind]]
+
+    def video_encoders(self) -> List[str]:
+        return sorted(n for n, kind in self.encoders.items() if kind == 'V')
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def summary(self) -> dict:
+        """写入诊断日志的简要信息（不含完整的编码器/滤镜列表）。"""
+        return {
+            'path': self.path,
+            'source': self.source,
+            'version': self.version,
+            'from_cache': self.from_cache,
+            'probe_seconds': round(self.probe_seconds, 3),
+            'encoders': len(self.encoders),
+            'muxers': len(self.muxers),
+            'filters': len(self.filters),
+            'h264_encoders': [n for n in self.video_encoders() if 'h264' in n or n.startswith('libx264')],
+        }
+
+
+def _configured_paths() -> List[str]:
+    # JPEG2MPEG_FFMPEG_PATHS：以 os.pathsep 分隔的 ffmpeg 文件或所在目录
+    out = []
+    for entry in os.environ.get('JPEG2MPEG_FFMPEG_PATHS', '').split(os.pathsep):
+        entry = entry.strip().strip('"')
+        if not entry:
+            continue
+        if os.path.isdir(entry):
+            entry = os.path.join(entry, 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg')
+        out.append(entry)
+    return out
+
+
+def _imageio_ffmpeg_path() -> Optional[str]:
+    if os.environ.get('IMAGEIO_FFMPEG_EXE'):
+        # 已显式指定时 imageio-ffmpeg 只会原样返回该值，按 env 候选处理
+        return None
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def candidate_paths() -> List[Tuple[str, str]]:
+    """按优先级返回 [(来源, 路径)]：环境变量、配置路径、imageio-ffmpeg 自带版本、PATH、常见安装位置。"""
+    candidates = []
+    for key in ('IMAGEIO_FFMPEG_EXE', 'FFMPEG_BINARY'):
+        value = os.environ.get(key)
+        if value and value not in ('ffmpeg-imageio', 'auto-detect'):
+            candidates.append(('env', value))
+    candidates += [('config', p) for p in _configured_paths()]
+    bundled = _imageio_ffmpeg_path()
+    if bundled:
+        candidates.append(('imageio', bundled))
+    on_path = shutil.which('ffmpeg')
+    if on_path:
+        candidates.append(('path', on_path))
+    candidates += [('known', p) for p in KNOWN_LOCATIONS]
+    seen = set()
+    unique = []
+    for source, p in candidates:
+        key = os.path.normcase(os.path.abspath(p))
+        if key not in seen:
+            seen.add(key)
+            unique.append((source, p))
+    return unique
+
+
+def _run(exe: str, *args: str) -> str:
+    kwargs = {}
+    if sys.platform.startswith('win'):
+        kwargs['creationflags'] = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    proc = subprocess.run([exe, '-hide_banner', *args], stdin=subprocess.DEVNULL, capture_output=True,
+                          timeout=_PROBE_TIMEOUT, **kwargs)
+    return proc.stdout.decode('utf-8', errors='replace')
+
+
+def _after_separator(text: str) -> List[List[str]]:
+    # -encoders / -muxers / -demuxers 的列表位于 " ---" 分隔行之后
+    rows = []
+    started = False
+    for line in text.splitlines():
+        if not started:
+            started = line.strip().startswith('--')
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            rows.append(parts)
+    return rows
+
+
+def parse_encoders(text: str) -> Dict[str, str]:
+    return {parts[1]: parts[0][0] for parts in _after_separator(text) if parts[0][0] in 'VAS'}
+
+
+def parse_formats(text: str) -> List[str]:
+    names = []
+    for parts in _after_separator(text):
+        names.extend(n for n in parts[1].split(',') if n)
+    return sorted(set(names))
+
+
+_FILTER_FLAGS = re.compile(r'^[T.][S.][C.]$')
+
+
+def parse_filters(text: str) -> List[str]:
+    names = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and _FILTER_FLAGS.match(parts[0]) and '->' in parts[2]:
+            names.append(parts[1])
+    return sorted(set(names))
+
+
+def probe_ffmpeg(exe: str, source: str = '') -> FFmpegInfo:
+    """运行 ffmpeg 读取版本与能力列表；无法执行时抛出 OSError / subprocess.SubprocessError。"""
+    t0 = time.perf_counter()
+    st = os.stat(exe)
+    version_text = _run(exe, '-version')
+    if not version_text.startswith('ffmpeg version'):
+        raise OSError(f"不是 ffmpeg 可执行文件：{exe}")
+    lines = version_text.splitlines()
+    configuration = next((ln[len('configuration:'):].strip() for ln in lines if ln.startswith('configuration:')), '')
+    return FFmpegInfo(
+        path=exe,
+        source=source,
+        mtime=st.st_mtime,
+        size=st.st_size,
+        version=lines[0].split()[2] if len(lines[0].split()) > 2 else '',
+        configuration=configuration,
+        encoders=parse_encoders(_run(exe, '-encoders')),
+        muxers=parse_formats(_run(exe, '-muxers')),
+        demuxers=parse_formats(_run(exe, '-demuxers')),
+        filters=parse_filters(_run(exe, '-filters')),
+        probe_seconds=time.perf_counter() - t0,
+    )
+
+
+def _cache_path() -> str:
+    return os.path.join(get_cache_dir(), PROBE_CACHE_NAME)
+
+
+def _cache_key(path: str, st: os.stat_result) -> str:
+    return f"{os.path.normcase(os.path.realpath(path))}|{st.st_mtime_ns}|{st.st_size}"
+
+
+def _load_cache() -> dict:
+    try:
+        with open(_cache_path(), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('schema') == PROBE_SCHEMA:
+            return data.get('entries', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save_cache(entries: dict) -> None:
+    path = _cache_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'schema': PROBE_SCHEMA, 'entries': entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("写入 ffmpeg 探测缓存失败：%s", path, exc_info=True)
+
+
+_located: Optional[FFmpegInfo] = None
+_lock = threading.Lock()
+
+
+def locate_ffmpeg(refresh: bool = False) -> Optional[FFmpegInfo]:
+    """返回第一个可用的 ffmpeg 及其能力；找不到时返回 None。
+
+    结果在进程内缓存；探测结果还按（真实路径, mtime, 大小）缓存在磁盘上，
+    之后的启动只需 stat 候选文件即可，ffmpeg 升级或替换后自动重新探测。refresh=True 时忽略两级缓存。
+    """
+    global _located
+    with _lock:
+        if _located is not None and not refresh:
+            return _located
+        entries = {} if refresh else _load_cache()
+        for source, path in candidate_paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            key = _cache_key(path, st)
+            cached = entries.get(key)
+            if cached and 'error' in cached:
+                # 同一文件之前探测失败过（文件未变化），不再重复运行
+                continue
+            if cached:
+                info = FFmpegInfo(**{**cached, 'path': path, 'source': source, 'from_cache': True})
+            else:
+                try:
+                    info = probe_ffmpeg(path, source)
+                    entry = info.to_dict()
+                except (OSError, subprocess.SubprocessError, ValueError, IndexError) as e:
+                    logger.warning("ffmpeg 探测失败，跳过 %s：%s", path, e)
+                    info, entry = None, {'error': str(e)}
+                # 只保留仍存在的条目，避免缓存无限增长
+                entries = {k: v for k, v in entries.items() if os.path.exists(k.split('|')[0])}
+                entries[key] = entry
+                _save_cache(entries)
+                if info is None:
+                    continue
+                logger.info("已探测 ffmpeg %s（%s）：%d 个编码器，%d 个滤镜，用时 %.2f 秒",
+                            info.version, path, len(info.encoders), len(info.filters), info.probe_seconds)
+            _located = info
+            return info
+        logger.warning("未找到可用的 ffmpeg")
+        return None
+
+
+def configure_ffmpeg_env(info: Optional[FFmpegInfo]) -> None:
+    """把找到的 ffmpeg 告知 imageio-ffmpeg / moviepy（须在导入 moviepy 之前调用）。
+
+    只设置 IMAGEIO_FFMPEG_EXE（moviepy 默认经由 imageio-ffmpeg 取得路径）；
+    不设置 FFMPEG_BINARY，否则 moviepy 会在导入时再运行一次 ffmpeg 校验。
+    """
+    if info is not None and not os.environ.get('IMAGEIO_FFMPEG_EXE'):
+        os.environ['IMAGEIO_FFMPEG_EXE'] = info.path
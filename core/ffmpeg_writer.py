@@ -0,0 +1,201 @@
+import subprocess
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from core.ffmpeg_locator import locate_ffmpeg
+from core.renditions import split_scale_graph
+
+
+def find_ffmpeg_exe() -> str:
+    """返回 ffmpeg 可执行文件路径（见 core.ffmpeg_locator.locate_ffmpeg）；都找不到时返回 'ffmpeg'。"""
+    info = locate_ffmpeg()
+    return info.path if info is not None else 'ffmpeg'
+
+
+def frame_counts(durations: Sequence[float], fps: int) -> List[int]:
+    """把每张图片的持续时长换算为帧数。
+
+    按累计时长取整计算边界，避免逐张取整造成的累计漂移；每张图片至少 1 帧。
+    """
+    counts = []
+    elapsed = 0.0
+    prev_frame = 0
+    for d in durations:
+        elapsed += float(d)
+        end_frame = max(prev_frame + 1, int(round(elapsed * fps)))
+        counts.append(end_frame - prev_frame)
+        prev_frame = end_frame
+    return counts
+
+
+def audio_concat_parts(audio_paths: Sequence[str], first_input_index: int = 1):
+    """把多个音频合并为一条音轨所需的 ffmpeg 片段。
+
+    返回 (输入参数列表, 滤镜图或 None, -map 目标)；没有音频时返回 ([], None, None)。
+    """
+    if not audio_paths:
+        return [], None, None
+    inputs = []
+    for p in audio_paths:
+        inputs += ['-i', p]
+    if len(audio_paths) == 1:
+        return inputs, None, f'{first_input_index}:a:0'
+    labels = ''.join(f'[{first_input_index + i}:a:0]' for i in range(len(audio_paths)))
+    graph = f'{labels}concat=n={len(audio_paths)}:v=0:a=1[aout]'
+    return inputs, graph, '[aout]'
+
+
+def audio_concat_args(audio_paths: Sequence[str], first_input_index: int = 1) -> List[str]:
+    """生成把多个音频输入合并为一条音轨的 ffmpeg 参数（输入与 -map）。"""
+    inputs, graph, target = audio_concat_parts(audio_paths, first_input_index)
+    if target is None:
+        return []
+    args = list(inputs)
+    if graph:
+        args += ['-filter_complex', graph]
+    return args + ['-map', target]
+
+
+class RawVideoPipeWriter:
+    """通过 stdin 管道向 ffmpeg 写入原始帧（默认 yuv420p），并与音频合成输出文件。
+
+    用法：
+        with RawVideoPipeWriter(out, (w, h), fps, audio_paths) as writer:
+            writer.write_frame(buf, repeat=n)
+    """
+
+    def __init__(self, output_path: str, size, fps: int = 24, audio_paths: Optional[Sequence[str]] = None,
+                 pix_fmt: str = 'yuv420p', codec: str = 'libx264', ffmpeg_exe: Optional[str] = None,
+                 extra_output_args: Optional[Sequence[str]] = None, chapters_path: Optional[str] = None,
+                 renditions: Sequence[Tuple[int, int]] = ()):
+        # renditions：由同一路输入帧额外缩小出的各档尺寸（见 core.renditions），作为第 2、3…路视频流输出
+        self.output_path = output_path
+        self.width, self.height = int(size[0]), int(size[1])
+        self.fps = int(fps)
+        self.pix_fmt = pix_fmt
+        self.ffmpeg_exe = ffmpeg_exe or find_ffmpeg_exe()
+        self.frames_written = 0
+        self.bytes_written = 0
+        cmd = [self.ffmpeg_exe, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+               '-s', f'{self.width}x{self.height}', '-r', str(self.fps), '-i', '-']
+        audio_paths = list(audio_paths or [])
+        audio_inputs, audio_graph, audio_map = audio_concat_parts(audio_paths)
+        cmd += audio_inputs
+        if chapters_path:
+            # 章节（FFMETADATA）作为最后一个输入；输入参数须位于所有输出参数之前
+            cmd += ['-f', 'ffmetadata', '-i', chapters_path]
+        video_parts, video_maps = split_scale_graph('[0:v:0]', renditions) if renditions else ([], ['0:v:0'])
+        graph = ';'.join(video_parts + ([audio_graph] if audio_graph else []))
+        if graph:
+            cmd += ['-filter_complex', graph]
+        # 视频流在前、音频在后，与 ffmpeg 滤镜图后端和 moviepy 的输出流顺序一致
+        for target in video_maps:
+            cmd += ['-map', target]
+        if audio_map:
+            cmd += ['-map', audio_map]
+        if chapters_path:
+            cmd += ['-map_chapters', str(1 + len(audio_paths))]
+        cmd += ['-c:v', codec, '-pix_fmt', 'yuv420p']
+        if audio_paths:
+            cmd += ['-c:a', 'aac']
+        cmd += list(extra_output_args or [])
+        cmd.append(output_path)
+        self.cmd = cmd
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        # stderr 在后台读取：避免缓冲区写满导致死锁，ffmpeg 提前退出时也能取得其错误输出
+        self._err_chunks = []
+        self._err_thread = threading.Thread(target=lambda: self._err_chunks.append(self._proc.stderr.read()),
+                                            daemon=True)
+        self._err_thread.start()
+
+    def _stderr_text(self) -> str:
+        self._err_thread.join(timeout=5)
+        return b''.join(c for c in self._err_chunks if c).decode('utf-8', errors='replace')
+
+    def write_frame(self, frame, repeat: int = 1):
+        """写入一帧（bytes 或 numpy 缓冲区）；repeat 为重复写入次数（静态图片按时长重复）。
+
+        ffmpeg 提前退出（编码器不存在、参数错误、磁盘已满等）时抛出 RuntimeError，附带其错误输出。
+        """
+        data = memoryview(frame).cast('B')
+        try:
+            for _ in range(max(1, int(repeat))):
+                self._proc.stdin.write(data)
+                self.frames_written += 1
+                self.bytes_written += len(data)
+        except (BrokenPipeError, OSError) as e:
+            proc, self._proc = self._proc, None
+            code = proc.wait()
+            raise RuntimeError(f"ffmpeg 提前退出（退出码 {code}）: {self._stderr_text().strip()[-2000:]}") from e
+
+    def close(self) -> None:
+        """关闭管道并等待 ffmpeg 结束；ffmpeg 返回非零时抛出 RuntimeError（附带其错误输出）。"""
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        code = proc.wait()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {code}: {self._stderr_text().strip()[-2000:]}")
+
+    def abort(self) -> None:
+        """异常时终止 ffmpeg 进程。"""
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        try:
+            proc.kill()
+            proc.wait()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def run_ffmpeg(cmd: Sequence[str], total_seconds: float = 0.0, progress_callback=None,
+               stdout_output: bool = False) -> None:
+    """运行一条 ffmpeg 命令，解析 `-progress pipe:1` 输出并以 0-1 比例回调进度。
+
+    cmd 中不需要包含 -progress 参数（会自动插入）；ffmpeg 返回非零时抛出 RuntimeError。
+    stdout_output=True 表示视频写入标准输出（pipe:1）：ffmpeg 直接继承本进程的标准输出，不解析进度。
+    """
+    if stdout_output:
+        proc = subprocess.Popen(list(cmd), stderr=subprocess.PIPE)
+        _, err = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}: {err.decode('utf-8', errors='replace').strip()[-2000:]}")
+        return
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stderr 在后台读取，避免缓冲区写满导致死锁
+    err_chunks = []
+    t = threading.Thread(target=lambda: err_chunks.append(proc.stderr.read()), daemon=True)
+    t.start()
+    for raw in proc.stdout:
+        line = raw.decode('utf-8', errors='replace').strip()
+        if progress_callback is None or total_seconds <= 0:
+            continue
+        if line.startswith('out_time_us=') or line.startswith('out_time_ms='):
+            try:
+                # out_time_ms 实际单位也是微秒（ffmpeg 的历史遗留）
+                us = int(line.split('=', 1)[1])
+                progress_callback(min(1.0, us / 1e6 / total_seconds))
+            except ValueError:
+                pass
+    code = proc.wait()
+    t.join(timeout=5)
+    if code != 0:
+        err = b''.join(c for c in err_chunks if c).decode('utf-8', errors='replace')
+        raise RuntimeError(f"ffmpeg 退出码 {code}: {err.strip()[-2000:]}")
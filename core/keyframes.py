@@ -0,0 +1,106 @@
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+from core.ffmpeg_writer import frame_counts
+
+# 图片切换之间的最大关键帧间隔（秒）；静态画面内不需要更多关键帧，拖动进度条时落在本张图片的首帧即可
+MAX_GOP_SECONDS = 30
+# 关键帧时间列表超过该长度时改为从文件读取（ffmpeg 7 的 -/option 语法），避免 Windows 命令行长度限制
+_INLINE_LIMIT = 4000
+# 支持章节的容器
+CHAPTER_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.mkv')
+
+
+@dataclass
+class ImageBoundaries:
+    """每张图片在输出视频中的首帧序号（与 frame_counts 的取整一致）。"""
+    fps: int
+    start_frames: List[int] = field(default_factory=list)
+    total_frames: int = 0
+
+    def start_times(self) -> List[float]:
+        return [n / self.fps for n in self.start_frames]
+
+    def end_frames(self) -> List[int]:
+        return self.start_frames[1:] + [self.total_frames]
+
+
+def image_boundaries(durations: Sequence[float], fps: int) -> ImageBoundaries:
+    bounds = ImageBoundaries(fps=int(fps))
+    frame = 0
+    for n in frame_counts(durations, fps):
+        bounds.start_frames.append(frame)
+        frame += n
+    bounds.total_frames = frame
+    return bounds
+
+
+def ffmpeg_supports_option_files(version: str) -> bool:
+    """ffmpeg 7.0 起支持 -/option 从文件读取参数值；git 构建（N-xxxxx）视为支持。"""
+    text = (version or '').lstrip('nN')
+    if text.startswith('-'):
+        return True
+    try:
+        return int(text.split('.')[0].split('-')[0]) >= 7
+    except ValueError:
+        return False
+
+
+def keyframe_args(bounds: ImageBoundaries, work_dir: str, option_files: bool,
+                  max_gop_seconds: float = MAX_GOP_SECONDS, video_streams: int = 1) -> List[str]:
+    """在每张图片的首帧强制关键帧，其余位置使用长 GOP 的编码参数。
+
+    时间取首帧前半帧（ffmpeg 在第一帧 pts >= 该时间处插入关键帧），避免浮点误差落到相邻帧。
+    video_streams > 1（多档位输出）时逐路指定 -force_key_frames:v:N：ffmpeg 7.0 中不带流说明符的
+    关键帧列表只对第一路视频完整生效。
+    """
+    fps = bounds.fps
+    times = ','.join('0' if n == 0 else f"{(n - 0.5) / fps:.6f}" for n in bounds.start_frames)
+    args = ['-g', str(max(1, int(max_gop_seconds * fps)))]
+    option, value = '-force_key_frames', times
+    if len(times) > _INLINE_LIMIT and option_files:
+        value = os.path.join(work_dir, 'keyframes.txt')
+        with open(value, 'w', encoding='utf-8') as f:
+            f.write(times)
+        option = '-/force_key_frames'
+    if video_streams <= 1:
+        return args + [option, value]
+    for i in range(video_streams):
+        args += [f'{option}:v:{i}', value]
+    return args
+
+
+def _escape_metadata(text: str) -> str:
+    # FFMETADATA 中 '=', ';', '#', '\\' 与换行须以反斜杠转义
+    for ch in ('\\', '=', ';', '#', '\n'):
+        text = text.replace(ch, '\\' + ch)
+    return text
+
+
+def write_chapters(path: str, titles: Sequence[str], bounds: ImageBoundaries) -> None:
+    """把每张图片写为一个章节（FFMETADATA 格式，时间基为 1/fps，与帧边界完全对齐）。"""
+    lines = [';FFMETADATA1']
+    for title, start, end in zip(titles, bounds.start_frames, bounds.end_frames()):
+        lines += ['[CHAPTER]', f'TIMEBASE=1/{bounds.fps}', f'START={start}', f'END={end}',
+                  f'title={_escape_metadata(title)}']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def add_chapters(ffmpeg_exe: str, video_path: str, chapters_path: str, extra_output_args: Sequence[str] = ()) -> None:
+    """以流复制方式把章节写入已生成的视频文件（moviepy 后端无法在编码命令中附加输入时使用）。
+
+    extra_output_args 为需要保留的封装参数（如 -movflags +faststart）。"""
+    root, ext = os.path.splitext(video_path)
+    tmp = f"{root}.chapters{ext}"
+    cmd = [ffmpeg_exe, '-y', '-loglevel', 'error', '-i', video_path, '-f', 'ffmetadata', '-i', chapters_path,
+           '-map', '0', '-map_chapters', '1', '-c', 'copy', *extra_output_args, tmp]
+    proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+    if proc.returncode != 0:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        err = proc.stderr.decode('utf-8', errors='replace')
+        raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}: {err.strip()[-2000:]}")
+    os.replace(tmp, video_path)
@@ -1,15 +1,40 @@
+import dataclasses
 import os
+import stat
 import time
-import traceback
-from typing import List
-from PyQt5.QtCore import QObject, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from PIL import Image as PILImage
 
 # 绝对导入 utils 包
-from utils.file_utils import validate_local_file, is_image_file, is_audio_file
-from utils.image_utils import generate_thumbnail
+from utils.file_utils import (validate_local_file, is_local_path, is_image_file, is_audio_file,
+                              iter_media_files, iter_batches, IMAGE_EXTS,
+                              classify_files, sniff_file, media_kind)
+from utils.image_utils import (generate_thumbnail, thumbnail_png_from_image,
+                               pixmap_from_png, THUMB_SIZE)
 from utils.audio_utils import get_audio_duration
+from utils.exif_utils import read_capture_times
+from utils.fingerprint import fingerprint_many
+from utils.log_utils import get_logger
+from utils.profiling import profiled
 from core.models import ImageItem, AudioItem
+from core.metadata_index import get_metadata_index, read_image_header
+
+
+logger = get_logger('media_manager')
+
+
+@dataclasses.dataclass
+class _ImportScan:
+    """一批图片导入中不涉及界面对象的部分（stat、类型嗅探、拍摄时间、索引查询与指纹），可在后台线程完成。"""
+    paths: List[str]
+    stats: Dict[str, os.stat_result]
+    kinds: Dict[str, Optional[str]]
+    captures: Dict[str, Optional[float]]
+    cached: Dict[str, object]
+    fingerprints: Dict[str, Optional[str]]
 
 
 class MediaManager(QObject):
@@ -17,77 +42,249 @@ class MediaManager(QObject):
     image_list_changed = pyqtSignal(list)        # 传递 ImageItem 列表
     audio_list_changed = pyqtSignal(list)        # 传递 AudioItem 列表
     audio_duration_changed = pyqtSignal(float)   # 总音频时长（秒）
+    folder_scan_progress = pyqtSignal(int, bool)  # 分批导入（文件夹/对话框/拖放）：已扫描的图片数，是否完成
+
+    # 分批导入时每批的文件数
+    FOLDER_BATCH_SIZE = 500
+    # 等待后台扫描完成时轮询的间隔（毫秒）
+    IMPORT_POLL_MS = 15
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image_items: List[ImageItem] = []
         self.audio_items: List[AudioItem] = []
         self.sort_mode = "按修改日期"
+        # 图片时间来源：'exif'（拍摄时间，缺失时回退到修改日期）| 'mtime'
+        self.time_source = os.environ.get('JPEG2MPEG_TIME_SOURCE', 'exif')
+        self._folder_jobs = []
+        self._scan_executor: Optional[ThreadPoolExecutor] = None
 
     def add_images_from_dialog(self):
         """通过文件对话框添加图片（多选）。"""
-        files, _ = QFileDialog.getOpenFileNames(None, "选择图片文件", "", "图片文件 (*.png *.jpg *.jpeg *.bmp);;所有文件 (*)")
+        files, _ = QFileDialog.getOpenFileNames(None, "选择图片文件", "", "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif *.tif *.tiff *.webp);;所有文件 (*)")
         if not files:
             return
-        self.add_image_files(files)
+        self.queue_image_files(files)
 
     def add_folder(self):
-        """添加文件夹内的图片文件（非递归）。"""
+        """添加文件夹（含子文件夹）内的图片文件。"""
         folder = QFileDialog.getExistingDirectory(None, "选择文件夹")
         if not folder:
             return
-        candidates = [os.path.join(folder, f) for f in os.listdir(folder)]
-        self.add_image_files(candidates)
+        self.add_folder_path(folder)
+
+    def add_folder_path(self, folder: str, recursive: bool = True):
+        """流式导入文件夹中的图片：os.scandir 逐目录扫描，每批 FOLDER_BATCH_SIZE 个文件交给导入，
+        批与批之间回到事件循环，大目录树（数十万文件）扫描时界面不会卡住。"""
+        self._queue_batches(iter_batches(iter_media_files(folder, IMAGE_EXTS, recursive), self.FOLDER_BATCH_SIZE))
+
+    def queue_image_files(self, paths: List[str]):
+        """分批导入图片文件（对话框、拖放）：与文件夹导入相同，一次选中数千个文件时界面也不会卡住。"""
+        self._queue_batches(iter_batches(((p, None) for p in paths), self.FOLDER_BATCH_SIZE))
+
+    def _queue_batches(self, batches):
+        self._folder_jobs.append({'batches': batches, 'count': 0, 'future': None})
+        if len(self._folder_jobs) == 1:
+            QTimer.singleShot(0, self._ingest_next_batch)
+
+    def _scan_next(self, job) -> Optional[_ImportScan]:
+        """后台线程：取出下一批（文件夹导入时包括目录扫描本身）并完成其 I/O 部分；没有更多批次时返回 None。"""
+        batch = next(job['batches'], None)
+        if batch is None:
+            return None
+        return self._scan_images([p for p, _ in batch], {p: st for p, st in batch if st is not None})
+
+    def _ingest_next_batch(self):
+        """每批的扫描与指纹计算在后台线程中进行，界面线程只轮询结果并生成缩略图、列表项；
+        当前批生成缩略图时，下一批已在后台扫描。"""
+        if not self._folder_jobs:
+            return
+        job = self._folder_jobs[0]
+        if self._scan_executor is None:
+            self._scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import-scan')
+        if job['future'] is None:
+            job['future'] = self._scan_executor.submit(self._scan_next, job)
+        if not job['future'].done():
+            QTimer.singleShot(self.IMPORT_POLL_MS, self._ingest_next_batch)
+            return
+        future, job['future'] = job['future'], None
+        try:
+            scan = future.result()
+        except Exception:
+            logger.exception("扫描导入批次失败，停止本次导入")
+            scan = None
+        if scan is None:
+            self._folder_jobs.pop(0)
+            self.folder_scan_progress.emit(job['count'], True)
+        else:
+            job['future'] = self._scan_executor.submit(self._scan_next, job)
+            job['count'] += len(scan.paths)
+            self._add_scanned(scan)
+            self.folder_scan_progress.emit(job['count'], False)
+        if self._folder_jobs:
+            QTimer.singleShot(0, self._ingest_next_batch)
+
+    @profiled('add_image_files')
+    def add_image_files(self, paths: List[str], stats: Optional[Dict[str, os.stat_result]] = None):
+        """批量添加图片文件（路径列表），同步完成。忽略非本地或非图片文件。
+
+        stats 可提供已知的 stat 结果（例如目录扫描时的 DirEntry），此时不再重复 stat。
+        每个文件最多 stat 一次；元数据索引命中时不读取文件头，未命中时打开一次同时读取头信息与生成缩略图。
+        索引按路径未命中时计算内容指纹（只读头尾各 64 KiB），改名/移动过的文件凭指纹复用元数据与缩略图缓存。
+        界面中的导入走 queue_image_files / add_folder_path，扫描与指纹在后台线程完成。
+        """
+        self._add_scanned(self._scan_images(paths, stats))
 
-    def add_image_files(self, paths: List[str]):
-        """批量添加图片文件（路径列表）。忽略非本地或非图片文件。"""
+    def _scan_images(self, paths: List[str], stats: Optional[Dict[str, os.stat_result]] = None) -> _ImportScan:
+        """导入的 I/O 部分，不创建界面对象，可在后台线程调用（元数据索引自带锁）。"""
+        index = get_metadata_index()
+        stats = dict(stats) if stats else {}
+        # 先按文件头批量识别内容类型，扩展名正确但内容不是图片的文件在此直接拒绝
+        kinds = classify_files([p for p in paths if is_image_file(p)], stats)
+        candidates = [p for p, k in kinds.items() if media_kind(k) == 'image']
+        for p in candidates:
+            # 对话框/拖放导入不带 stat：先补齐，否则索引校验无从比较，每个文件都会被当作未命中
+            if p not in stats:
+                try:
+                    stats[p] = os.stat(p)
+                except OSError:
+                    pass
+        cached = {}
+        fingerprints = {}
+        if index is not None:
+            # 批量并行读取拍摄时间（索引命中不读文件，否则只读 EXIF APP1 段）
+            captures = index.capture_times(candidates, stats)
+            # 按路径查询一次索引，size/mtime 不一致的记录视为未命中
+            for p, meta in index.get_many(candidates).items():
+                st = stats.get(p)
+                if st is not None and meta.size == st.st_size and meta.mtime == st.st_mtime:
+                    cached[p] = meta
+            # 按路径未命中（新文件、改名或内容变化）的文件并行计算指纹
+            fingerprints = fingerprint_many([p for p in candidates if p not in cached], stats)
+        else:
+            captures = read_capture_times(candidates)
+        return _ImportScan(list(paths), stats, kinds, captures, cached, fingerprints)
+
+    @profiled('import_batch')
+    def _add_scanned(self, scan: _ImportScan):
+        """导入的界面部分：生成缩略图与 ImageItem（QPixmap 须在界面线程创建），写回索引并通知列表更新。"""
+        paths, stats, kinds, captures = scan.paths, scan.stats, scan.kinds, scan.captures
+        index = get_metadata_index()
         new_items = []
+        failures = []
+        fresh_meta = []
+        fresh_thumbs = []
         for p in paths:
             try:
-                # 打印验证信息，便于调试（会输出到终端）
                 try:
-                    exists = validate_local_file(p)
-                except Exception as _e:
+                    st = stats.get(p) if stats else None
+                    if st is None:
+                        st = os.stat(p) if is_local_path(p) else None
+                    exists = st is not None and stat.S_ISREG(st.st_mode)
+                except OSError:
+                    st = None
                     exists = False
                 try:
                     is_img = is_image_file(p)
                 except Exception:
                     is_img = False
-                print(f"[MediaManager] add_image_files: path={p!r} exists={exists} is_image={is_img}")
+                logger.debug("add_image_files: path=%r exists=%s is_image=%s", p, exists, is_img)
 
                 if not exists or not is_img:
                     continue
+                if media_kind(kinds.get(p)) != 'image':
+                    logger.warning("拒绝导入 %r：文件内容不是可识别的图片", p)
+                    continue
 
                 filename = os.path.basename(p)
-                size = os.path.getsize(p)
-                mtime = os.path.getmtime(p)
+                meta = scan.cached.get(p)
                 try:
-                    thumb = generate_thumbnail(p)
+                    fp = meta.fingerprint if meta is not None else scan.fingerprints.get(p)
+                    if meta is None and fp:
+                        # 路径未命中但内容相同（改名/移动）：复用旧记录，只更新路径与 stat
+                        moved = index.get_by_fingerprint(fp)
+                        if moved is not None:
+                            meta = dataclasses.replace(moved, path=p, size=st.st_size, mtime=st.st_mtime)
+                            fresh_meta.append(meta)
+                    png = index.get_thumbnail(fp, THUMB_SIZE) if index is not None and fp else None
+                    if png is not None:
+                        thumb = pixmap_from_png(png)
+                    elif meta is not None:
+                        with PILImage.open(p) as im:
+                            png = thumbnail_png_from_image(im)
+                        fresh_thumbs.append((fp, png))
+                        thumb = pixmap_from_png(png)
+                    else:
+                        with PILImage.open(p) as im:
+                            meta = read_image_header(im, p, st, captures.get(p))
+                            meta.fingerprint = fp
+                            fresh_meta.append(meta)
+                            png = thumbnail_png_from_image(im)
+                        fresh_thumbs.append((fp, png))
+                        thumb = pixmap_from_png(png)
                 except Exception:
                     # 记录详细回溯，返回占位缩略图
-                    print(f"[MediaManager] generate_thumbnail failed for {p}")
-                    traceback.print_exc()
+                    logger.warning("生成缩略图失败：%s", p, exc_info=True)
                     thumb = generate_thumbnail(None)  # 返回占位缩略图
 
-                item = ImageItem(path=p, thumbnail=thumb, filename=filename, create_time=mtime, size=size)
+                capture = captures.get(p)
+                if capture is None and meta is not None:
+                    capture = meta.capture_time
+                item = ImageItem(path=p, thumbnail=thumb, filename=filename, create_time=st.st_mtime, size=st.st_size,
+                                 mtime=st.st_mtime, capture_time=capture)
+                item.create_time = self._item_time(item)
+                if meta is not None:
+                    item.width, item.height = meta.width, meta.height
+                    item.fingerprint = meta.fingerprint
                 new_items.append(item)
             except Exception as e:
-                # 友好提示，但不崩溃；同时打印完整回溯以便定位问题
-                print(f"[MediaManager] Exception while adding image {p}: {e}")
-                traceback.print_exc()
-                try:
-                    QMessageBox.warning(None, "图片添加失败", f"无法添加 {p}: {e}")
-                except Exception:
-                    # 在非 GUI 上下文或显示失败时静默处理
-                    pass
+                # 不中断整批导入；回溯写入日志，失败文件在批次结束后统一提示一次
+                logger.error("添加图片失败：%s", p, exc_info=True)
+                failures.append(f"{p}: {e}")
+        if index is not None and fresh_meta:
+            try:
+                index.put_many(fresh_meta)
+                index.put_thumbnails(fresh_thumbs, THUMB_SIZE)
+            except Exception:
+                logger.exception("写入元数据索引失败")
+        logger.info("add_image_files: %d 个路径，导入 %d 张，新写入索引 %d 条，失败 %d 个",
+                    len(paths), len(new_items), len(fresh_meta), len(failures))
+        if failures:
+            self._warn_failures("图片添加失败", failures)
         if new_items:
             self.image_items.extend(new_items)
             self._sort_images()
             self.image_list_changed.emit(self.image_items)
 
+    @staticmethod
+    def _warn_failures(title: str, failures: List[str], limit: int = 5):
+        """一批文件中的失败合并为一个提示框（最多列出 limit 条）。"""
+        lines = failures[:limit]
+        if len(failures) > limit:
+            lines.append(f"……另有 {len(failures) - limit} 个文件")
+        try:
+            QMessageBox.warning(None, title, "无法添加以下文件：\n" + "\n".join(lines))
+        except Exception:
+            # 在非 GUI 上下文或显示失败时静默处理
+            pass
+
+    def _item_time(self, item: ImageItem) -> float:
+        """按当前时间来源返回图片时间：'exif' 优先拍摄时间，缺失时回退到修改日期。"""
+        if self.time_source == 'exif' and item.capture_time is not None:
+            return item.capture_time
+        return item.mtime
+
+    def set_time_source(self, source: str):
+        """切换图片时间来源（'exif' | 'mtime'），更新 create_time 并按需重新排序。"""
+        self.time_source = source
+        for item in self.image_items:
+            item.create_time = self._item_time(item)
+        self._sort_images()
+        self.image_list_changed.emit(self.image_items)
+
     def add_audio_from_dialog(self):
         """通过对话框添加音频文件。"""
-        files, _ = QFileDialog.getOpenFileNames(None, "选择音频文件", "", "音频文件 (*.mp3 *.wav *.ogg);;所有文件 (*)")
+        files, _ = QFileDialog.getOpenFileNames(None, "选择音频文件", "", "音频文件 (*.mp3 *.wav *.ogg *.m4a *.flac);;所有文件 (*)")
         if not files:
             return
         self.add_audio_files(files)
@@ -95,16 +292,23 @@ class MediaManager(QObject):
     def add_audio_files(self, paths: List[str]):
         """批量添加音频文件并计算时长。"""
         added = []
+        failures = []
         for p in paths:
             try:
                 if not validate_local_file(p) or not is_audio_file(p):
                     continue
+                if media_kind(sniff_file(p)) != 'audio':
+                    logger.warning("拒绝导入 %r：文件内容不是可识别的音频", p)
+                    continue
                 duration = get_audio_duration(p)
                 filename = os.path.basename(p)
                 item = AudioItem(path=p, duration=duration, filename=filename)
                 added.append(item)
             except Exception as e:
-                QMessageBox.warning(None, "音频添加失败", f"无法添加 {p}: {e}")
+                logger.error("添加音频失败：%s", p, exc_info=True)
+                failures.append(f"{p}: {e}")
+        if failures:
+            self._warn_failures("音频添加失败", failures)
         if added:
             self.audio_items.extend(added)
             self.audio_list_changed.emit(self.audio_items)
@@ -0,0 +1,276 @@
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image as PILImage
+
+from utils.exif_utils import (TAG_DATETIME, TAG_DATETIME_ORIGINAL, TAG_EXIF_IFD,
+                              parse_exif_datetime, read_capture_times)
+from utils.file_utils import get_cache_dir
+
+# 数据库 schema 版本（PRAGMA user_version）；结构变化时递增，旧库会被重建
+SCHEMA_VERSION = 2
+
+# EXIF Orientation 标签
+_TAG_ORIENTATION = 0x0112
+
+
+@dataclass
+class MediaMetadata:
+    """一张图片的头信息（一次打开即可获得）。"""
+    path: str
+    size: int                       # 文件大小（字节）
+    mtime: float                    # 修改时间（时间戳）
+    width: int = 0
+    height: int = 0
+    mode: str = ''
+    format: str = ''
+    orientation: int = 1            # EXIF Orientation（1 为正常）
+    capture_time: Optional[float] = None  # EXIF DateTimeOriginal（时间戳），没有则为 None
+    fingerprint: Optional[str] = None     # 内容指纹（见 utils.fingerprint），改名/移动后不变
+
+
+def read_image_header(im: PILImage.Image, path: str, st: os.stat_result,
+                      capture_time: Optional[float] = None) -> MediaMetadata:
+    """从已打开（尚未解码）的 PIL 图片读取尺寸、模式、EXIF 方向与拍摄时间。
+
+    capture_time 已由批量 EXIF 读取得到时直接使用，不再解析日期标签。
+    """
+    meta = MediaMetadata(path=path, size=st.st_size, mtime=st.st_mtime,
+                         width=im.width, height=im.height, mode=im.mode, format=im.format or '')
+    try:
+        exif = im.getexif()
+        meta.orientation = int(exif.get(_TAG_ORIENTATION, 1) or 1)
+        if capture_time is not None:
+            meta.capture_time = capture_time
+            return meta
+        raw = None
+        try:
+            raw = exif.get_ifd(TAG_EXIF_IFD).get(TAG_DATETIME_ORIGINAL)
+        except Exception:
+            raw = None
+        meta.capture_time = parse_exif_datetime(raw or exif.get(TAG_DATETIME))
+    except Exception:
+        pass
+    return meta
+
+
+def scan_image(path: str, st: Optional[os.stat_result] = None) -> MediaMetadata:
+    """一次 stat + 一次打开读取图片头信息（不解码像素）。"""
+    if st is None:
+        st = os.stat(path)
+    with PILImage.open(path) as im:
+        return read_image_header(im, path, st)
+
+
+class MetadataIndex:
+    """持久化在 SQLite 中的图片元数据索引与缩略图缓存，供导入与导出共用。
+
+    以路径为键，记录 (size, mtime) 用于判断是否失效；命中时无需再读取文件头。
+    同时按内容指纹建立索引：文件改名或移动后可通过指纹找回元数据与缩略图。
+    线程安全：同一连接由锁保护。
+    """
+
+    _COLUMNS = ('path', 'size', 'mtime', 'width', 'height', 'mode', 'format', 'orientation', 'capture_time',
+                'fingerprint')
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            db_path = os.path.join(get_cache_dir(), 'metadata.sqlite3')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._conn.execute('DROP TABLE IF EXISTS media')
+                self._conn.execute('DROP TABLE IF EXISTS thumbnails')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS media (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    width INTEGER,
+                    height INTEGER,
+                    mode TEXT,
+                    format TEXT,
+                    orientation INTEGER,
+                    capture_time REAL,
+                    fingerprint TEXT
+                )''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS media_fingerprint ON media(fingerprint)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    fingerprint TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    png BLOB NOT NULL,
+                    PRIMARY KEY (fingerprint, width, height)
+                )''')
+            self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            self._conn.commit()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def _row_to_meta(self, row, path: str) -> MediaMetadata:
+        values = dict(zip(self._COLUMNS, row))
+        values['path'] = path
+        return MediaMetadata(**values)
+
+    def get(self, path: str, st: Optional[os.stat_result] = None) -> Optional[MediaMetadata]:
+        """返回缓存的元数据；传入 st 时仅在 size/mtime 一致时命中。"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(self._COLUMNS)} FROM media WHERE path=?', (self._key(path),)).fetchone()
+        if row is None:
+            return None
+        meta = self._row_to_meta(row, path)
+        if st is not None and (meta.size != st.st_size or meta.mtime != st.st_mtime):
+            return None
+        return meta
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, MediaMetadata]:
+        """批量查询（不校验 size/mtime），返回 {path: MediaMetadata}。"""
+        paths = list(paths)
+        keys = {self._key(p): p for p in paths}
+        out = {}
+        key_list = list(keys)
+        with self._lock:
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(
+                        f'SELECT {", ".join(self._COLUMNS)} FROM media WHERE path IN ({marks})', chunk):
+                    p = keys[row[0]]
+                    out[p] = self._row_to_meta(row, p)
+        return out
+
+    def put_many(self, metas: Iterable[MediaMetadata]) -> None:
+        rows = [(self._key(m.path), m.size, m.mtime, m.width, m.height, m.mode, m.format,
+                 m.orientation, m.capture_time, m.fingerprint) for m in metas]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO media ({", ".join(self._COLUMNS)}) VALUES ({",".join("?" * len(self._COLUMNS))})',
+                rows)
+            self._conn.commit()
+
+    def put(self, meta: MediaMetadata) -> None:
+        self.put_many([meta])
+
+    def get_by_fingerprint(self, fingerprint: str) -> Optional[MediaMetadata]:
+        """按内容指纹查找任意一条记录（用于改名/移动后的文件）；路径字段为原记录路径。"""
+        if not fingerprint:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(self._COLUMNS)} FROM media WHERE fingerprint=? LIMIT 1', (fingerprint,)).fetchone()
+        return self._row_to_meta(row, row[0]) if row is not None else None
+
+    def get_thumbnail(self, fingerprint: str, size) -> Optional[bytes]:
+        """返回按指纹缓存的缩略图 PNG 数据。"""
+        if not fingerprint:
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT png FROM thumbnails WHERE fingerprint=? AND width=? AND height=?',
+                                     (fingerprint, int(size[0]), int(size[1]))).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def put_thumbnails(self, items: Iterable[tuple], size) -> None:
+        """批量写入缩略图缓存：items 为 [(fingerprint, png_bytes), ...]。"""
+        rows = [(fp, int(size[0]), int(size[1]), sqlite3.Binary(png)) for fp, png in items if fp and png]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def lookup_or_scan(self, path: str, st: Optional[os.stat_result] = None) -> MediaMetadata:
+        """命中缓存则直接返回，否则读取文件头并写入索引。"""
+        if st is None:
+            st = os.stat(path)
+        meta = self.get(path, st)
+        if meta is None:
+            meta = scan_image(path, st)
+            self.put(meta)
+        return meta
+
+    def capture_times(self, paths: Iterable[str], stats: Optional[Dict[str, os.stat_result]] = None,
+                      workers: int = 8) -> Dict[str, Optional[float]]:
+        """批量获取拍摄时间：索引命中（size/mtime 一致，stats 中没有的文件会先 stat）直接返回，
+        其余并行只读 EXIF APP1 段。
+
+        未命中的结果由调用方随完整头信息一起写入索引（见 MediaManager.add_image_files）。
+        """
+        paths = list(paths)
+        stats = stats or {}
+        cached = self.get_many(paths)
+        out = {}
+        misses = []
+        for p in paths:
+            meta = cached.get(p)
+            st = stats.get(p)
+            if meta is not None and st is None:
+                # 调用方未提供 stat 时同样要校验，否则编辑或替换过的文件会沿用旧的拍摄时间
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    st = None
+            if meta is not None and st is not None and meta.size == st.st_size and meta.mtime == st.st_mtime:
+                out[p] = meta.capture_time
+            else:
+                misses.append(p)
+        if misses:
+            out.update(read_capture_times(misses, workers))
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared_index: Optional[MetadataIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_metadata_index() -> Optional[MetadataIndex]:
+    """返回进程内共享的元数据索引；无法创建数据库时返回 None（调用方回退为直接读取文件头）。"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            try:
+                _shared_index = MetadataIndex()
+            except Exception:
+                return None
+        return _shared_index
+
+
+def lookup_sizes(paths: List[str], index: Optional[MetadataIndex] = None) -> List[tuple]:
+    """返回每张图片的 (宽, 高)：优先读取索引（校验 size/mtime），未命中再读取文件头；失败为 (0, 0)。"""
+    index = index if index is not None else get_metadata_index()
+    cached = index.get_many(paths) if index is not None else {}
+    sizes = []
+    fresh = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            meta = cached.get(p)
+            if meta is None or meta.size != st.st_size or meta.mtime != st.st_mtime:
+                meta = scan_image(p, st)
+                fresh.append(meta)
+            sizes.append((meta.width, meta.height))
+        except Exception:
+            sizes.append((0, 0))
+    if index is not None and fresh:
+        index.put_many(fresh)
+    return sizes
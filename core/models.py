@@ -5,13 +5,18 @@ from typing import Any, Optional
 @dataclass
 class ImageItem:
     """	图片项数据模型
-    create_time 实际为文件修改日期（时间戳）"""
+    create_time 为排序与时长映射使用的时间：默认取 EXIF 拍摄时间，没有时回退到文件修改日期（时间戳）"""
     path: str                 # 文件路径
     thumbnail: Any            # 缩略图（QPixmap）或占位
     filename: str             # 文件名
-    create_time: float        # 修改日期（时间戳）
+    create_time: float        # 拍摄时间或修改日期（时间戳）
     size: int                 # 文件大小（字节）
     duration: Optional[float] = None  # 导出时该图片在视频中的持续时长（秒）
+    width: int = 0            # 像素宽度（来自元数据索引，0 表示未知）
+    height: int = 0           # 像素高度（来自元数据索引，0 表示未知）
+    mtime: float = 0.0        # 文件修改日期（时间戳）
+    capture_time: Optional[float] = None  # EXIF 拍摄时间（时间戳），没有则为 None
+    fingerprint: Optional[str] = None     # 内容指纹（改名/移动后不变，作为缓存键）
 
 
 @dataclass
@@ -0,0 +1,197 @@
+import os
+import stat
+from dataclasses import asdict, dataclass, field
+from typing import List, Tuple
+
+# MP4 封装方式：'plain'（moov 在文件末尾）| 'faststart'（moov 移到开头，可边下载边播放）
+#              | 'fragmented'（分片 MP4，可写入管道，边写边读）
+MP4_MODES = ('plain', 'faststart', 'fragmented')
+DEFAULT_MP4_MODE = 'faststart'
+# 分片 MP4：每个关键帧（即每张图片的首帧，见 core.keyframes）开始一个分片，moov 写在最前面
+FRAGMENT_MOVFLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+# 可使用 movflags 的容器
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+# 表示标准输出的输出路径
+STDOUT_NAMES = ('-', 'pipe:', 'pipe:1')
+# HLS：输出路径以 .m3u8 结尾时写出分段与播放列表；分段格式 'mpegts'（.ts）或 'fmp4'（.m4s + 初始化段）
+HLS_EXTENSIONS = ('.m3u8',)
+HLS_SEGMENT_EXTENSIONS = {'mpegts': 'ts', 'fmp4': 'm4s'}
+DEFAULT_HLS_SEGMENT_SECONDS = 6.0
+
+
+@dataclass
+class OutputTarget:
+    """导出的输出位置与 MP4 封装方式。"""
+    path: str                # 传给 ffmpeg 的输出（文件路径或 pipe:1）
+    mode: str = 'plain'
+    stdout: bool = False     # 写入本进程的标准输出
+    stream: bool = False     # 不可回跳的输出（标准输出或命名管道），只能使用分片 MP4
+    hls: bool = False        # 写出 HLS 分段与 .m3u8 播放列表（path 为主播放列表）
+    # 分段目标时长：HLS 只在关键帧处切分段，即图片首帧（以首帧前半帧的时间强制，见 core.keyframes）
+    # 或长时间停留的图片内补的关键帧，因此分段实际时长为整帧数、通常不等于该值，也不一定落在图片切换处
+    hls_time: float = DEFAULT_HLS_SEGMENT_SECONDS
+    hls_segment_type: str = 'mpegts'
+    # 额外的缩小档位 [(宽, 高)]（由导出管理器按画布尺寸填入）：HLS 时 path 为主播放列表、各档另有播放列表；
+    # 文件输出时每档另写一个文件（见 rendition_paths）
+    renditions: List[Tuple[int, int]] = field(default_factory=list)
+    audio: bool = False      # 是否有音轨（多档位时各档共用同一条音频）
+
+    @property
+    def is_mp4(self) -> bool:
+        return not self.hls and (self.stream or os.path.splitext(self.path)[1].lower() in MP4_EXTENSIONS)
+
+    @property
+    def rendition_paths(self) -> List[str]:
+        """多档位文件输出时各缩小档位的文件名：与 path 同目录，追加短边像素，如 talk_480p.mp4。"""
+        if self.hls:
+            return []
+        root, ext = os.path.splitext(self.path)
+        return [f"{root}_{min(w, h)}p{ext}" for w, h in self.renditions]
+
+    @property
+    def outputs(self) -> List[str]:
+        """全部输出文件（原尺寸在前）；HLS 时为主播放列表。"""
+        return [self.path] + self.rendition_paths
+
+    @property
+    def ffmpeg_path(self) -> str:
+        """传给 ffmpeg 的输出名；HLS 多档位时为各档播放列表的模板（%v 为档位序号），
+        多档位文件输出时为 tee 封装器的子输出列表。"""
+        if self.hls and self.renditions:
+            return self._hls_name('%v', 'm3u8')
+        if self.renditions:
+            return self._tee_spec()
+        return self.path
+
+    def _hls_name(self, *suffixes: str) -> str:
+        # 分段/播放列表与主播放列表同目录、同名前缀；文件名中的 % 需转义，避免被当作模板
+        root = os.path.splitext(self.path)[0]
+        stem = os.path.basename(root).replace('%', '%%')
+        name = '_'.join([stem] + list(suffixes[:-1])) + '.' + suffixes[-1]
+        return os.path.join(os.path.dirname(root), name)
+
+    def _hls_args(self) -> List[str]:
+        ext = HLS_SEGMENT_EXTENSIONS.get(self.hls_segment_type, 'ts')
+        variant = ['%v'] if self.renditions else []
+        # event 播放列表：每完成一个分段即追加一条并重写播放列表，导出结束时写入 #EXT-X-ENDLIST；
+        # temp_file 使分段写完后才改名出现，本地 Web 服务器不会提供写了一半的分段
+        args = ['-f', 'hls', '-hls_time', f'{self.hls_time:g}', '-hls_list_size', '0',
+                '-hls_playlist_type', 'event', '-hls_flags', 'independent_segments+temp_file',
+                '-hls_segment_type', self.hls_segment_type,
+                '-hls_segment_filename', self._hls_name(*variant, '%05d', ext)]
+        if ext == 'm4s':
+            args += ['-hls_fmp4_init_filename', os.path.basename(self._hls_name(*variant, 'init', 'mp4'))]
+        if self.renditions:
+            # 各档视频共用一个音频组（音频只编码一次）；主播放列表列出各档分辨率供播放器自适应选择。
+            # 音频组条目放在最后：不少播放器从主播放列表的第一个变体开始播放，原尺寸视频须排在首位
+            streams = [f'v:{i},agroup:aud' if self.audio else f'v:{i}' for i in range(len(self.renditions) + 1)]
+            if self.audio:
+                streams.append('a:0,agroup:aud')
+            args += ['-master_pl_name', os.path.basename(self.path), '-var_stream_map', ' '.join(streams)]
+        return args
+
+    def _movflags(self) -> str:
+        if self.is_mp4 and self.mode == 'faststart':
+            return '+faststart'
+        if self.is_mp4 and self.mode == 'fragmented':
+            return FRAGMENT_MOVFLAGS
+        return ''
+
+    def file_args(self) -> List[str]:
+        """单个输出文件的封装参数（-movflags 等）；多档位时每个文件各自使用同样的参数。"""
+        movflags = self._movflags()
+        args = ['-movflags', movflags] if movflags else []
+        if self.stream:
+            # 输出没有扩展名可供推断格式
+            args += ['-f', 'mp4']
+        return args
+
+    def _tee_spec(self) -> str:
+        # tee 的每个子输出为 "[选项]文件名"，以 | 分隔；select 选出该档的视频流与共用的音频流。
+        # 文件名与选项值中的特殊字符以反斜杠转义（ffmpeg 先按 av_get_token 规则去掉一层转义）
+        movflags = self._movflags()
+        audio = ',a' if self.audio else ''
+        slaves = []
+        for i, path in enumerate(self.outputs):
+            options = [f"movflags={movflags}"] if movflags else []
+            options.append(f"select=\\'v:{i}{audio}\\'")
+            name = ''.join('\\' + ch if ch in "\\'|[]:" else ch for ch in path)
+            slaves.append(f"[{':'.join(options)}]{name}")
+        return '|'.join(slaves)
+
+    def ffmpeg_args(self) -> List[str]:
+        """封装相关的 ffmpeg 输出参数。"""
+        if self.hls:
+            return self._hls_args()
+        if self.renditions:
+            # 多档位文件经 tee 封装器写出：各档视频与音频只编码一次；
+            # tee 无法事先确定容器，须为编码器打开全局头（MP4 需要 avcC 等扩展数据）
+            return ['-flags', '+global_header', '-f', 'tee']
+        return self.file_args()
+
+    def size(self) -> int:
+        """已写出的文件大小；输出到管道时为 0，HLS 为播放列表与全部分段之和，多档位时为各文件之和。"""
+        if self.hls:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            stem = os.path.splitext(os.path.basename(self.path))[0]
+            total = 0
+            for name in os.listdir(folder):
+                if name == os.path.basename(self.path) or name.startswith(stem + '_'):
+                    try:
+                        total += os.path.getsize(os.path.join(folder, name))
+                    except OSError:
+                        pass
+            return total
+        if self.stream:
+            return 0
+        total = 0
+        for path in self.outputs:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def mp4_mode_from_env() -> str:
+    """读取 JPEG2MPEG_MP4_MODE（plain / faststart / fragmented，默认 faststart）。"""
+    mode = os.environ.get('JPEG2MPEG_MP4_MODE', DEFAULT_MP4_MODE).strip().lower()
+    return mode if mode in MP4_MODES else DEFAULT_MP4_MODE
+
+
+def hls_settings_from_env():
+    """读取 HLS 设置，返回 (分段目标时长秒数, 分段格式, 额外档位列表)。
+
+    JPEG2MPEG_HLS_SEGMENT：分段目标时长（默认 6 秒）；
+    JPEG2MPEG_HLS_SEGMENT_TYPE：ts（默认）| fmp4；
+    JPEG2MPEG_HLS_LADDER：额外输出的缩小档位（短边像素，如 '720,480'，默认不输出）。
+    """
+    from core.renditions import parse_heights
+    try:
+        seconds = max(1.0, float(os.environ.get('JPEG2MPEG_HLS_SEGMENT', DEFAULT_HLS_SEGMENT_SECONDS)))
+    except ValueError:
+        seconds = DEFAULT_HLS_SEGMENT_SECONDS
+    segment_type = os.environ.get('JPEG2MPEG_HLS_SEGMENT_TYPE', 'ts').strip().lower()
+    segment_type = 'fmp4' if segment_type == 'fmp4' else 'mpegts'
+    return seconds, segment_type, parse_heights(os.environ.get('JPEG2MPEG_HLS_LADDER', ''))
+
+
+def resolve_output(output_path: str, mode: str = DEFAULT_MP4_MODE,
+                   hls_time: float = DEFAULT_HLS_SEGMENT_SECONDS, hls_segment_type: str = 'mpegts') -> OutputTarget:
+    """解析输出位置：'-' / 'pipe:1' 表示标准输出，已存在的命名管道同样按流式输出处理；
+    流式输出不能回写文件头，总是使用分片 MP4。以 .m3u8 结尾的路径输出为 HLS。"""
+    if os.path.splitext(output_path)[1].lower() in HLS_EXTENSIONS:
+        return OutputTarget(path=output_path, mode='hls', hls=True, hls_time=hls_time,
+                            hls_segment_type=hls_segment_type)
+    if output_path in STDOUT_NAMES:
+        return OutputTarget(path='pipe:1', mode='fragmented', stdout=True, stream=True)
+    try:
+        is_fifo = stat.S_ISFIFO(os.stat(output_path).st_mode)
+    except OSError:
+        is_fifo = False
+    if is_fifo:
+        return OutputTarget(path=output_path, mode='fragmented', stream=True)
+    return OutputTarget(path=output_path, mode=mode)
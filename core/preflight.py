@@ -0,0 +1,125 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from PIL import Image as PILImage
+
+from core.models import ImageItem, AudioItem
+from utils.file_utils import sniff_file, media_kind
+
+# 局部解码时的目标尺寸：JPEG 以 1/8 比例解码即可覆盖整个码流，检测截断或损坏
+_PARTIAL_DECODE_SIZE = (64, 64)
+
+
+@dataclass
+class PreflightIssue:
+    """单个文件或整体检查的问题。"""
+    path: str
+    kind: str       # 'image' | 'audio' | 'timeline'
+    message: str
+
+    def to_dict(self) -> dict:
+        return {'path': self.path, 'kind': self.kind, 'message': self.message}
+
+
+@dataclass
+class PreflightReport:
+    """导出前检查结果；ok 为 False 时不应开始导出。"""
+    checked_images: int = 0
+    checked_audios: int = 0
+    issues: List[PreflightIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def summary(self, limit: int = 5) -> str:
+        """生成适合状态栏/对话框的简短说明（最多列出 limit 条）。"""
+        if self.ok:
+            return f"检查通过：{self.checked_images} 张图片，{self.checked_audios} 个音频"
+        lines = [f"{os.path.basename(i.path) or i.kind}: {i.message}" for i in self.issues[:limit]]
+        more = len(self.issues) - limit
+        if more > 0:
+            lines.append(f"……另有 {more} 个问题")
+        return f"导出前检查发现 {len(self.issues)} 个问题：" + "；".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            'ok': self.ok,
+            'checked_images': self.checked_images,
+            'checked_audios': self.checked_audios,
+            'issues': [i.to_dict() for i in self.issues],
+        }
+
+
+class PreflightError(Exception):
+    """导出前检查未通过；携带完整的 PreflightReport。"""
+
+    def __init__(self, report: PreflightReport):
+        super().__init__(report.summary())
+        self.report = report
+
+
+def check_image(path: str) -> Optional[str]:
+    """检查一张图片：文件头类型 + JPEG 缩小解码 / 其他格式结构校验。返回错误说明，正常时返回 None。"""
+    if not os.path.isfile(path):
+        return "文件不存在"
+    if media_kind(sniff_file(path)) != 'image':
+        return "文件内容不是可识别的图片"
+    try:
+        with PILImage.open(path) as im:
+            if im.width <= 0 or im.height <= 0:
+                return "图片尺寸无效"
+            if im.format == 'JPEG':
+                im.draft('RGB', _PARTIAL_DECODE_SIZE)
+                im.load()
+            else:
+                # 其他格式没有缩小解码，load() 会完整解码整张图；verify() 只校验文件结构（PNG 为各块 CRC）
+                im.verify()
+    except Exception as e:
+        return f"无法解码：{e}"
+    return None
+
+
+def check_audio(path: str) -> Optional[str]:
+    """检查一个音频文件：文件头类型 + 容器解析出的时长。"""
+    if not os.path.isfile(path):
+        return "文件不存在"
+    if media_kind(sniff_file(path)) != 'audio':
+        return "文件内容不是可识别的音频"
+    try:
+        from mutagen import File as MutagenFile
+        f = MutagenFile(path)
+        length = float(getattr(getattr(f, 'info', None), 'length', 0.0) or 0.0) if f is not None else 0.0
+    except Exception as e:
+        return f"无法解析：{e}"
+    if length <= 0:
+        return "无法读取音频时长"
+    return None
+
+
+def run_preflight(images: Sequence[ImageItem], audios: Sequence[AudioItem],
+                  durations: Optional[Sequence[float]] = None, workers: int = 4) -> PreflightReport:
+    """并行检查所有图片与音频，并确认图片与 durations 一一对应。"""
+    report = PreflightReport(checked_images=len(images), checked_audios=len(audios))
+    image_paths = [img.path for img in images]
+    audio_paths = [a.path for a in audios]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        image_errors = list(pool.map(check_image, image_paths))
+        audio_errors = list(pool.map(check_audio, audio_paths))
+    for p, err in zip(image_paths, image_errors):
+        if err:
+            report.issues.append(PreflightIssue(p, 'image', err))
+    for p, err in zip(audio_paths, audio_errors):
+        if err:
+            report.issues.append(PreflightIssue(p, 'audio', err))
+    if durations is not None:
+        if len(durations) != len(images):
+            report.issues.append(PreflightIssue('', 'timeline',
+                                                f"图片数量（{len(images)}）与时长数量（{len(durations)}）不一致"))
+        for img, d in zip(images, durations):
+            if not isinstance(d, (int, float)) or not math.isfinite(d) or d <= 0:
+                report.issues.append(PreflightIssue(img.path, 'timeline', f"时长无效：{d}"))
+    return report
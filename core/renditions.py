@@ -0,0 +1,65 @@
+import re
+from typing import List, Sequence, Tuple
+
+# HLS 多档位的码率上限：按每档像素数与帧率缩放（约每像素每帧 0.1 bit，1920x1080@24fps 约 5 Mbit/s），
+# 缓冲区为 2 倍上限，容得下图片切换处的关键帧
+HLS_BITS_PER_PIXEL = 0.1
+MIN_RATE_CAP = 100_000
+
+
+def parse_heights(text: str) -> List[int]:
+    """解析 '720,480' / '720p 480p' 形式的档位列表（短边像素数），忽略无法识别的项。"""
+    heights = []
+    for item in re.split(r'[,\s;]+', text or ''):
+        item = item.strip().lower().rstrip('p')
+        if item.isdigit() and int(item) >= 16:
+            heights.append(int(item))
+    return heights
+
+
+def ladder_sizes(base_size: Tuple[int, int], heights: Sequence[int]) -> List[Tuple[int, int]]:
+    """按短边档位生成比画布小的各档尺寸（保持画布宽高比、宽高均为偶数），从大到小、去重，不含画布本身。
+
+    所有图片都已居中加边到同一画布，各档只需整体缩小，不必重新加边。
+    """
+    w, h = int(base_size[0]), int(base_size[1])
+    short = min(w, h)
+    sizes = []
+    for target in sorted(set(heights), reverse=True):
+        if target >= short:
+            continue
+        scale = target / short
+        size = (max(2, int(round(w * scale / 2)) * 2), max(2, int(round(h * scale / 2)) * 2))
+        if size not in sizes:
+            sizes.append(size)
+    return sizes
+
+
+def split_scale_graph(src_label: str, sizes: Sequence[Tuple[int, int]]) -> Tuple[List[str], List[str]]:
+    """把一路视频（滤镜标签，如 '[0:v:0]'）复制为原尺寸 + 各档缩小版本。
+
+    返回 (滤镜图片段列表, 输出标签列表)；第一个标签为原尺寸。sizes 为空时不需要滤镜，直接返回 src_label。
+    """
+    if not sizes:
+        return [], [src_label]
+    n = len(sizes) + 1
+    parts = [f"{src_label}split={n}" + ''.join(f'[ls{i}]' for i in range(n))]
+    labels = ['[ls0]']
+    for i, (w, h) in enumerate(sizes, start=1):
+        parts.append(f"[ls{i}]scale={w}:{h}:flags=bicubic,setsar=1[lr{i}]")
+        labels.append(f'[lr{i}]')
+    return parts, labels
+
+
+def rate_cap_args(sizes: Sequence[Tuple[int, int]], fps: float,
+                  bits_per_pixel: float = HLS_BITS_PER_PIXEL) -> List[str]:
+    """逐路视频（sizes 顺序即输出流顺序，原尺寸在前）的 -maxrate:v:N / -bufsize:v:N 参数。
+
+    CRF 编码没有平均码率，HLS 主播放列表的 BANDWIDTH 取自编码器报告的码率上限；
+    不设上限时各档的 BANDWIDTH 只剩音频码率且完全相同，播放器无法按带宽选择档位。
+    """
+    args = []
+    for i, (w, h) in enumerate(sizes):
+        rate = max(MIN_RATE_CAP, int(w * h * fps * bits_per_pixel))
+        args += [f'-maxrate:v:{i}', str(rate), f'-bufsize:v:{i}', str(2 * rate)]
+    return args
@@ -0,0 +1,124 @@
+import statistics
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+# 预设分辨率（横屏尺寸；多数图片为竖屏时自动交换宽高）
+PRESETS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+# "native" 预设的默认像素上限（百万像素）；约等于 4K 的面积
+DEFAULT_NATIVE_CAP_MP = 8.3
+
+# 粗略的 libx264 吞吐估计（像素/秒，单线程 medium 预设量级），仅用于导出前的成本提示
+ENCODE_PIXELS_PER_SECOND = 60_000_000
+
+
+@dataclass
+class ResolutionPlan:
+    """分辨率规划结果：画布尺寸与预计编码成本。"""
+    preset: str
+    width: int
+    height: int
+    fps: int = 24
+    frame_count: int = 0
+    megapixels_per_frame: float = 0.0
+    raw_bytes_yuv420: int = 0      # 全部帧以 yuv420p 计算的原始字节数
+    estimated_encode_seconds: float = 0.0
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.width, self.height)
+
+    def summary(self) -> str:
+        """生成一行可读的成本说明，用于状态栏/诊断日志。"""
+        return (f"{self.width}x{self.height} ({self.megapixels_per_frame:.1f} MP/帧), "
+                f"{self.frame_count} 帧 @ {self.fps}fps, "
+                f"原始数据约 {self.raw_bytes_yuv420 / (1024 * 1024):.0f} MiB, "
+                f"预计编码约 {self.estimated_encode_seconds:.0f} 秒")
+
+    def to_dict(self) -> dict:
+        return {
+            'preset': self.preset,
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'frame_count': self.frame_count,
+            'megapixels_per_frame': round(self.megapixels_per_frame, 3),
+            'raw_bytes_yuv420': self.raw_bytes_yuv420,
+            'estimated_encode_seconds': round(self.estimated_encode_seconds, 2),
+            'notes': list(self.notes),
+        }
+
+
+def _even_floor(v: float) -> int:
+    """向下取偶数（yuv420p 要求宽高为偶数），最小为 2。"""
+    return max(2, int(v) // 2 * 2)
+
+
+def parse_preset(preset: Optional[str]) -> Tuple[str, Optional[float]]:
+    """解析预设字符串。
+
+    支持 '720p' / '1080p' / '4k' / 'native' / 'native:N'（N 为百万像素上限）。
+    返回 (名称, native 上限)；无法识别时回退到 native 默认上限。
+    """
+    name = (preset or 'native').strip().lower()
+    if name in PRESETS:
+        return name, None
+    if name.startswith('native'):
+        cap = DEFAULT_NATIVE_CAP_MP
+        if ':' in name:
+            try:
+                cap = float(name.split(':', 1)[1])
+            except ValueError:
+                cap = DEFAULT_NATIVE_CAP_MP
+        return 'native', max(0.1, cap)
+    return 'native', DEFAULT_NATIVE_CAP_MP
+
+
+def plan_resolution(sizes: Sequence[Tuple[int, int]], preset: Optional[str] = None,
+                    durations: Optional[Sequence[float]] = None, fps: int = 24) -> Optional[ResolutionPlan]:
+    """根据输入图片尺寸与预设选择有界、偶数尺寸的画布。
+
+    - 画布宽高比取所有图片宽高比的中位数，避免横竖混排时按各自最大值拼成巨大正方形
+    - 固定预设（720p/1080p/4K）在多数为竖屏时交换宽高
+    - native 以"能原尺寸容纳中位图片"的画布为准，再按像素上限等比缩小
+    - 结果宽高均为偶数
+
+    sizes 中宽或高 <= 0 的项会被忽略；全部无效时返回 None。
+    """
+    valid = [(int(w), int(h)) for w, h in sizes if w and h and w > 0 and h > 0]
+    if not valid:
+        return None
+    name, cap_mp = parse_preset(preset)
+    aspect = statistics.median(w / h for w, h in valid)
+    notes = []
+
+    if name in PRESETS:
+        w, h = PRESETS[name]
+        if aspect < 1.0:
+            w, h = h, w
+            notes.append('多数图片为竖屏，预设宽高已交换')
+    else:
+        # 每张图片在该宽高比画布中以原尺寸显示所需的高度，取中位数
+        heights = [max(ih, iw / aspect) for iw, ih in valid]
+        h = statistics.median(heights)
+        w = h * aspect
+        cap_px = cap_mp * 1_000_000
+        if w * h > cap_px:
+            scale = (cap_px / (w * h)) ** 0.5
+            w, h = w * scale, h * scale
+            notes.append(f'按 {cap_mp:g} MP 上限缩小')
+    width, height = _even_floor(w), _even_floor(h)
+
+    plan = ResolutionPlan(preset=name, width=width, height=height, fps=int(fps), notes=notes)
+    total_seconds = float(sum(durations)) if durations else 0.0
+    plan.frame_count = int(round(total_seconds * fps))
+    pixels = width * height
+    plan.megapixels_per_frame = pixels / 1_000_000
+    plan.raw_bytes_yuv420 = plan.frame_count * pixels * 3 // 2
+    plan.estimated_encode_seconds = plan.frame_count * pixels / float(ENCODE_PIXELS_PER_SECOND)
+    return plan
@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+
+from utils.resource_utils import child_cpu_seconds, current_rss_bytes, io_counters, peak_rss_bytes
+
+
+@dataclass
+class StageRecord:
+    """一个导出阶段的耗时与资源统计。
+
+    cpu_seconds 为本进程（含所有线程）的 CPU 时间，child_cpu_seconds 为期间结束的子进程（ffmpeg）；
+    io_read_bytes/io_write_bytes 来自操作系统计数（不可用时为 None），
+    bytes_read/bytes_written/frames 由阶段代码按实际处理的数据累加。
+    peak_rss_bytes 为阶段结束时的进程峰值内存。overlapped 为 True 表示该阶段与其他阶段并行执行，
+    wall_seconds 为各工作线程耗时之和。
+    """
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    child_cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    rss_bytes: int = 0
+    io_read_bytes: Optional[int] = None
+    io_write_bytes: Optional[int] = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    frames: int = 0
+    overlapped: bool = False
+    failed: bool = False
+
+    def add(self, bytes_read: int = 0, bytes_written: int = 0, frames: int = 0) -> None:
+        self.bytes_read += int(bytes_read)
+        self.bytes_written += int(bytes_written)
+        self.frames += int(frames)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'child_cpu_seconds': round(self.child_cpu_seconds, 4),
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'rss_bytes': self.rss_bytes,
+            'io_read_bytes': self.io_read_bytes,
+            'io_write_bytes': self.io_write_bytes,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'frames': self.frames,
+            'overlapped': self.overlapped,
+            'failed': self.failed,
+        }
+
+
+class StageProfiler:
+    """记录导出各阶段（导入/探测、尺寸扫描、帧准备、音频合并、编码、封装）的耗时与资源，
+    结果写入诊断 JSON 的 profile 字段，便于跨版本比较。
+
+    用法：
+        with profiler.stage('encode') as rec:
+            ...
+            rec.add(bytes_written=n, frames=k)
+    """
+
+    def __init__(self):
+        self.stages: List[StageRecord] = []
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        rec = StageRecord(name=name)
+        io0 = io_counters()
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        child0 = child_cpu_seconds()
+        try:
+            yield rec
+        except BaseException:
+            rec.failed = True
+            raise
+        finally:
+            rec.wall_seconds = time.perf_counter() - wall0
+            rec.cpu_seconds = time.process_time() - cpu0
+            rec.child_cpu_seconds = child_cpu_seconds() - child0
+            rec.peak_rss_bytes = peak_rss_bytes()
+            rec.rss_bytes = current_rss_bytes()
+            io1 = io_counters()
+            if io0 is not None and io1 is not None:
+                rec.io_read_bytes = io1[0] - io0[0]
+                rec.io_write_bytes = io1[1] - io0[1]
+            self.stages.append(rec)
+
+    def record(self, name: str, wall_seconds: float, overlapped: bool = True, **counts) -> StageRecord:
+        """登记一个由其他统计得出的阶段（如流水线中与编码并行的帧准备）。"""
+        rec = StageRecord(name=name, wall_seconds=wall_seconds, overlapped=overlapped,
+                          peak_rss_bytes=peak_rss_bytes())
+        rec.add(**counts)
+        self.stages.append(rec)
+        return rec
+
+    def to_dict(self) -> dict:
+        return {
+            'total_wall_seconds': round(time.perf_counter() - self._t0, 4),
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': [s.to_dict() for s in self.stages],
+        }
@@ -1,17 +1,29 @@
 import sys
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from ui.main_window import MainWindow
+from utils.log_utils import setup_logging
+from utils.prewarm import start_prewarm
+from utils.stall_watchdog import watchdog_from_env
 
 
 def main():
+    # 日志写入后台线程，热路径上只入队
+    setup_logging()
     # 在创建 QApplication 之前设置 High DPI 属性
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
 
     app = QApplication(sys.argv)
+    # 事件循环卡顿检测：记录阻塞 GUI 线程的处理函数堆栈，退出时写入延迟直方图
+    watchdog = watchdog_from_env(app)
+    if watchdog is not None:
+        watchdog.start()
+        app.aboutToQuit.connect(watchdog.stop)
     window = MainWindow()
     window.show()
+    # 窗口显示后在后台导入 moviepy/numpy 等导出依赖，缩短首次导出的等待
+    QTimer.singleShot(0, start_prewarm)
     sys.exit(app.exec_())
 
 
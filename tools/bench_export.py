@@ -0,0 +1,217 @@
+"""端到端导出基准：用合成照片与音频跑一遍真实的导入、缩略图、时间轴布局与导出，输出 JSON。
+
+用法：
+    python tools/bench_export.py [--count 200] [--sizes 4000x3000,1920x1080] [--formats jpg,png]
+                                 [--audio-seconds 60] [--backend yuvpipe] [--resolution 1080p]
+                                 [--out result.json] [--baseline base.json [--tolerance 0.15]]
+    python tools/bench_export.py --compare base.json current.json [--tolerance 0.15]
+
+每次运行使用全新的缓存目录（冷导入），随后再导入一次测量元数据/缩略图缓存命中（热导入）。
+结果包含各阶段耗时、吞吐（张/秒）、阶段前后的常驻内存与阶段内采样到的峰值（peak_growth_bytes 为
+峰值相对阶段开始的增长），以及导出诊断中的 profile 各阶段统计。
+--baseline / --compare 比较两次结果：任一阶段耗时或峰值内存增长超出基线 tolerance（且耗时差超过
+--min-seconds）即视为回退，以退出码 1 结束，便于在 CI 中使用。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_media import make_photo_set, make_wav, parse_size
+
+RESULT_SCHEMA = 2
+
+
+def _stage(results: dict, name: str, seconds: float, items: int, rss):
+    """rss 为该阶段的 RssSampler：记录阶段前后的常驻内存与阶段内采样到的峰值及其增长。"""
+    results[name] = {
+        'seconds': round(seconds, 4),
+        'items': items,
+        'items_per_second': round(items / seconds, 2) if seconds > 0 else None,
+        'rss_before_bytes': rss.before,
+        'rss_after_bytes': rss.after,
+        'peak_rss_bytes': rss.peak,
+        'peak_growth_bytes': rss.peak_growth,
+    }
+
+
+def run_benchmark(args) -> dict:
+    work = args.workdir or tempfile.mkdtemp(prefix='jpeg2mpeg_bench_')
+    media_dir = os.path.join(work, 'media')
+    cache_dir = os.path.join(work, 'cache')
+    log_dir = os.path.join(work, 'logs')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(log_dir, exist_ok=True)
+    # 这些设置在导入 core 模块前生效（元数据索引与导出管理器在首次使用时读取环境变量）
+    os.environ['JPEG2MPEG_CACHE_DIR'] = cache_dir
+    os.environ['JPEG2MPEG_LOG_DIR'] = log_dir
+    os.environ['JPEG2MPEG_EXPORT_BACKEND'] = args.backend
+    os.environ['JPEG2MPEG_RESOLUTION'] = args.resolution
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    formats = args.formats.split(',')
+    t0 = time.perf_counter()
+    # 在子进程中生成，避免合成数据的内存计入本进程的峰值 RSS
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        paths = pool.submit(make_photo_set, media_dir, args.count, sizes, formats, args.seed).result()
+    audio = make_wav(os.path.join(media_dir, 'audio.wav'), args.audio_seconds) if args.audio_seconds > 0 else None
+    generate_seconds = time.perf_counter() - t0
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from core.media_manager import MediaManager
+    from core.export_manager import ExportManager
+    from ui.timeline_widget import TimelineWidget
+    from utils.image_utils import generate_thumbnail
+    from utils.resource_utils import RssSampler, peak_rss_bytes
+
+    stages = {}
+    manager = MediaManager()
+    with RssSampler() as rss:
+        t0 = time.perf_counter()
+        manager.add_image_files(paths)
+        seconds = time.perf_counter() - t0
+    _stage(stages, 'import_cold', seconds, len(manager.image_items), rss)
+
+    warm = MediaManager()
+    with RssSampler() as rss:
+        t0 = time.perf_counter()
+        warm.add_image_files(paths)
+        seconds = time.perf_counter() - t0
+    _stage(stages, 'import_warm', seconds, len(warm.image_items), rss)
+
+    with RssSampler() as rss:
+        t0 = time.perf_counter()
+        for p in paths:
+            generate_thumbnail(p)
+        seconds = time.perf_counter() - t0
+    _stage(stages, 'thumbnail', seconds, len(paths), rss)
+
+    if audio:
+        manager.add_audio_files([audio])
+    timeline = TimelineWidget()
+    timeline.resize(1200, 200)
+    with RssSampler() as rss:
+        t0 = time.perf_counter()
+        timeline.setDuration(manager.get_total_audio_duration())
+        timeline.set_images(manager.image_items)
+        app.processEvents()
+        seconds = time.perf_counter() - t0
+    _stage(stages, 'timeline_layout', seconds, len(manager.image_items), rss)
+
+    exporter = ExportManager()
+    outcome = {}
+    exporter.export_finished.connect(lambda ok, msg: outcome.update(ok=ok, message=msg))
+    output = os.path.join(work, 'bench.mp4')
+    with RssSampler() as rss:
+        t0 = time.perf_counter()
+        exporter.export_video(manager.image_items, manager.audio_items, output)
+        seconds = time.perf_counter() - t0
+    _stage(stages, 'export', seconds, len(manager.image_items), rss)
+    if not outcome.get('ok'):
+        raise RuntimeError(f"导出失败：{outcome.get('message')}")
+
+    diag = {}
+    if exporter.last_diagnostic_log and os.path.exists(exporter.last_diagnostic_log):
+        with open(exporter.last_diagnostic_log, 'r', encoding='utf-8') as f:
+            diag = json.load(f)
+    result = {
+        'schema': RESULT_SCHEMA,
+        'config': {
+            'count': args.count, 'sizes': args.sizes, 'formats': args.formats,
+            'audio_seconds': args.audio_seconds, 'backend': args.backend,
+            'resolution': args.resolution, 'seed': args.seed,
+        },
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'generate_seconds': round(generate_seconds, 4),
+        'stages': stages,
+        'output_bytes': os.path.getsize(output),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'export_profile': diag.get('profile'),
+    }
+    if not args.keep and not args.workdir:
+        shutil.rmtree(work, ignore_errors=True)
+    return result
+
+
+def compare(base: dict, current: dict, tolerance: float, min_seconds: float) -> list:
+    """返回回退列表 [(指标, 基线, 当前, 变化比例)]，并打印对比表。"""
+    regressions = []
+    rows = []
+    for name, cur in current.get('stages', {}).items():
+        ref = base.get('stages', {}).get(name)
+        if not ref:
+            continue
+        # 内存按阶段内的峰值增长比较（进程峰值会被前面的阶段抬高）；旧版结果没有该字段时跳过
+        for key in ('seconds', 'peak_growth_bytes'):
+            if key not in ref or key not in cur:
+                continue
+            b, c = ref.get(key) or 0, cur.get(key) or 0
+            change = (c - b) / b if b else 0.0
+            bad = change > tolerance and (key != 'seconds' or c - b > min_seconds)
+            rows.append((f"{name}.{key}", b, c, change, bad))
+            if bad:
+                regressions.append((f"{name}.{key}", b, c, change))
+    if base.get('config') != current.get('config'):
+        print("注意：两次运行的配置不同，对比结果仅供参考")
+    for metric, b, c, change, bad in rows:
+        print(f"{metric:32s} {b:>14} -> {c:>14}  {change:+7.1%}{'  回退' if bad else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--sizes', default='4000x3000,1920x1080')
+    parser.add_argument('--formats', default='jpg,png')
+    parser.add_argument('--audio-seconds', type=float, default=60.0)
+    parser.add_argument('--backend', default='yuvpipe', choices=['moviepy', 'yuvpipe', 'ffmpeg'])
+    parser.add_argument('--resolution', default='1080p')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='保留合成媒体的目录（重复运行时复用，跳过生成）')
+    parser.add_argument('--keep', action='store_true', help='运行结束后不删除临时目录')
+    parser.add_argument('--out', help='把结果 JSON 写入文件（默认打印到标准输出）')
+    parser.add_argument('--baseline', help='与该基线结果比较，回退时退出码为 1')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'CURRENT'), help='只比较两个已有结果文件')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许的相对变化（默认 0.15）')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='耗时差小于该值时不视为回退')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.compare[1], 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        sys.exit(1 if compare(base, current, args.tolerance, args.min_seconds) else 0)
+
+    result = run_benchmark(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        regressions = compare(base, result, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回退")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""界面性能基准：在 offscreen Qt 平台下驱动真实的 MainWindow，测量列表重建、时间轴布局与绘制的延迟。
+
+用法：
+    python tools/bench_ui.py [--counts 1000,10000] [--batch 500] [--repeat 20]
+                             [--scenarios add,resort,drag,paint_full,paint_partial] [--out ui.json]
+
+场景（每个图片数量各跑一遍）：
+- add：按文件夹导入的方式每批 --batch 张追加，每批触发一次 image_list_changed
+  （DraggableList 重建 + TimelineWidget.set_images），样本为每批的处理时间；
+  从空列表开始整轮重复，直到样本数不少于 --repeat
+- resort：在三种排序方式间切换，样本为每次 set_sort_mode 的处理时间
+- drag：在时间轴上按下一个色块并拖动，样本为每次鼠标移动（含重绘）的时间；
+  松开后的重排另计为 drag_release（拖动 --repeat/4 次、至少 3 次，每次松开一次，内存只覆盖松开本身）
+- paint_full / paint_partial：同步重绘整个时间轴 / 宽 200 像素的局部区域
+
+输出每个场景的 p50/p99/平均/最大延迟（毫秒）、样本数，以及场景前后的常驻内存与场景内采样到的峰值内存。
+图片条目引用一小组合成 JPEG（--pool 张）以避免生成大量文件，缩略图仍按真实代码从磁盘读取。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from synthetic_media import make_photo_set
+
+ALL_SCENARIOS = ('add', 'resort', 'drag', 'paint_full', 'paint_partial')
+
+
+def summarize(samples, rss_before: int, rss_after: int, peak: int) -> dict:
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'samples': int(ms.size),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3) if ms.size else None,
+        'p99_ms': round(float(np.percentile(ms, 99)), 3) if ms.size else None,
+        'mean_ms': round(float(ms.mean()), 3) if ms.size else None,
+        'max_ms': round(float(ms.max()), 3) if ms.size else None,
+        'rss_before_bytes': rss_before,
+        'rss_after_bytes': rss_after,
+        'peak_rss_bytes': peak,
+    }
+
+
+class UiBench:
+    def __init__(self, pool_paths, batch: int, repeat: int):
+        from PyQt5.QtWidgets import QApplication
+        self.app = QApplication.instance() or QApplication([])
+        from ui.main_window import MainWindow
+        self.window = MainWindow()
+        self.window.resize(1200, 800)
+        self.window.show()
+        self.app.processEvents()
+        self.pool = pool_paths
+        self.batch = batch
+        self.repeat = repeat
+
+    def _items(self, count: int):
+        from core.models import ImageItem
+        from utils.image_utils import generate_thumbnail
+        thumbs = [generate_thumbnail(p) for p in self.pool]
+        items = []
+        for i in range(count):
+            p = self.pool[i % len(self.pool)]
+            # 时间打乱，使排序有实际工作量
+            t = 1_600_000_000.0 + ((i * 7919) % count) * 60.0
+            items.append(ImageItem(path=p, thumbnail=thumbs[i % len(thumbs)], filename=f"img_{i:06d}.jpg",
+                                   create_time=t, size=1000 + (i * 31) % 5000, mtime=t))
+        return items
+
+    def _timed(self, fn) -> float:
+        t0 = time.perf_counter()
+        fn()
+        self.app.processEvents()
+        return time.perf_counter() - t0
+
+    def reset(self):
+        mm = self.window.media_manager
+        mm.image_items = []
+        mm.image_list_changed.emit(mm.image_items)
+        self.app.processEvents()
+
+    def run(self, count: int, scenarios) -> dict:
+        from utils.resource_utils import RssSampler
+        mm = self.window.media_manager
+        results = {}
+        items = self._items(count)
+        mm.sort_mode = "按修改日期"
+        # 音频总时长决定时间轴宽度：每张图片约 2 秒
+        self.window.timeline.setDuration(count * 2.0)
+
+        def scenario(name, body):
+            if name not in scenarios:
+                return
+            with RssSampler() as rss:
+                samples = body()
+            results[name] = summarize(samples, rss.before, rss.after, rss.peak)
+
+        def add():
+            samples = []
+            # 每轮只有 count / batch 个样本（1000 张、每批 500 时仅 2 个），重复整轮以得到有意义的 p99
+            while len(samples) < max(1, self.repeat):
+                self.reset()
+                for start in range(0, count, self.batch):
+                    chunk = items[start:start + self.batch]
+
+                    def step():
+                        mm.image_items.extend(chunk)
+                        mm._sort_images()
+                        mm.image_list_changed.emit(mm.image_items)
+                    samples.append(self._timed(step))
+            return samples
+
+        def resort():
+            if len(mm.image_items) != count:
+                mm.image_items = list(items)
+                mm.image_list_changed.emit(mm.image_items)
+            modes = ["按文件名", "按文件大小", "按修改日期"]
+            return [self._timed(lambda m=modes[i % 3]: mm.set_sort_mode(m)) for i in range(self.repeat)]
+
+        content = self.window.timeline.content
+
+        def drag():
+            from PyQt5.QtCore import QEvent, QPoint, Qt
+            from PyQt5.QtGui import QMouseEvent
+            if len(mm.image_items) != count:
+                mm.image_items = list(items)
+                mm.image_list_changed.emit(mm.image_items)
+                self.app.processEvents()
+
+            def send(kind, x, buttons):
+                ev = QMouseEvent(kind, QPoint(x, 20), Qt.LeftButton, buttons, Qt.NoModifier)
+                self.app.sendEvent(content, ev)
+
+            samples = []
+            release_samples = []
+            release_rss = []
+            # 松开会触发重排与列表重建，代价远高于移动：拖动 repeat/4 次（至少 3 次），移动样本总数仍不少于 repeat
+            drags = max(3, self.repeat // 4)
+            for _ in range(drags):
+                marker = content.images[len(content.images) // 2]
+                x = int(marker['x'])
+                send(QEvent.MouseButtonPress, x, Qt.LeftButton)
+                for _ in range(max(1, -(-self.repeat // drags))):
+                    x += 3
+                    samples.append(self._timed(lambda x=x: (send(QEvent.MouseMove, x, Qt.LeftButton),
+                                                            content.repaint())))
+                # 松开时的重排单独计时，内存也只在松开期间采样
+                with RssSampler() as rss:
+                    release_samples.append(self._timed(lambda x=x: send(QEvent.MouseButtonRelease, x, Qt.NoButton)))
+                release_rss.append(rss)
+            if 'drag' in scenarios:
+                results['drag_release'] = summarize(release_samples, release_rss[0].before, release_rss[-1].after,
+                                                    max(r.peak for r in release_rss))
+            return samples
+
+        def paint_full():
+            return [self._timed(content.repaint) for _ in range(self.repeat)]
+
+        def paint_partial():
+            from PyQt5.QtCore import QRect
+            width = max(1, content.width() - 200)
+            return [self._timed(lambda i=i: content.repaint(QRect((i * 997) % width, 0, 200, content.height())))
+                    for i in range(self.repeat)]
+
+        scenario('add', add)
+        scenario('resort', resort)
+        scenario('drag', drag)
+        scenario('paint_full', paint_full)
+        scenario('paint_partial', paint_partial)
+        self.reset()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', default='1000,10000', help='图片数量列表，例如 1000,10000,50000')
+    parser.add_argument('--batch', type=int, default=500, help='add 场景每批追加的张数')
+    parser.add_argument('--repeat', type=int, default=20, help='其余场景的采样次数')
+    parser.add_argument('--scenarios', default=','.join(ALL_SCENARIOS))
+    parser.add_argument('--pool', type=int, default=32, help='合成 JPEG 文件数（条目循环引用）')
+    parser.add_argument('--out', help='把结果 JSON 写入文件（默认打印到标准输出）')
+    args = parser.parse_args()
+
+    scenarios = set(args.scenarios.split(','))
+    media_dir = os.path.join(tempfile.gettempdir(), 'jpeg2mpeg_bench_ui_media')
+    pool = make_photo_set(media_dir, args.pool, [(640, 480)], ['jpg'])
+    bench = UiBench(pool, args.batch, args.repeat)
+    result = {
+        'schema': 1,
+        'config': vars(args),
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'qt_platform': os.environ.get('QT_QPA_PLATFORM'),
+        },
+        'counts': {},
+    }
+    for count in (int(c) for c in args.counts.split(',')):
+        t0 = time.perf_counter()
+        result['counts'][str(count)] = bench.run(count, scenarios)
+        print(f"{count} 张：{time.perf_counter() - t0:.1f} 秒", file=sys.stderr)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""编码器校准：用一段合成幻灯片样本试编码本机 ffmpeg 支持的各编码器，记录速度、体积与 PSNR。
+
+用法：
+    python tools/calibrate_encoders.py [--families x264,x265,vp9,av1] [--size 640x360]
+                                       [--target-psnr 40] [--no-save] [--out calib.json]
+
+结果默认保存到缓存目录的 encoder_calibration.json（按 ffmpeg 文件与样本尺寸区分），
+导出时设置 JPEG2MPEG_ENCODER=auto 即按该结果选择达到 JPEG2MPEG_TARGET_PSNR 的最快编码器；
+没有结果时首次 auto 导出会自动校准。auto 只使用默认样本尺寸（640x360）的结果。
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.encoders import DEFAULT_TARGET_PSNR, ENCODER_FAMILIES, calibrate, pick_fastest, save_calibration
+from core.ffmpeg_locator import locate_ffmpeg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--families', default=','.join(ENCODER_FAMILIES))
+    parser.add_argument('--size', default='640x360', help='样本分辨率（宽x高，须为偶数）')
+    parser.add_argument('--images', type=int, default=3, help='样本中的图片数')
+    parser.add_argument('--seconds-per-image', type=float, default=1.0)
+    parser.add_argument('--target-psnr', type=float, default=DEFAULT_TARGET_PSNR)
+    parser.add_argument('--no-save', action='store_true', help='不写入校准缓存')
+    parser.add_argument('--out', help='另存结果 JSON')
+    args = parser.parse_args()
+
+    info = locate_ffmpeg()
+    if info is None:
+        print("未找到可用的 ffmpeg")
+        sys.exit(1)
+    w, _, h = args.size.lower().partition('x')
+    size = (int(w), int(h))
+    print(f"ffmpeg {info.version}（{info.path}），样本 {size[0]}x{size[1]}")
+    results = calibrate(info, args.families.split(','), size, args.images, args.seconds_per_image)
+    for r in results:
+        if r.error:
+            print(f"{r.family:6s} {r.codec:12s} 失败：{r.error}")
+        else:
+            print(f"{r.family:6s} {r.codec:12s} preset={r.preset:8s} crf={r.crf:3d}  {r.fps:8.1f} 帧/秒  "
+                  f"{r.bytes / 1024:8.1f} KiB  PSNR {r.psnr:.2f} dB")
+    best = pick_fastest(results, args.target_psnr)
+    if best is not None:
+        print(f"目标 PSNR {args.target_psnr:.1f} dB 下最快：{best.family}（{best.codec}）")
+    if not args.no_save:
+        save_calibration(info, results, size)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'ffmpeg': info.summary(), 'size': list(size), 'target_psnr': args.target_psnr,
+                       'results': [asdict(r) for r in results],
+                       'best': best.family if best else None}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
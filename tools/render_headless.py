@@ -0,0 +1,78 @@
+"""无界面导出：导入图片（文件或文件夹）与音频后直接导出，不显示窗口。
+
+用法：
+    python tools/render_headless.py IMAGES... [--audio a.mp3 ...] -o out.mp4
+                                    [--mp4-mode plain|faststart|fragmented]
+                                    [--backend yuvpipe] [--resolution 1080p] [--encoder x264]
+    python tools/render_headless.py photos/ --audio talk.mp3 -o - | curl -T - http://host/upload
+    python tools/render_headless.py photos/ --audio talk.mp3 -o www/talk.m3u8 --hls-ladder 720,480
+    python tools/render_headless.py photos/ --audio talk.mp3 -o talk.mp4 --resolution 1080p --renditions 480
+
+-o - 把分片 MP4 写到标准输出（也可以是已创建的命名管道），供其他进程或上传步骤直接读取，不产生中间文件；
+此时日志与进度只输出到标准错误。
+-o 为 .m3u8 时输出 HLS 分段与播放列表（--hls-ladder 额外输出缩小档位）；
+--renditions 在 -o 之外另写缩小档位的文件（如 talk_480p.mp4），图片只解码一次。其余设置与图形界面相同，均可通过 JPEG2MPEG_* 环境变量调整。
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+', help='图片文件或文件夹（文件夹递归导入）')
+    parser.add_argument('--audio', nargs='*', default=[], help='音频文件，按顺序拼接')
+    parser.add_argument('-o', '--output', required=True, help="输出文件；'-' 表示标准输出，.m3u8 表示 HLS")
+    parser.add_argument('--mp4-mode', choices=['plain', 'faststart', 'fragmented'])
+    parser.add_argument('--backend', choices=['moviepy', 'yuvpipe', 'ffmpeg'])
+    parser.add_argument('--resolution', help="720p / 1080p / 4k / native / native:N")
+    parser.add_argument('--encoder', help='x264 / x265 / vp9 / av1 / auto')
+    parser.add_argument('--hls-ladder', help="HLS 额外档位（短边像素），如 720,480")
+    parser.add_argument('--renditions', help="额外输出的缩小档位（短边像素），如 480")
+    parser.add_argument('--sort', default='按修改日期', choices=['按修改日期', '按文件名', '按文件大小'])
+    args = parser.parse_args()
+
+    # 命令行参数覆盖环境变量；须在创建导出管理器之前设置
+    for key, value in (('JPEG2MPEG_MP4_MODE', args.mp4_mode), ('JPEG2MPEG_EXPORT_BACKEND', args.backend),
+                       ('JPEG2MPEG_RESOLUTION', args.resolution), ('JPEG2MPEG_ENCODER', args.encoder),
+                       ('JPEG2MPEG_HLS_LADDER', args.hls_ladder), ('JPEG2MPEG_RENDITIONS', args.renditions)):
+        if value:
+            os.environ[key] = value
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from core.export_manager import ExportManager
+    from core.media_manager import MediaManager
+    from utils.file_utils import IMAGE_EXTS, iter_media_files
+    from utils.log_utils import setup_logging
+    setup_logging()
+
+    paths = []
+    for entry in args.images:
+        if os.path.isdir(entry):
+            paths += [p for p, _ in iter_media_files(entry, IMAGE_EXTS, True)]
+        else:
+            paths.append(entry)
+    manager = MediaManager()
+    manager.sort_mode = args.sort
+    manager.add_image_files(paths)
+    if args.audio:
+        manager.add_audio_files(args.audio)
+    if not manager.image_items:
+        print("没有可导入的图片", file=sys.stderr)
+        sys.exit(1)
+
+    exporter = ExportManager()
+    outcome = {}
+    exporter.plan_ready.connect(lambda text: print(text, file=sys.stderr))
+    exporter.export_finished.connect(lambda ok, msg: outcome.update(ok=ok, message=msg))
+    exporter.export_video(manager.image_items, manager.audio_items, args.output)
+    print(outcome.get('message', ''), file=sys.stderr)
+    sys.exit(0 if outcome.get('ok') else 1)
+
+
+if __name__ == '__main__':
+    main()
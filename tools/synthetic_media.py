@@ -0,0 +1,73 @@
+"""基准测试用的合成媒体：可复现的“照片”与正弦波 WAV 音频。
+
+照片为渐变 + 色块 + 噪声，JPEG 压缩后的体积与真实照片接近；同一 seed 生成的文件完全相同。
+修改时间按序号递增，使按修改日期排序与时长映射的结果稳定。
+"""
+import math
+import os
+import struct
+import wave
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """'4000x3000' -> (4000, 3000)。"""
+    w, _, h = text.lower().partition('x')
+    return int(w), int(h)
+
+
+def synthetic_photo(size: Tuple[int, int], seed: int) -> Image.Image:
+    """生成一张带渐变、色块与噪声的 RGB 图片。"""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    # 先在 1/8 尺寸上生成内容再放大，大尺寸时也能较快完成
+    sw, sh = max(8, w // 8), max(8, h // 8)
+    yy, xx = np.mgrid[0:sh, 0:sw].astype(np.float32)
+    base = rng.uniform(0, 255, 3).astype(np.float32)
+    grad = np.stack([xx / sw * 255, yy / sh * 255, (xx + yy) / (sw + sh) * 255], axis=-1)
+    small = 0.5 * grad + 0.5 * base
+    for _ in range(6):
+        x0, y0 = rng.integers(0, sw), rng.integers(0, sh)
+        small[y0:y0 + sh // 4, x0:x0 + sw // 4] = rng.uniform(0, 255, 3)
+    im = Image.fromarray(np.clip(small, 0, 255).astype(np.uint8)).resize((w, h), Image.BILINEAR)
+    noise = rng.normal(0, 6, (h, w, 1)).astype(np.float32)
+    arr = np.clip(np.asarray(im, dtype=np.float32) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(arr)
+
+
+def make_photo_set(out_dir: str, count: int, sizes: Sequence[Tuple[int, int]], formats: Sequence[str],
+                   seed: int = 0, start_time: float = 1_600_000_000.0, step: float = 60.0) -> List[str]:
+    """生成 count 张图片，尺寸与格式按序轮换；已存在的同名文件直接复用。返回路径列表。"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        fmt = formats[i % len(formats)].lower()
+        ext = 'jpg' if fmt in ('jpg', 'jpeg') else fmt
+        path = os.path.join(out_dir, f"img_{i:06d}_{size[0]}x{size[1]}.{ext}")
+        if not os.path.exists(path):
+            im = synthetic_photo(size, seed + i)
+            if ext == 'jpg':
+                im.save(path, format='JPEG', quality=90)
+            else:
+                im.save(path, format=ext.upper())
+        mtime = start_time + i * step
+        os.utime(path, (mtime, mtime))
+        paths.append(path)
+    return paths
+
+
+def make_wav(path: str, seconds: float, rate: int = 44100, freq: float = 440.0) -> str:
+    """生成单声道 16 位正弦波 WAV 文件。"""
+    frames = int(seconds * rate)
+    t = np.arange(frames, dtype=np.float32) / rate
+    samples = (np.sin(2 * math.pi * freq * t) * 0.3 * 32767).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(struct.calcsize('<h'))
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return path
@@ -0,0 +1,88 @@
+"""导出后端帧数一致性检查：对混合格式、混合尺寸的图片组分别用各后端导出，
+确认输出的视频帧数等于 sum(frame_counts(durations, fps))。
+
+用法：
+    python tools/test_backend_frames.py [--backends ffmpeg,yuvpipe]
+
+图片组覆盖 ffmpeg 滤镜图后端容易出错的情形：同一解码器内尺寸变化（PNG 640x480 -> 1000x500）、
+相邻的 GIF/TIFF（均经 PIL 回退为 PNG）、比画布小的图片。任一检查失败时退出码为 1。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 每组为 [(扩展名, 尺寸), ...]
+CASES = {
+    'png_size_change': [('.jpg', (640, 480)), ('.png', (640, 480)), ('.png', (1000, 500)), ('.jpg', (640, 480))],
+    'gif_tiff_adjacent': [('.jpg', (640, 480)), ('.gif', (320, 240)), ('.tif', (800, 600)),
+                          ('.gif', (640, 480)), ('.jpg', (640, 480))],
+    'small_images': [('.jpg', (640, 480)), ('.jpg', (300, 200)), ('.png', (300, 200)), ('.bmp', (1200, 900))],
+}
+
+
+def make_images(folder: str, specs):
+    from PIL import Image
+    paths = []
+    for i, (ext, size) in enumerate(specs):
+        path = os.path.join(folder, f'{i:02d}{ext}')
+        im = Image.new('RGB', size, ((i * 70) % 256, (i * 130) % 256, 200))
+        im.save(path)
+        # 修改时间按序号递增，使按修改日期排序的结果与列表顺序一致
+        os.utime(path, (1_600_000_000 + i, 1_600_000_000 + i))
+        paths.append(path)
+    return paths
+
+
+def export_frames(backend: str, paths, output: str):
+    """用指定后端导出，返回 (是否成功, 消息, 预期帧数, 实际帧数)。"""
+    import imageio_ffmpeg
+    from core.export_manager import ExportManager
+    from core.ffmpeg_writer import frame_counts
+    from core.media_manager import MediaManager
+    os.environ['JPEG2MPEG_EXPORT_BACKEND'] = backend
+    manager = MediaManager()
+    manager.add_image_files(paths)
+    exporter = ExportManager()
+    outcome = {}
+    exporter.export_finished.connect(lambda ok, msg: outcome.update(ok=ok, message=msg))
+    exporter.export_video(manager.image_items, [], output)
+    expected = sum(frame_counts(exporter.compute_durations(manager.image_items, 0.0), exporter.fps))
+    if not outcome.get('ok'):
+        return False, outcome.get('message', ''), expected, 0
+    frames, _secs = imageio_ffmpeg.count_frames_and_secs(output)
+    return True, '', expected, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='ffmpeg,yuvpipe', help='逗号分隔的导出后端')
+    args = parser.parse_args()
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])  # noqa: F841
+
+    folder = tempfile.mkdtemp(prefix='jpeg2mpeg_frametest_')
+    failed = False
+    try:
+        for name, specs in CASES.items():
+            case_dir = os.path.join(folder, name)
+            os.makedirs(case_dir)
+            paths = make_images(case_dir, specs)
+            for backend in (b.strip() for b in args.backends.split(',') if b.strip()):
+                ok, message, expected, frames = export_frames(backend, paths, os.path.join(case_dir, f'{backend}.mp4'))
+                passed = ok and frames == expected
+                failed |= not passed
+                detail = f"预期 {expected} 帧，实际 {frames} 帧" if ok else f"导出失败：{message}"
+                print(f"{name} / {backend}：{detail} —— {'通过' if passed else '失败'}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
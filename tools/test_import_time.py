@@ -0,0 +1,67 @@
+"""启动导入耗时检查：在子进程中用 python -X importtime 导入 ui.main_window，
+确认 moviepy/numpy 等重量级导出依赖没有在启动时被导入，且总耗时不超过预算。
+
+用法：
+    python tools/test_import_time.py [--budget-ms 250] [--module ui.main_window]
+
+预算也可用环境变量 JPEG2MPEG_IMPORT_BUDGET_MS 设置。任一检查失败时退出码为 1。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 这些模块只应在导出时（或启动后由 utils.prewarm 在后台）导入
+FORBIDDEN = ('numpy', 'moviepy', 'imageio', 'imageio_ffmpeg', 'proglog')
+
+
+def measure(module: str):
+    """返回 ({模块名: 累计微秒}, 原始输出)。"""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{proc.stderr}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        # 格式：import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        times[parts[2].strip()] = cumulative
+    return times, proc.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='ui.main_window')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('JPEG2MPEG_IMPORT_BUDGET_MS', '250')))
+    parser.add_argument('--top', type=int, default=10, help='列出累计耗时最多的模块数')
+    args = parser.parse_args()
+
+    times, _ = measure(args.module)
+    total_ms = times.get(args.module, 0) / 1000.0
+    failed = False
+    print(f"导入 {args.module}：{total_ms:.1f} ms（预算 {args.budget_ms:.0f} ms）")
+    for name, us in sorted(times.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000.0:8.1f} ms  {name}")
+    heavy = sorted({n.split('.')[0] for n in times} & set(FORBIDDEN))
+    if heavy:
+        failed = True
+        print(f"失败：启动时导入了重量级模块：{', '.join(heavy)}")
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"失败：导入耗时超出预算 {total_ms - args.budget_ms:.1f} ms")
+    if not failed:
+        print("通过")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""yuvpipe 流水线内存上限检查：生成 6000x4000 的 JPEG 与 PNG，按 3528x2352 画布、4 个解码线程
+运行 FramePipeline，确认每个内存上限下进程峰值 RSS 的增长都不超过该上限。
+
+用法：
+    python tools/test_pipeline_memory.py [--limits 320,512] [--workers 4] [--count 12]
+
+每个上限在单独的子进程中运行（峰值 RSS 不受前一次影响）。上限须能容纳单张图片的工作集
+（6000x4000 的 PNG 约 293 MB），否则流水线会逐张独占执行并超过上限，此时同样判为失败。
+任一检查失败时退出码为 1。
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_SIZE = (6000, 4000)
+TARGET_SIZE = (3528, 2352)
+
+
+def make_images(folder: str, count: int):
+    """生成 count 张大尺寸图片（约四分之三为 JPEG，其余为 PNG，交替排列）。"""
+    import numpy as np
+    from PIL import Image
+    w, h = SOURCE_SIZE
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        rgb = np.empty((h, w, 3), dtype=np.uint8)
+        rgb[..., 0] = x
+        rgb[..., 1] = y
+        rgb[..., 2] = (i * 37) % 256
+        # 少量噪声使 JPEG 不至于过小，接近照片的解码成本
+        rgb[::8, ::8] = rng.integers(0, 256, size=rgb[::8, ::8].shape, dtype=np.uint8)
+        ext = '.png' if i % 4 == 3 else '.jpg'
+        path = os.path.join(folder, f'{i:03d}{ext}')
+        Image.fromarray(rgb).save(path, **({'quality': 90} if ext == '.jpg' else {'compress_level': 1}))
+        paths.append(path)
+    return paths
+
+
+def run_child(limit_mb: int, workers: int, folder: str) -> None:
+    """子进程：运行一次流水线并打印 '峰值增长字节 预算峰值字节 超限张数'。"""
+    sys.path.insert(0, ROOT)
+    import numpy  # noqa: F401  导入本身的内存不计入增长
+    from PIL import Image
+    from core.export_pipeline import FramePipeline
+    from utils.resource_utils import current_rss_bytes, peak_rss_bytes
+    paths = sorted(os.path.join(folder, n) for n in os.listdir(folder))
+    sizes = []
+    for p in paths:
+        with Image.open(p) as im:
+            sizes.append(im.size)
+    base = current_rss_bytes()
+    pipeline = FramePipeline(paths, [1] * len(paths), TARGET_SIZE, sizes=sizes, decode_workers=workers,
+                             memory_limit=limit_mb * 1024 * 1024)
+    pipeline.run(lambda frame, repeat: None)
+    stats = pipeline.stats_dict()
+    print(peak_rss_bytes() - base, stats['budget_peak_bytes'], stats['budget_oversize'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limits', default='320,512', help='逗号分隔的内存上限（MB）')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--count', type=int, default=12)
+    parser.add_argument('--child', nargs=2, metavar=('LIMIT_MB', 'DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(int(args.child[0]), args.workers, args.child[1])
+        return
+
+    folder = tempfile.mkdtemp(prefix='jpeg2mpeg_memtest_')
+    failed = False
+    try:
+        make_images(folder, args.count)
+        for limit_mb in (int(v) for v in args.limits.split(',') if v.strip()):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--workers', str(args.workers),
+                                   '--child', str(limit_mb), folder], capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"上限 {limit_mb} MB：运行失败\n{proc.stderr}")
+                failed = True
+                continue
+            growth, budget_peak, oversize = (int(v) for v in proc.stdout.split())
+            ok = growth <= limit_mb * 1024 * 1024 and oversize == 0
+            failed |= not ok
+            print(f"上限 {limit_mb} MB：峰值 RSS 增长 {growth / 2 ** 20:.0f} MB，"
+                  f"预算峰值 {budget_peak / 2 ** 20:.0f} MB，超限 {oversize} 张 —— {'通过' if ok else '失败'}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,9 @@ from ui.widgets import CardWidget, SortComboBox, StatusbarWithProgress, Draggabl
 from ui.timeline_widget import TimelineWidget
 from core.media_manager import MediaManager
 from core.export_manager import ExportManager
+from utils.file_utils import IMAGE_EXTS, AUDIO_EXTS
+from utils.profiling import recent_profile_files
+from utils.stall_watchdog import watchdog_paused
 
 
 class MainWindow(QMainWindow):
@@ -141,6 +144,7 @@ class MainWindow(QMainWindow):
         self.media_manager.image_list_changed.connect(self.updateImageList)
         self.media_manager.audio_list_changed.connect(self.updateAudioList)
         self.media_manager.audio_duration_changed.connect(self.timeline.setDuration)
+        self.media_manager.folder_scan_progress.connect(self._on_folder_scan_progress)
 
         # 导出管理（连接到状态栏控件的方法）
         self.export_manager.progress_updated.connect(self.status_widget.showProgress)
@@ -151,6 +155,8 @@ class MainWindow(QMainWindow):
                 self.status_widget.set_status('error')
             self.status_widget.showMessage(msg)
         self.export_manager.export_finished.connect(_on_export_finished)
+        # 导出前的分辨率规划与预计编码成本
+        self.export_manager.plan_ready.connect(lambda text: self.status_widget.showMessage(f"导出计划：{text}"))
         # 时间轴点击跳转
         self.timeline.image_clicked.connect(self._on_timeline_image_clicked)
         # 当图片列表选中变化，通知时间轴高亮对应色块
@@ -167,10 +173,19 @@ class MainWindow(QMainWindow):
             pass
 
     def open_diagnostic_log(self):
-        """打开 ExportManager 最近一次生成的诊断日志（JSON）。"""
+        """打开 ExportManager 最近一次生成的诊断日志（JSON）。
+
+        启用 JPEG2MPEG_PROFILE 后如有性能分析文件，先询问打开诊断日志、最新分析摘要还是所在文件夹。
+        """
         try:
             path = getattr(self.export_manager, 'last_diagnostic_log', None)
-            if not path or not os.path.exists(path):
+            if path and not os.path.exists(path):
+                path = None
+            profiles = recent_profile_files()
+            if profiles:
+                self._open_profile_choice(path, profiles)
+                return
+            if not path:
                 QMessageBox.information(self, "诊断日志", "未找到诊断日志文件。请先执行一次导出。")
                 return
             # 使用系统默认程序打开文件
@@ -178,6 +193,25 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "打开日志失败", str(e))
 
+    def _open_profile_choice(self, diag_path, profiles):
+        """列出最近的性能分析文件，并按用户选择打开。"""
+        summaries = [p for p in profiles if p.endswith('.txt')]
+        box = QMessageBox(self)
+        box.setWindowTitle("诊断日志")
+        box.setText("最近的性能分析文件：\n" + "\n".join(os.path.basename(p) for p in profiles[:8]))
+        diag_btn = box.addButton("打开诊断日志", QMessageBox.AcceptRole) if diag_path else None
+        summary_btn = box.addButton("打开最新分析摘要", QMessageBox.ActionRole) if summaries else None
+        folder_btn = box.addButton("打开所在文件夹", QMessageBox.ActionRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        clicked = box.clickedButton()
+        if diag_btn is not None and clicked is diag_btn:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(diag_path))
+        elif summary_btn is not None and clicked is summary_btn:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(summaries[0]))
+        elif clicked is folder_btn:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(profiles[0])))
+
     def show_diagnostic_in_explorer(self):
         """在文件管理器中显示包含诊断日志的文件夹并选中该文件（Windows 优先）。"""
         try:
@@ -247,6 +281,12 @@ class MainWindow(QMainWindow):
         except Exception:
             pass
 
+    def _on_folder_scan_progress(self, count: int, done: bool):
+        if done:
+            self.status_widget.showMessage(f"导入完成，共扫描到 {count} 张图片")
+        else:
+            self.status_widget.showMessage(f"正在导入… 已扫描 {count} 张图片")
+
     def updateAudioList(self, audio_items):
         self.audio_list.clear()
         for it in audio_items:
@@ -295,25 +335,57 @@ class MainWindow(QMainWindow):
         audio_paths = []
         for u in urls:
             p = u.toLocalFile()
-            if p:
+            if p and os.path.isdir(p):
+                # 拖入文件夹：递归流式导入其中的图片
+                self.media_manager.add_folder_path(p)
+            elif p:
                 ext = os.path.splitext(p)[1].lower()
-                if ext in ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff'):
+                if ext in IMAGE_EXTS:
                     image_paths.append(p)
-                elif ext in ('.mp3', '.wav', '.ogg', '.m4a', '.flac'):
+                elif ext in AUDIO_EXTS:
                     audio_paths.append(p)
 
         if image_paths:
-            self.media_manager.add_image_files(image_paths)
+            self.media_manager.queue_image_files(image_paths)
         if audio_paths:
             self.media_manager.add_audio_files(audio_paths)
 
+    # 预计编码时间超过该秒数时先询问是否继续
+    EXPORT_CONFIRM_SECONDS = 60
+
+    def _confirm_export_plan(self) -> bool:
+        """导出前显示分辨率规划与预计编码成本；耗时较长时请用户确认。返回是否继续导出。
+
+        导出在界面线程中同步执行，导出期间状态栏无法重绘，因此在开始前计算并立即绘制。
+        """
+        try:
+            plan = self.export_manager.plan_export(self.media_manager.image_items, self.media_manager.audio_items)
+        except Exception:
+            plan = None
+        if plan is None:
+            self.status_widget.showMessage("导出开始")
+            QApplication.processEvents()
+            return True
+        if plan.estimated_encode_seconds > self.EXPORT_CONFIRM_SECONDS:
+            answer = QMessageBox.question(self, "确认导出", f"导出计划：{plan.summary()}\n\n是否继续导出？",
+                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if answer != QMessageBox.Yes:
+                self.status_widget.showMessage("已取消导出")
+                return False
+        self.status_widget.showMessage(f"导出开始：{plan.summary()}")
+        QApplication.processEvents()
+        return True
+
     def on_export(self):
-        out, _ = QFileDialog.getSaveFileName(self, "保存视频为", "", "MP4 文件 (*.mp4);;所有文件 (*)")
+        out, _ = QFileDialog.getSaveFileName(self, "保存视频为", "", "MP4 文件 (*.mp4);;HLS 播放列表 (*.m3u8);;所有文件 (*)")
         if not out:
             return
+        if not self._confirm_export_plan():
+            return
         try:
             self.status_widget.set_status('working')
-            self.status_widget.showMessage("导出开始")
-            self.export_manager.export_video(self.media_manager.image_items, self.media_manager.audio_items, out)
+            # 同步导出必然阻塞事件循环，不计为界面卡顿
+            with watchdog_paused():
+                self.export_manager.export_video(self.media_manager.image_items, self.media_manager.audio_items, out)
         except Exception as e:
             QMessageBox.critical(self, "导出错误", str(e))
@@ -2,6 +2,8 @@ from PyQt5.QtWidgets import QScrollArea, QWidget
 from PyQt5.QtCore import Qt, QSize, pyqtSignal
 from PyQt5.QtGui import QPainter, QFont, QPen, QColor, QPixmap
 
+from utils.profiling import profiled
+
 
 class _TimelineContent(QWidget):
     image_moved = pyqtSignal(int, float)
@@ -172,6 +174,7 @@ class TimelineWidget(QScrollArea):
         except Exception:
             pass
 
+    @profiled('timeline_set_images')
     def set_images(self, images):
         """images: list of ImageItem (have create_time and thumbnail)."""
         self._images = images or []
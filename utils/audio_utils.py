@@ -22,14 +22,19 @@ def get_audio_duration(path: str) -> float:
             return d
         except Exception as e:
             raise e
-from mutagen.mp3 import MP3
-from mutagen.wave import WAVE
-from mutagen.oggvorbis import OggVorbis
 import os
 
+from utils.log_utils import get_logger
+
+logger = get_logger('audio_utils')
+
 def get_audio_duration(file_path):
     """获取音频时长（秒）"""
     try:
+        # mutagen 在首次读取音频时才导入，不计入启动时间
+        from mutagen.mp3 import MP3
+        from mutagen.wave import WAVE
+        from mutagen.oggvorbis import OggVorbis
         ext = os.path.splitext(file_path)[1].lower()
         if ext == '.mp3':
             audio = MP3(file_path)
@@ -41,5 +46,5 @@ def get_audio_duration(file_path):
             return 0
         return int(audio.info.length)
     except Exception as e:
-        print(f"音频时长获取失败：{str(e)}")
+        logger.warning("音频时长获取失败：%s：%s", file_path, e)
         return 0
\ No newline at end of file
@@ -0,0 +1,141 @@
+import datetime
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+# EXIF 标签
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+# APP1 段最大 64 KiB；扫描标记时最多读取的字节数（防止异常文件导致长时间读取）
+_MAX_SCAN_BYTES = 256 * 1024
+
+
+def parse_exif_datetime(value) -> Optional[float]:
+    """把 EXIF 'YYYY:MM:DD HH:MM:SS' 字符串解析为本地时间戳；无法解析时返回 None。"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, bytes):
+            value = value.decode('ascii', errors='ignore')
+        text = str(value).strip().rstrip('\x00')
+        return datetime.datetime.strptime(text[:19], '%Y:%m:%d %H:%M:%S').timestamp()
+    except (ValueError, OverflowError):
+        return None
+
+
+def read_jpeg_app1(path: str) -> Optional[bytes]:
+    """只读取 JPEG 的 EXIF APP1 段（TIFF 数据部分），不解码像素；没有 EXIF 时返回 None。"""
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        scanned = 2
+        while scanned < _MAX_SCAN_BYTES:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            if code == 0xFF:
+                # 填充字节
+                f.seek(-1, os.SEEK_CUR)
+                scanned += 1
+                continue
+            if code in (0xD9, 0xDA):
+                # EOI / SOS：之后是图像数据，不再有 APP 段
+                return None
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack('>H', length_bytes)[0]
+            if code == 0xE1:
+                data = f.read(length - 2)
+                if data.startswith(b'Exif\x00\x00'):
+                    return data[6:]
+            else:
+                f.seek(length - 2, os.SEEK_CUR)
+            scanned += 2 + length
+    return None
+
+
+def _read_ifd(tiff: bytes, offset: int, endian: str) -> Dict[int, tuple]:
+    """解析一个 IFD，返回 {tag: (type, count, value_or_offset_bytes)}。"""
+    entries = {}
+    if offset + 2 > len(tiff):
+        return entries
+    count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+    pos = offset + 2
+    for _ in range(count):
+        if pos + 12 > len(tiff):
+            break
+        tag, typ, n = struct.unpack_from(endian + 'HHI', tiff, pos)
+        entries[tag] = (typ, n, tiff[pos + 8:pos + 12])
+        pos += 12
+    return entries
+
+
+def _ascii_value(tiff: bytes, entry: tuple, endian: str) -> Optional[bytes]:
+    typ, n, raw = entry
+    if typ != 2:
+        return None
+    if n <= 4:
+        return raw[:n]
+    off = struct.unpack(endian + 'I', raw)[0]
+    return tiff[off:off + n]
+
+
+def capture_time_from_tiff(tiff: bytes) -> Optional[float]:
+    """从 EXIF TIFF 数据中读取 DateTimeOriginal（其次 IFD0 的 DateTime）。"""
+    if len(tiff) < 8:
+        return None
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    ifd0_off = struct.unpack_from(endian + 'I', tiff, 4)[0]
+    ifd0 = _read_ifd(tiff, ifd0_off, endian)
+    exif_ptr = ifd0.get(TAG_EXIF_IFD)
+    if exif_ptr is not None:
+        exif_off = struct.unpack(endian + 'I', exif_ptr[2])[0]
+        exif_ifd = _read_ifd(tiff, exif_off, endian)
+        if TAG_DATETIME_ORIGINAL in exif_ifd:
+            ts = parse_exif_datetime(_ascii_value(tiff, exif_ifd[TAG_DATETIME_ORIGINAL], endian))
+            if ts is not None:
+                return ts
+    if TAG_DATETIME in ifd0:
+        return parse_exif_datetime(_ascii_value(tiff, ifd0[TAG_DATETIME], endian))
+    return None
+
+
+def read_capture_time(path: str) -> Optional[float]:
+    """读取一张图片的拍摄时间（时间戳）；没有 EXIF 或读取失败时返回 None。
+
+    JPEG 只读取 APP1 段；其他格式回退到 PIL（只解析文件头，不解码像素）。
+    """
+    try:
+        if path.lower().endswith(('.jpg', '.jpeg')):
+            tiff = read_jpeg_app1(path)
+            return capture_time_from_tiff(tiff) if tiff else None
+        from PIL import Image
+        with Image.open(path) as im:
+            exif = im.getexif()
+            raw = None
+            try:
+                raw = exif.get_ifd(TAG_EXIF_IFD).get(TAG_DATETIME_ORIGINAL)
+            except Exception:
+                raw = None
+            return parse_exif_datetime(raw or exif.get(TAG_DATETIME))
+    except Exception:
+        return None
+
+
+def read_capture_times(paths: Iterable[str], workers: int = 8) -> Dict[str, Optional[float]]:
+    """并行批量读取拍摄时间，返回 {路径: 时间戳或 None}。"""
+    paths = list(paths)
+    if len(paths) < 16 or workers <= 1:
+        return {p: read_capture_time(p) for p in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(read_capture_time, paths)))
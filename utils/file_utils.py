@@ -1,7 +1,11 @@
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
-IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff'}
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.tif', '.webp'}
 AUDIO_EXTS = {'.mp3', '.wav', '.ogg', '.m4a', '.flac'}
 
 
@@ -73,4 +77,157 @@ def get_audio_files(file_paths):
 
 def validate_local_file(path):
     """验证是否为本地有效文件"""
-    return os.path.isfile(path)
\ No newline at end of file
+    return os.path.isfile(path)
+
+def get_cache_dir() -> str:
+    """返回（并创建）本地缓存目录。
+
+    优先使用环境变量 `JPEG2MPEG_CACHE_DIR`；否则 Windows 使用 %LOCALAPPDATA%\\JPEG2MPEG，
+    其他平台使用 ~/.cache/jpeg2mpeg。
+    """
+    path = os.environ.get('JPEG2MPEG_CACHE_DIR')
+    if not path:
+        if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+            path = os.path.join(os.environ['LOCALAPPDATA'], 'JPEG2MPEG')
+        else:
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'jpeg2mpeg')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def iter_media_files(root: str, exts: Set[str] = IMAGE_EXTS, recursive: bool = True) -> Iterator[Tuple[str, Optional[os.stat_result]]]:
+    """基于 os.scandir 流式遍历目录，逐个产出 (路径, stat 结果)。
+
+    - 只按扩展名过滤（不经过 urlparse / isfile），目录项类型来自 DirEntry，无额外系统调用
+    - stat 结果取自 DirEntry（Windows 上为目录枚举时已获得的数据），调用方可直接复用
+    - 按目录深度优先遍历，子目录与文件均按名称排序，结果顺序稳定
+    - 无法访问的目录或文件会被跳过
+    """
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subdirs.append(entry.path)
+                    continue
+                name = entry.name
+                dot = name.rfind('.')
+                if dot < 0 or name[dot:].lower() not in exts:
+                    continue
+                if not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    st = None
+                yield entry.path, st
+            except OSError:
+                continue
+        # 逆序压栈，使子目录按名称顺序出栈
+        stack.extend(reversed(subdirs))
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    """把可迭代对象切分为长度不超过 size 的列表。"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# 内容嗅探：只读取文件开头若干字节
+SNIFF_BYTES = 16
+
+# M4A/MP4 容器 ftyp 中视为音频的品牌
+_M4A_BRANDS = (b'M4A ', b'M4B ', b'M4P ', b'mp41', b'mp42', b'isom', b'iso2', b'dash')
+
+
+def sniff_bytes(head: bytes) -> Optional[str]:
+    """根据文件头识别格式，返回如 'image/jpeg'、'audio/mpeg' 的类型字符串；无法识别返回 None。"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'image/tiff'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+        return 'audio/wav'
+    if head.startswith(b'BM') and len(head) >= 14:
+        return 'image/bmp'
+    if head.startswith(b'ID3'):
+        return 'audio/mpeg'
+    if len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0 and (head[1] & 0x06) != 0:
+        # MPEG 音频帧同步字（layer 位不为保留值 00）
+        return 'audio/mpeg'
+    if head.startswith(b'OggS'):
+        return 'audio/ogg'
+    if head.startswith(b'fLaC'):
+        return 'audio/flac'
+    if head[4:8] == b'ftyp' and head[8:12] in _M4A_BRANDS:
+        return 'audio/mp4'
+    return None
+
+
+def media_kind(mime: Optional[str]) -> Optional[str]:
+    """'image/jpeg' -> 'image'；None -> None。"""
+    return mime.split('/', 1)[0] if mime else None
+
+
+# 嗅探结果的 LRU 缓存上限（条目数）；长期运行导入大量文件时不会无限增长
+SNIFF_CACHE_MAX = 4096
+_sniff_cache: 'OrderedDict[str, Tuple[int, float, Optional[str]]]' = OrderedDict()
+_sniff_lock = threading.Lock()
+
+
+def sniff_file(path: str, st: Optional[os.stat_result] = None) -> Optional[str]:
+    """读取文件开头 SNIFF_BYTES 字节识别类型；结果按 (路径, 大小, 修改时间) 缓存（最近使用的 SNIFF_CACHE_MAX 条）。"""
+    try:
+        if st is None:
+            st = os.stat(path)
+        with _sniff_lock:
+            cached = _sniff_cache.get(path)
+            if cached is not None:
+                _sniff_cache.move_to_end(path)
+        if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime:
+            return cached[2]
+        with open(path, 'rb') as f:
+            mime = sniff_bytes(f.read(SNIFF_BYTES))
+        with _sniff_lock:
+            _sniff_cache[path] = (st.st_size, st.st_mtime, mime)
+            _sniff_cache.move_to_end(path)
+            while len(_sniff_cache) > SNIFF_CACHE_MAX:
+                _sniff_cache.popitem(last=False)
+        return mime
+    except OSError:
+        return None
+
+
+def classify_files(paths: Iterable[str], stats: Optional[Dict[str, os.stat_result]] = None,
+                   workers: int = 8) -> Dict[str, Optional[str]]:
+    """批量嗅探文件类型，返回 {路径: 类型字符串或 None}。
+
+    每个文件只读取一小段文件头；文件较多时用线程池并行读取（I/O 等待可以重叠）。
+    """
+    paths = list(paths)
+    stats = stats or {}
+    if len(paths) < 32 or workers <= 1:
+        return {p: sniff_file(p, stats.get(p)) for p in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda p: sniff_file(p, stats.get(p)), paths)
+        return dict(zip(paths, results))
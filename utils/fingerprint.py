@@ -0,0 +1,58 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+# 快速指纹读取的头/尾块大小
+FINGERPRINT_BLOCK = 64 * 1024
+# 完整哈希的读取块大小
+_FULL_CHUNK = 1024 * 1024
+
+
+def fast_fingerprint(path: str, st: Optional[os.stat_result] = None, block: int = FINGERPRINT_BLOCK) -> str:
+    """快速内容指纹：BLAKE2b(文件大小 + 头部块 + 尾部块)，与路径和修改时间无关。
+
+    只读取最多 2 * block 字节，文件改名或移动后指纹不变，可作为各类缓存的键。
+    返回形如 'f1:<32 位十六进制>' 的字符串（前缀区分指纹算法）。
+    """
+    if st is None:
+        st = os.stat(path)
+    size = st.st_size
+    h = hashlib.blake2b(digest_size=16)
+    h.update(size.to_bytes(8, 'little'))
+    with open(path, 'rb') as f:
+        h.update(f.read(block))
+        if size > block:
+            f.seek(max(block, size - block))
+            h.update(f.read(block))
+    return 'f1:' + h.hexdigest()
+
+
+def full_fingerprint(path: str) -> str:
+    """完整内容哈希（BLAKE2b 全文件），用于需要严格去重的场合；返回 'b2:<32 位十六进制>'。"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_FULL_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return 'b2:' + h.hexdigest()
+
+
+def fingerprint_many(paths: Iterable[str], stats: Optional[Dict[str, os.stat_result]] = None,
+                     full: bool = False, workers: int = 8) -> Dict[str, Optional[str]]:
+    """并行计算多个文件的指纹，返回 {路径: 指纹或 None（读取失败）}。"""
+    paths = list(paths)
+    stats = stats or {}
+
+    def one(p):
+        try:
+            return full_fingerprint(p) if full else fast_fingerprint(p, stats.get(p))
+        except OSError:
+            return None
+
+    if len(paths) < 16 or workers <= 1:
+        return {p: one(p) for p in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(one, paths)))
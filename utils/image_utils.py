@@ -4,6 +4,10 @@ from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import Qt
 from PIL import Image
 
+from utils.log_utils import get_logger
+
+logger = get_logger('image_utils')
+
 
 THUMB_SIZE: Tuple[int, int] = (100, 100)
 
@@ -25,18 +29,58 @@ def generate_thumbnail(path: Optional[str], size: Tuple[int, int] = THUMB_SIZE)
         return _placeholder_pixmap(size)
     try:
         with Image.open(path) as im:
-            # 转为 RGBA 或 RGB，保持兼容性
-            if im.mode not in ("RGB", "RGBA"):
-                im = im.convert("RGBA")
-            im.thumbnail(size)
-            buf = io.BytesIO()
-            im.save(buf, format="PNG")
-            data = buf.getvalue()
-            qimg = QImage.fromData(data)
-            if qimg.isNull():
-                return _placeholder_pixmap(size)
-            return QPixmap.fromImage(qimg)
-    except Exception as e:
-        # 打印详细错误到控制台以便调试
-        print(f"generate_thumbnail error for {path}: {e}")
+            return thumbnail_from_image(im, size)
+    except Exception:
+        logger.warning("生成缩略图失败：%s", path, exc_info=True)
+        return _placeholder_pixmap(size)
+
+
+def thumbnail_from_image(im: Image.Image, size: Tuple[int, int] = THUMB_SIZE) -> QPixmap:
+    """由已打开的 PIL 图片生成缩略图，便于与元数据读取共用一次打开。
+
+    注意：对尚未解码的 JPEG 会调用 draft()，之后 im.size 会变小；尺寸等头信息须在调用前读取。
+    """
+    return pixmap_from_png(thumbnail_png_from_image(im, size), size)
+
+
+def pixmap_from_png(data: Optional[bytes], size: Tuple[int, int] = THUMB_SIZE) -> QPixmap:
+    """PNG 数据 -> QPixmap；数据无效时返回占位图。"""
+    if not data:
+        return _placeholder_pixmap(size)
+    qimg = QImage.fromData(data)
+    if qimg.isNull():
         return _placeholder_pixmap(size)
+    return QPixmap.fromImage(qimg)
+
+
+def thumbnail_png_from_image(im: Image.Image, size: Tuple[int, int] = THUMB_SIZE) -> bytes:
+    """由已打开的 PIL 图片生成缩略图 PNG 数据（可写入缩略图缓存）。"""
+    # JPEG 在解码时直接按 1/2/4/8 缩小
+    try:
+        im.draft('RGB', size)
+    except Exception:
+        pass
+    # 转为 RGBA 或 RGB，保持兼容性
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA")
+    else:
+        im = im.copy()
+    im.thumbnail(size)
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def pixmap_to_gray_array(pixmap) -> Optional["np.ndarray"]:
+    """把已解码的缩略图（QPixmap/QImage）转换为二维 uint8 灰度数组；无效时返回 None。"""
+    import numpy as np
+    if pixmap is None:
+        return None
+    qimg = pixmap.toImage() if isinstance(pixmap, QPixmap) else pixmap
+    if not isinstance(qimg, QImage) or qimg.isNull():
+        return None
+    qimg = qimg.convertToFormat(QImage.Format_Grayscale8)
+    w, h, stride = qimg.width(), qimg.height(), qimg.bytesPerLine()
+    ptr = qimg.constBits()
+    ptr.setsize(stride * h)
+    return np.frombuffer(ptr, dtype=np.uint8).reshape(h, stride)[:, :w].copy()
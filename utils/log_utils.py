@@ -0,0 +1,152 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# 所有模块日志记录器的公共前缀
+ROOT_LOGGER = 'jpeg2mpeg'
+LOG_FILE_NAME = 'jpeg2mpeg.log'
+# 单个日志文件上限与保留的历史文件数
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# 重复消息聚合：同一位置同一消息模板在窗口期内最多输出 burst 条，其余只计数
+RATE_LIMIT_WINDOW = 10.0
+RATE_LIMIT_BURST = 3
+
+_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_rate_filter: Optional['RepeatedMessageFilter'] = None
+_log_file: Optional[str] = None
+
+
+class RepeatedMessageFilter(logging.Filter):
+    """按 (记录器, 级别, 消息模板) 聚合重复消息：窗口期内超过 burst 条后丢弃并计数。
+
+    窗口结束后的第一条同类消息会附带被省略的条数；程序退出时由 flush() 输出剩余计数。
+    过滤发生在 QueueHandler 格式化之前，被丢弃的记录不会格式化回溯。
+    """
+
+    def __init__(self, window: float = RATE_LIMIT_WINDOW, burst: int = RATE_LIMIT_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = max(1, burst)
+        # key -> [窗口起点, 本窗口已输出条数, 已省略条数]
+        self._seen: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._seen.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                self._seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg}（此前 {self.window:g} 秒内同类消息省略 {suppressed} 条）"
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+    def flush(self) -> None:
+        """把尚未报告的省略计数作为汇总消息输出。"""
+        with self._lock:
+            pending = [(k, s[2]) for k, s in self._seen.items() if s[2]]
+            self._seen.clear()
+        for (name, level, msg), count in pending:
+            logging.getLogger(name).log(level, "同类消息省略 %d 条：%s", count, msg)
+
+
+def default_log_dir() -> str:
+    """日志目录：与诊断 JSON 相同（JPEG2MPEG_LOG_DIR），未设置时为系统临时目录。"""
+    env_dir = os.environ.get('JPEG2MPEG_LOG_DIR')
+    if env_dir:
+        try:
+            os.makedirs(env_dir, exist_ok=True)
+            return env_dir
+        except OSError:
+            pass
+    return tempfile.gettempdir()
+
+
+def setup_logging(log_dir: Optional[str] = None, level: Optional[str] = None) -> Optional[str]:
+    """初始化日志子系统（可重复调用，只生效一次），返回日志文件路径。
+
+    调用线程只把记录放入内存队列（QueueHandler），文件与控制台写入由后台 QueueListener 完成；
+    文件为按大小轮转的 jpeg2mpeg.log，控制台只输出 WARNING 及以上。
+    级别由参数或环境变量 JPEG2MPEG_LOG_LEVEL（默认 INFO）决定。
+    """
+    global _listener, _rate_filter, _log_file
+    with _lock:
+        if _listener is not None:
+            return _log_file
+        level_name = (level or os.environ.get('JPEG2MPEG_LOG_LEVEL', 'INFO')).upper()
+        formatter = logging.Formatter(_FORMAT)
+        handlers = []
+        try:
+            path = os.path.join(log_dir or default_log_dir(), LOG_FILE_NAME)
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+            _log_file = path
+        except OSError:
+            _log_file = None
+        console = logging.StreamHandler()
+        console.setLevel(logging.WARNING)
+        console.setFormatter(formatter)
+        handlers.append(console)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        _rate_filter = RepeatedMessageFilter()
+        queue_handler.addFilter(_rate_filter)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, level_name, logging.INFO))
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _log_file
+
+
+def shutdown_logging() -> None:
+    """输出剩余的省略计数并停止后台写入线程（退出时自动调用）。"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    if _rate_filter is not None:
+        _rate_filter.flush()
+    listener.stop()
+    for handler in listener.handlers:
+        try:
+            handler.close()
+        except Exception:
+            pass
+
+
+def current_log_file() -> Optional[str]:
+    """返回当前日志文件路径（未初始化时为 None）。"""
+    return _log_file
+
+
+def get_logger(name: str) -> logging.Logger:
+    """返回模块日志记录器，例如 get_logger('media_manager') -> 'jpeg2mpeg.media_manager'。"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
@@ -0,0 +1,55 @@
+from typing import Optional
+
+import numpy as np
+
+# 哈希边长：8x8 = 64 位
+HASH_SIZE = 8
+
+
+def _block_resize(gray: np.ndarray, width: int, height: int) -> np.ndarray:
+    """把二维灰度数组按块均值缩小到 height x width（NumPy 实现，不依赖 PIL/Qt）。"""
+    h, w = gray.shape
+    ys = np.linspace(0, h, height + 1).astype(int)
+    xs = np.linspace(0, w, width + 1).astype(int)
+    # 每块至少 1 像素（缩略图比哈希尺寸还小时按最近邻取样）
+    ys[1:] = np.maximum(ys[1:], ys[:-1] + 1)
+    xs[1:] = np.maximum(xs[1:], xs[:-1] + 1)
+    ys = np.minimum(ys, h)
+    xs = np.minimum(xs, w)
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float32), ys[:-1], axis=0), xs[:-1], axis=1)
+    counts = np.outer(np.diff(ys), np.diff(xs)).clip(min=1)
+    return sums / counts
+
+
+def _pack(bits: np.ndarray) -> int:
+    value = 0
+    for b in bits.ravel():
+        value = (value << 1) | int(b)
+    return value
+
+
+def ahash(gray: np.ndarray, size: int = HASH_SIZE) -> int:
+    """均值哈希：缩小到 size x size，高于平均亮度的位置为 1。"""
+    small = _block_resize(gray, size, size)
+    return _pack(small > small.mean())
+
+
+def dhash(gray: np.ndarray, size: int = HASH_SIZE) -> int:
+    """差值哈希：缩小到 (size+1) x size，比较水平相邻像素的亮度梯度。"""
+    small = _block_resize(gray, size + 1, size)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+HASHERS = {'ahash': ahash, 'dhash': dhash}
+
+
+def hamming(a: int, b: int) -> int:
+    """两个哈希之间不同的位数。"""
+    return bin(a ^ b).count('1')
+
+
+def image_hash(gray: Optional[np.ndarray], method: str = 'dhash') -> Optional[int]:
+    """计算灰度数组的感知哈希；数组为空或全图同一亮度（如占位缩略图）时返回 None，不参与合并。"""
+    if gray is None or gray.size == 0 or gray.min() == gray.max():
+        return None
+    return HASHERS[method](gray)
@@ -0,0 +1,62 @@
+import importlib
+import os
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+from utils.log_utils import get_logger
+
+logger = get_logger('prewarm')
+
+# 导出路径用到、但启动时不导入的重量级模块；按导出时的使用顺序排列
+EXPORT_MODULES = (
+    'numpy',
+    'utils.yuv_utils',
+    'core.export_pipeline',
+    'core.prefetcher',
+    'utils.phash',
+    'mutagen.mp3',
+    'mutagen.wave',
+    'mutagen.oggvorbis',
+    'proglog',
+    'imageio_ffmpeg',
+    'moviepy.editor',
+    'moviepy',
+)
+
+_thread: Optional[threading.Thread] = None
+# 各模块预热耗时（秒）；导入失败记为 None
+timings: Dict[str, Optional[float]] = {}
+
+
+def _warm(modules: Sequence[str]):
+    t_all = time.perf_counter()
+    # moviepy 在导入时读取 ffmpeg 路径，须先定位（探测结果有磁盘缓存）并设置与导出相同的环境变量
+    from core.ffmpeg_locator import configure_ffmpeg_env, locate_ffmpeg
+    try:
+        configure_ffmpeg_env(locate_ffmpeg())
+    except Exception:
+        logger.warning("预热时定位 ffmpeg 失败", exc_info=True)
+    for name in modules:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = round(time.perf_counter() - t0, 4)
+        except Exception:
+            # 可选依赖（如没有 moviepy.editor 的发行版）缺失不影响后续模块
+            timings[name] = None
+    logger.info("导出模块预热完成，用时 %.2f 秒：%s", time.perf_counter() - t_all, timings)
+
+
+def start_prewarm(modules: Sequence[str] = EXPORT_MODULES) -> Optional[threading.Thread]:
+    """在后台线程中导入导出所需的重量级模块（moviepy/imageio/numpy 等），首次导出时不再在 GUI 线程上付出导入开销。
+
+    应在主窗口显示之后调用；设置 JPEG2MPEG_PREWARM=0 可关闭。重复调用只启动一次。
+    """
+    global _thread
+    if os.environ.get('JPEG2MPEG_PREWARM', '1') == '0':
+        return None
+    if _thread is None:
+        _thread = threading.Thread(target=_warm, args=(tuple(modules),), name='prewarm', daemon=True)
+        _thread.start()
+    return _thread
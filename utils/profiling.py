@@ -0,0 +1,176 @@
+import cProfile
+import datetime
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from typing import List, Optional
+
+from utils.log_utils import default_log_dir, get_logger
+
+logger = get_logger('profiling')
+
+# 摘要中列出的条目数
+DEFAULT_TOP_N = 30
+# 记录最近生成的分析文件，供“打开诊断日志”展示
+_recent_files = deque(maxlen=20)
+# 同一时刻只允许一个分析会话（cProfile 不支持嵌套启用）
+_active = threading.Lock()
+
+
+def profile_mode() -> Optional[str]:
+    """读取 JPEG2MPEG_PROFILE：'cpu'（cProfile）| 'mem'（tracemalloc）；其他值视为关闭。"""
+    mode = os.environ.get('JPEG2MPEG_PROFILE', '').strip().lower()
+    return mode if mode in ('cpu', 'mem') else None
+
+
+def _top_n() -> int:
+    try:
+        return max(1, int(os.environ.get('JPEG2MPEG_PROFILE_TOP', str(DEFAULT_TOP_N))))
+    except ValueError:
+        return DEFAULT_TOP_N
+
+
+def _dump_base(name: str) -> str:
+    stamp = datetime.datetime.now().strftime('%Y%m%dT%H%M%S_%f')
+    return os.path.join(default_log_dir(), f"jpeg2mpeg_profile_{name}_{stamp}")
+
+
+class _ThreadProfiles:
+    """Python 3.12 之前 cProfile 只记录启用它的线程：分析期间新启动的线程（导出流水线的解码/准备线程、
+    预读与指纹线程池等）各自启用一个 Profile，结束时合并到调用线程的结果中。
+
+    3.12 起 cProfile 基于 sys.monitoring，本身就覆盖所有线程，且同一时刻只能启用一个分析器，此时不安装钩子。
+    """
+    needed = sys.version_info < (3, 12)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = []
+        self._previous = None
+
+    def _hook(self, frame, event, arg):
+        # 新线程执行第一个事件时调用一次；enable() 随即替换本线程的 profile 钩子
+        prof = cProfile.Profile()
+        with self._lock:
+            self._items.append((threading.current_thread(), prof))
+        prof.enable()
+
+    def install(self) -> None:
+        if self.needed:
+            self._previous = threading.getprofile()
+            threading.setprofile(self._hook)
+
+    def uninstall(self) -> None:
+        if self.needed:
+            threading.setprofile(self._previous)
+
+    def finished(self):
+        """返回 (已结束线程的 Profile 列表, 仍在运行而未合并的线程数)。"""
+        with self._lock:
+            items = list(self._items)
+        done = [prof for thread, prof in items if not thread.is_alive()]
+        return done, len(items) - len(done)
+
+
+def _write_cpu(name: str, prof: cProfile.Profile, threads: Optional[_ThreadProfiles] = None) -> List[str]:
+    base = _dump_base(name)
+    prof_path = base + '.prof'
+    buf = io.StringIO()
+    stats = pstats.Stats(prof, stream=buf)
+    if threads is None or not threads.needed:
+        coverage = "含所有线程" if threads is not None else "仅调用线程"
+    else:
+        done, alive = threads.finished()
+        for p in done:
+            stats.add(p)
+        coverage = f"调用线程 + {len(done)} 个期间启动并已结束的线程"
+        if alive:
+            coverage += f"；{alive} 个仍在运行的线程未计入"
+    stats.dump_stats(prof_path)
+    stats.sort_stats('cumulative').print_stats(_top_n())
+    txt_path = base + '.txt'
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {name}：cProfile 按累计耗时排序（{coverage}；完整数据见 {os.path.basename(prof_path)}，"
+                f"可用 python -m pstats 或 snakeviz 查看）\n")
+        f.write(buf.getvalue())
+    return [txt_path, prof_path]
+
+
+def _write_mem(name: str, snapshot: tracemalloc.Snapshot, current: int, peak: int) -> List[str]:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    top = snapshot.statistics('lineno')[:_top_n()]
+    txt_path = _dump_base(name) + '.mem.txt'
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {name}：tracemalloc 结束时仍存活的分配（按代码行，前 {len(top)} 项）\n")
+        f.write(f"# 调用期间峰值 {peak / 1024 / 1024:.1f} MiB，结束时 {current / 1024 / 1024:.1f} MiB\n")
+        for stat in top:
+            f.write(f"{stat.size / 1024:10.1f} KiB  {stat.count:8d} 次  {stat.traceback}\n")
+    return [txt_path]
+
+
+def profiled(name: str):
+    """装饰器：JPEG2MPEG_PROFILE 开启时用 cProfile 或 tracemalloc 包裹一次调用，
+    把 .prof / 摘要文件写到诊断日志目录；未开启时直接调用，几乎没有开销。
+
+    已有分析会话在进行时（例如导出过程中触发的导入），内层调用不再单独分析。
+    cpu 模式同时记录调用期间启动的工作线程（见 _ThreadProfiles），摘要首行注明覆盖范围。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = profile_mode()
+            if mode is None or not _active.acquire(blocking=False):
+                return func(*args, **kwargs)
+            try:
+                if mode == 'cpu':
+                    prof = cProfile.Profile()
+                    threads = _ThreadProfiles()
+                    threads.install()
+                    prof.enable()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        prof.disable()
+                        threads.uninstall()
+                        _save(name, lambda: _write_cpu(name, prof, threads))
+                started = not tracemalloc.is_tracing()
+                if started:
+                    tracemalloc.start(10)
+                tracemalloc.reset_peak()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    snapshot = tracemalloc.take_snapshot()
+                    current, peak = tracemalloc.get_traced_memory()
+                    if started:
+                        tracemalloc.stop()
+                    _save(name, lambda: _write_mem(name, snapshot, current, peak))
+            finally:
+                _active.release()
+        return wrapper
+    return decorator
+
+
+def _save(name: str, write) -> None:
+    try:
+        paths = write()
+    except Exception:
+        logger.warning("写入性能分析文件失败：%s", name, exc_info=True)
+        return
+    for p in paths:
+        _recent_files.append(p)
+    logger.info("性能分析（%s）已写入：%s", name, ', '.join(paths))
+
+
+def recent_profile_files() -> List[str]:
+    """最近生成且仍存在的分析文件（新的在前）。"""
+    return [p for p in reversed(_recent_files) if os.path.exists(p)]
@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+from typing import Optional, Tuple
+
+
+def peak_rss_bytes() -> int:
+    """返回当前进程的峰值常驻内存（字节）；无法获取时返回 0。
+
+    Unix 使用 resource.getrusage（Linux 单位为 KiB，macOS 为字节），Windows 读取 PeakWorkingSetSize。
+    """
+    try:
+        if os.name == 'nt':
+            return _windows_memory_info()[0]
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+    except Exception:
+        return 0
+
+
+def current_rss_bytes() -> int:
+    """返回当前进程的常驻内存（字节）；无法获取时返回 0。"""
+    try:
+        if os.name == 'nt':
+            return _windows_memory_info()[1]
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return 0
+
+
+class RssSampler:
+    """在一段代码执行期间按固定间隔采样当前常驻内存，得到这段代码自身的峰值。
+
+    peak_rss_bytes 是整个进程生命周期的高水位，后面的阶段会继承前面阶段的峰值；
+    需要按阶段定位内存回退时用本类：
+
+        with RssSampler() as rss:
+            ...
+        rss.before, rss.after, rss.peak, rss.peak_growth
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.before = self.after = self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def peak_growth(self) -> int:
+        """期间峰值相对开始时的增长（字节）。"""
+        return max(0, self.peak - self.before)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self) -> 'RssSampler':
+        self.before = self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.after = current_rss_bytes()
+        self.peak = max(self.peak, self.after)
+
+
+_libc = None
+
+
+def release_free_heap() -> bool:
+    """glibc：调用 malloc_trim(0)，把所有 arena 中的空闲页归还系统。
+
+    解码线程反复分配、释放整帧大小的图像，释放后的内存留在各线程的 arena 中，RSS 远高于实际在用的内存。
+    作用于整个进程的堆，但只是一次性的整理，不修改分配器参数（mallopt），调用之后 Qt/NumPy 的分配行为不变。
+    归还了内存时返回 True；其他平台/C 库上不做任何事，返回 False。
+    """
+    global _libc
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        if _libc is None:
+            import ctypes
+            _libc = ctypes.CDLL('libc.so.6')
+        return bool(_libc.malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def io_counters() -> Optional[Tuple[int, int]]:
+    """返回当前进程累计的 (读取字节, 写入字节)，含缓存命中与管道；不支持的平台返回 None。
+
+    Linux 读取 /proc/self/io 的 rchar/wchar，Windows 使用 GetProcessIoCounters。
+    """
+    try:
+        if os.name == 'nt':
+            return _windows_io_counters()
+        values = {}
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                values[key.strip()] = int(value)
+        return values['rchar'], values['wchar']
+    except Exception:
+        return None
+
+
+def child_cpu_seconds() -> float:
+    """已结束子进程（如 ffmpeg）消耗的 CPU 时间（秒）；Windows 上不可用，返回 0。"""
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+def _windows_io_counters() -> Tuple[int, int]:
+    """Windows：返回 (ReadTransferCount, WriteTransferCount)。"""
+    import ctypes
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    counters = IO_COUNTERS()
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.kernel32.GetProcessIoCounters(handle, ctypes.byref(counters)):
+        raise OSError("GetProcessIoCounters failed")
+    return int(counters.ReadTransferCount), int(counters.WriteTransferCount)
+
+
+def _windows_memory_info():
+    """Windows：返回 (PeakWorkingSetSize, WorkingSetSize)。"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+    return int(counters.PeakWorkingSetSize), int(counters.WorkingSetSize)
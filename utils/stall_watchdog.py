@@ -0,0 +1,206 @@
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import List, Optional
+
+from PyQt5.QtCore import QObject, QTimer
+
+from utils.log_utils import default_log_dir, get_logger
+
+logger = get_logger('stall')
+
+STALL_LOG_NAME = 'jpeg2mpeg_stalls.jsonl'
+# 事件循环延迟直方图的桶上界（毫秒），最后一桶为更长的卡顿
+HISTOGRAM_BUCKETS_MS = (16, 50, 100, 250, 500, 1000, 2000, 5000)
+# 单次卡顿最多采样的堆栈数（长时间卡顿时每隔 sample_every 秒再采一次）
+MAX_SAMPLES = 5
+# 当前运行中的检测器（见 watchdog_paused()）
+_active: Optional['StallWatchdog'] = None
+
+
+def _bucket_label(ms: float) -> str:
+    for upper in HISTOGRAM_BUCKETS_MS:
+        if ms <= upper:
+            return f"<={upper}ms"
+    return f">{HISTOGRAM_BUCKETS_MS[-1]}ms"
+
+
+class StallWatchdog(QObject):
+    """GUI 事件循环卡顿检测。
+
+    GUI 线程中的 QTimer 按 interval_ms 更新心跳；辅助线程发现心跳超过 threshold_ms 未更新时，
+    通过 sys._current_frames() 抓取 GUI 线程当前的 Python 堆栈（卡顿持续时每隔 sample_every 秒再采样）。
+    心跳恢复后把卡顿时长与堆栈写入日志目录下的 jpeg2mpeg_stalls.jsonl，并记一条警告日志；
+    stop() 时写入全部心跳延迟的直方图汇总。
+    pause()/resume() 之间不检测、不计入直方图，用于已知会阻塞界面线程的操作（同步导出）。
+    """
+
+    def __init__(self, threshold_ms: int = 250, interval_ms: int = 100, log_path: Optional[str] = None,
+                 sample_every: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.sample_every = sample_every
+        self.log_path = log_path or os.path.join(default_log_dir(), STALL_LOG_NAME)
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._beat)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._gui_ident: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._samples: List[dict] = []
+        self._next_sample_at = 0.0
+        self._paused = False
+        # 统计
+        self.histogram = {_bucket_label(0): 0}
+        self.ticks = 0
+        self.stalls = 0
+        self.max_stall_ms = 0.0
+        self.total_stall_ms = 0.0
+        self._started_at = None
+
+    def start(self) -> 'StallWatchdog':
+        """须在 GUI 线程调用。"""
+        global _active
+        _active = self
+        self._gui_ident = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._started_at = datetime.datetime.now().isoformat()
+        self._timer.start()
+        self._thread = threading.Thread(target=self._monitor, name='stall-watchdog', daemon=True)
+        self._thread.start()
+        return self
+
+    def pause(self) -> None:
+        """暂停检测（须在 GUI 线程调用）。"""
+        with self._lock:
+            self._paused = True
+            self._samples = []
+
+    def resume(self) -> None:
+        """恢复检测；暂停期间的阻塞不计为卡顿。"""
+        with self._lock:
+            self._samples = []
+            self._last_beat = time.monotonic()
+            self._paused = False
+
+    def _beat(self):
+        now = time.monotonic()
+        if self._paused:
+            self._last_beat = now
+            return
+        lag_ms = max(0.0, (now - self._last_beat - self.interval) * 1000.0)
+        self._last_beat = now
+        self.ticks += 1
+        label = _bucket_label(lag_ms)
+        self.histogram[label] = self.histogram.get(label, 0) + 1
+        with self._lock:
+            samples, self._samples = self._samples, []
+        if samples:
+            self._record_stall(lag_ms, samples)
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval / 2):
+            now = time.monotonic()
+            blocked = now - self._last_beat - self.interval
+            if blocked < self.threshold or self._paused:
+                continue
+            with self._lock:
+                if self._paused:
+                    continue
+                if self._samples and now < self._next_sample_at:
+                    continue
+                if len(self._samples) >= MAX_SAMPLES:
+                    continue
+                frame = sys._current_frames().get(self._gui_ident)
+                stack = traceback.format_stack(frame) if frame is not None else []
+                del frame
+                self._samples.append({'after_ms': round(blocked * 1000.0), 'stack': stack})
+                self._next_sample_at = now + self.sample_every
+
+    def _record_stall(self, duration_ms: float, samples: List[dict]):
+        self.stalls += 1
+        self.max_stall_ms = max(self.max_stall_ms, duration_ms)
+        self.total_stall_ms += duration_ms
+        record = {
+            'type': 'stall',
+            'time': datetime.datetime.now().isoformat(),
+            'duration_ms': round(duration_ms),
+            'samples': samples,
+        }
+        top = samples[0]['stack'][-1].strip().splitlines()[0] if samples[0]['stack'] else '?'
+        logger.warning("事件循环卡顿 %d ms，位于 %s", round(duration_ms), top)
+        self._append(record)
+
+    def _append(self, record: dict):
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError:
+            logger.warning("写入卡顿记录失败：%s", self.log_path, exc_info=True)
+
+    def summary(self) -> dict:
+        order = [_bucket_label(u) for u in HISTOGRAM_BUCKETS_MS] + [_bucket_label(float('inf'))]
+        return {
+            'type': 'summary',
+            'started': self._started_at,
+            'time': datetime.datetime.now().isoformat(),
+            'threshold_ms': round(self.threshold * 1000),
+            'interval_ms': round(self.interval * 1000),
+            'ticks': self.ticks,
+            'stalls': self.stalls,
+            'max_stall_ms': round(self.max_stall_ms),
+            'total_stall_ms': round(self.total_stall_ms),
+            'latency_histogram': {k: self.histogram.get(k, 0) for k in order},
+        }
+
+    def stop(self) -> None:
+        """停止检测并写入延迟直方图汇总（可重复调用）。"""
+        global _active
+        if self._thread is None:
+            return
+        if _active is self:
+            _active = None
+        self._stop.set()
+        self._timer.stop()
+        self._thread.join(timeout=2)
+        self._thread = None
+        summary = self.summary()
+        logger.info("事件循环延迟汇总：%d 次心跳，%d 次卡顿（最长 %d ms），直方图 %s",
+                    summary['ticks'], summary['stalls'], summary['max_stall_ms'], summary['latency_histogram'])
+        self._append(summary)
+
+
+def watchdog_from_env(parent=None) -> Optional[StallWatchdog]:
+    """按 JPEG2MPEG_STALL_MS（卡顿阈值，默认 250；0 关闭）创建检测器，未启用时返回 None。"""
+    try:
+        threshold = int(os.environ.get('JPEG2MPEG_STALL_MS', '250'))
+    except ValueError:
+        threshold = 250
+    if threshold <= 0:
+        return None
+    return StallWatchdog(threshold_ms=threshold, parent=parent)
+
+
+@contextmanager
+def watchdog_paused():
+    """在 with 块内暂停当前运行的检测器（没有时什么也不做）。
+
+    导出在界面线程中同步执行，整个导出期间事件循环都处于阻塞状态；不暂停时每次导出都会记一次长卡顿与完整堆栈。
+    """
+    watchdog = _active
+    if watchdog is None:
+        yield
+        return
+    watchdog.pause()
+    try:
+        yield
+    finally:
+        watchdog.resume()
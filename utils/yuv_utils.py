@@ -0,0 +1,103 @@
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+# BT.601 limited range（与 ffmpeg 对 yuv420p 的默认 RGB->YUV 转换一致）
+_Y_COEF = np.array([65.481, 128.553, 24.966], dtype=np.float32) / 255.0
+_U_COEF = np.array([-37.797, -74.203, 112.0], dtype=np.float32) / 255.0
+_V_COEF = np.array([112.0, -93.786, -18.214], dtype=np.float32) / 255.0
+
+# yuv420p 中的黑色
+BLACK_Y = 16
+BLACK_UV = 128
+# RGB -> YUV 转换每次处理的行数（偶数）
+BLOCK_ROWS = 64
+
+
+def i420_frame_size(width: int, height: int) -> int:
+    """一帧 I420 数据的字节数（宽高须为偶数）。"""
+    return width * height * 3 // 2
+
+
+def new_i420_canvas(width: int, height: int) -> np.ndarray:
+    """创建一帧填充为黑色的 I420 缓冲区（一维 uint8，Y/U/V 平面依次排列）。"""
+    buf = np.empty(i420_frame_size(width, height), dtype=np.uint8)
+    y_len = width * height
+    buf[:y_len] = BLACK_Y
+    buf[y_len:] = BLACK_UV
+    return buf
+
+
+def i420_planes(buf: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """返回缓冲区中 Y/U/V 三个平面的二维视图（不复制）。"""
+    y_len = width * height
+    c_len = y_len // 4
+    y = buf[:y_len].reshape(height, width)
+    u = buf[y_len:y_len + c_len].reshape(height // 2, width // 2)
+    v = buf[y_len + c_len:].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+def _store(plane: np.ndarray, dst: np.ndarray) -> None:
+    np.rint(plane, out=plane)
+    np.clip(plane, 0, 255, out=plane)
+    dst[...] = plane
+
+
+def rgb_to_i420_planes(rgb: np.ndarray, out=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """将 HxWx3 的 uint8 RGB 数组转换为 I420 的 Y/U/V 平面（向量化实现）。
+
+    H 与 W 须为偶数；色度平面先对 RGB 做 2x2 平均再转换（转换为线性，结果等价）。
+    按 BLOCK_ROWS 行分块计算，float32 临时数组只占一个行块（约 BLOCK_ROWS * W * 12 字节），
+    不随整帧大小增长。out 为 (Y, U, V) 三个 uint8 目标平面（可为画布中的切片视图），省略时新建。
+    """
+    h, w = rgb.shape[:2]
+    if out is None:
+        out = (np.empty((h, w), dtype=np.uint8), np.empty((h // 2, w // 2), dtype=np.uint8),
+               np.empty((h // 2, w // 2), dtype=np.uint8))
+    oy, ou, ov = out
+    for r0 in range(0, h, BLOCK_ROWS):
+        r1 = min(h, r0 + BLOCK_ROWS)
+        f = rgb[r0:r1].astype(np.float32)
+        y = f @ _Y_COEF
+        y += 16.0
+        _store(y, oy[r0:r1])
+        # 2x2 块平均后计算色度
+        sub = f.reshape((r1 - r0) // 2, 2, w // 2, 2, 3).mean(axis=(1, 3))
+        u = sub @ _U_COEF
+        u += 128.0
+        _store(u, ou[r0 // 2:r1 // 2])
+        v = sub @ _V_COEF
+        v += 128.0
+        _store(v, ov[r0 // 2:r1 // 2])
+    return oy, ou, ov
+
+
+def image_to_i420(im: Image.Image, target_size: Tuple[int, int], resample=None) -> np.ndarray:
+    """把 PIL 图片等比缩放进 target_size，并在 YUV 空间中居中加黑边，返回一帧 I420 缓冲区。
+
+    target_size 宽高须为偶数；缩放后的图片宽高会裁掉最多 1 像素以对齐到偶数，
+    粘贴偏移同样对齐到偶数，保证色度平面按 2x2 对齐。
+    """
+    tw, th = target_size
+    if resample is None:
+        resample = getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', 1))
+    if im.mode != 'RGB':
+        im = im.convert('RGB')
+    if im.width > tw or im.height > th:
+        im = im.copy()
+        im.thumbnail((tw, th), resample)
+    w, h = im.width // 2 * 2, im.height // 2 * 2
+    buf = new_i420_canvas(tw, th)
+    if w < 2 or h < 2:
+        return buf
+    rgb = np.asarray(im, dtype=np.uint8)[:h, :w]
+    dy, du, dv = i420_planes(buf, tw, th)
+    x0 = (tw - w) // 4 * 2
+    y0 = (th - h) // 4 * 2
+    # 直接写入画布中的目标区域，不另建整帧大小的平面
+    rgb_to_i420_planes(rgb, out=(dy[y0:y0 + h, x0:x0 + w],
+                                 du[y0 // 2:(y0 + h) // 2, x0 // 2:(x0 + w) // 2],
+                                 dv[y0 // 2:(y0 + h) // 2, x0 // 2:(x0 + w) // 2]))
+    return buf